@@ -0,0 +1,298 @@
+"""
+Generátor syntetických GRAS kontejnerů pro benchmarky.
+
+Kontejnery mají stejný formát jako výstupy GRAS v data/ (řádky '*', hlavičky
+'KEY', -1,'VALUE', popisy sloupců, numerické řádky '%11.5g', 'End of Block'
+a 'End of File'), takže je zpracuje GrasBlockSplitter, extract_data i report:
+
+    python -m benchmarks.gras_generator bench-data --volumes 10 --hist-blocks 40 --bins 200
+    python -m benchmarks.gras_generator bench-data --size-mb 50
+    python -m benchmarks.gras_generator bench-data --hist2d-blocks 2 --bins2d 1000
+"""
+import os
+import math
+import argparse
+
+import numpy as np
+
+SPECTRA = ('solar_proton', 'trapped_electron', 'trapped_proton')
+SPECIES = ('e-', 'gamma', 'proton')
+NIEL_SPECIES = ('e+', 'e-', 'neutron', 'proton')
+HIST_COLUMNS = (
+    ('lower', 'MeV', 'Bin lower edge'),
+    ('upper', 'MeV', 'Bin upper edge'),
+    ('mean', 'MeV', 'Bin mean'),
+    ('value', '{unit}', 'Bin value'),
+    ('error', '{unit}', 'Bin error'),
+    ('entries', '', 'Bin entries'),
+)
+HIST2D_COLUMNS = (
+    ('xlower', 'MeV', 'Bin x lower edge'),
+    ('xupper', 'MeV', 'Bin x upper edge'),
+    ('xmean', 'MeV', 'Bin x mean'),
+    ('ylower', '', 'Bin y lower edge'),
+    ('yupper', '', 'Bin y upper edge'),
+    ('ymean', '', 'Bin y mean'),
+    ('value', '{unit}', 'Bin value'),
+    ('error', '{unit}', 'Bin error'),
+    ('entries', '', 'Bin entries'),
+)
+# (název, modul, typ modulu, popisek y, jednotka y) bloků, které čte report
+STANDARD_HISTOGRAMS = (
+    ('E- FLUENCE SPECTRUM', 'FLUENCE', 'FLUENCE', 'fluence', 'counts/cm2'),
+    ('GAMMA FLUENCE SPECTRUM', 'FLUENCE', 'FLUENCE', 'fluence', 'counts/cm2'),
+    ('PROTON FLUENCE SPECTRUM', 'FLUENCE', 'FLUENCE', 'fluence', 'counts/cm2'),
+    ('LET SPECTRUM', 'LET', 'LET', 'let', 'counts/cm2'),
+    ('NIEL SPECTRUM', 'NIEL', 'NIEL', 'niel', 'MeV/g'),
+    ('DOSE SPECTRUM', 'TID', 'DOSE', 'dose', 'rad'),
+    ('TOTAL DOSE VS PRIMARY KINETIC ENERGY', 'TID', 'DOSE', 'dose', 'rad'),
+)
+INFO_COLUMNS = ('NumOfEvt', 'Gamma', 'ErrorGamma', 'Electron', 'ErrorElectron',
+                'Positron', 'ErrorPositron', 'Steps', 'ErrorSteps')
+
+
+def _num(value):
+    return f"{value:11.5g}"
+
+
+def _row(values):
+    return ",".join(_num(v) for v in values)
+
+
+def _rows(matrix):
+    return [_row(row) for row in matrix]
+
+
+def _string_field(key, value):
+    return f"'{key}',   -1,'{value}'"
+
+
+def _number_field(key, value, unit):
+    return f"'{key}',    1, {value:>8.5g}, '{unit}'"
+
+
+def _column(name, unit, description):
+    return f"'{name}','{unit}',    1,'{description}'"
+
+
+def _block(index, fields, columns, rows, tag=None):
+    """Řádky jednoho bloku včetně '*' a 'End of Block'; index se počítá od konce souboru."""
+    histogram = tag is not None
+    counts = len(fields) + len(columns) + 1 + (1 if histogram else 0)
+    lines = [f"'*', {counts}, {int(histogram)}, {len(fields)}, 0, {len(columns)}, {len(columns)}, {len(rows)}, {index}"]
+    if histogram:
+        lines.append(f"'{tag}'")
+    lines += fields + columns + rows
+    lines.append("'End of Block'")
+    return lines
+
+
+def histogram_block(index, rng, title, module, module_type, ylabel, yunit, bins, xmin=1e-5, xmax=1e4):
+    edges = np.logspace(math.log10(xmin), math.log10(xmax), bins + 1)
+    # hladké spektrum s náhodným šumem a nulovými okraji, jako výstupy GRAS
+    centre = rng.uniform(0.2, 0.8) * bins
+    width = rng.uniform(0.05, 0.2) * bins
+    shape = np.exp(-0.5 * ((np.arange(bins) - centre) / width) ** 2)
+    values = shape * 10 ** rng.uniform(2, 10) * rng.uniform(0.5, 1.5, bins)
+    values[shape < 1e-3] = 0.0
+    entries = np.where(values > 0, rng.integers(1, 200, bins), 0)
+    errors = np.where(entries > 0, values / np.sqrt(np.maximum(entries, 1)), 0.0)
+    # zaokrouhlení na 5 platných číslic, aby součet seděl s tím, co je v souboru
+    values = np.array([float(_num(v)) for v in values])
+
+    fields = [
+        _string_field('GRAS_DATA_TITLE', title),
+        _string_field('GRAS_DATA_TYPE', 'HIST_1D'),
+        _string_field('GRAS_MODULE_NAME', module),
+        _string_field('GRAS_MODULE_TYPE', module_type),
+        _number_field('HIST_ENTRIES', 0, 'none'),
+        _string_field('HIST_NAME', f"{module}_{title.lower().replace(' ', '_')}"),
+        _number_field('HIST_SUM_ALL_BIN_VALUES', values.sum(), 'Y_AXIS_UNITS'),
+        _string_field('HIST_TITLE', f"{module} {title.lower()} in MeV"),
+    ]
+    for part in ('OVERFLOW', 'UNDERFLOW'):
+        fields += [
+            _number_field(f'{part}_ENTRIES', 0, 'none'),
+            _number_field(f'{part}_ERROR', 0, 'Y_AXIS_UNITS'),
+            _number_field(f'{part}_MEAN', 0, 'Y_AXIS_UNITS'),
+            _number_field(f'{part}_VALUE', 0, 'Y_AXIS_UNITS'),
+        ]
+    fields += [
+        _string_field('X_AXIS_LABEL', 'ekin'),
+        _number_field('X_AXIS_MAX', xmax, ' '),
+        _number_field('X_AXIS_MIN', xmin, ' '),
+        _number_field('X_AXIS_NBINS', bins, ' '),
+        _string_field('X_AXIS_SCALE', 'log'),
+        _string_field('X_AXIS_UNITS', 'MeV'),
+        _string_field('Y_AXIS_LABEL', ylabel),
+        _string_field('Y_AXIS_UNITS', yunit),
+    ]
+    columns = [_column(name, unit.format(unit=yunit), desc) for name, unit, desc in HIST_COLUMNS]
+    data = np.column_stack([edges[:-1], edges[1:], np.zeros(bins), values, errors, entries])
+    return _block(index, fields, columns, _rows(data), tag='GRAS HISTOGRAM 1D')
+
+
+def histogram2d_block(index, rng, title, bins, xmin=1e-2, xmax=1e4):
+    """HIST_2D blok bins × bins: energie (log) × cos úhlu, řádek na buňku."""
+    x_edges = np.logspace(math.log10(xmin), math.log10(xmax), bins + 1)
+    y_edges = np.linspace(-1, 1, bins + 1)
+    x, y = np.meshgrid(np.arange(bins), np.arange(bins))
+    centre = rng.uniform(0.3, 0.7, 2) * bins
+    shape = np.exp(-0.5 * (((x - centre[0]) / (0.15 * bins)) ** 2 + ((y - centre[1]) / (0.3 * bins)) ** 2))
+    values = shape * 10 ** rng.uniform(2, 6) * rng.uniform(0.5, 1.5, shape.shape)
+    values[shape < 1e-3] = 0.0
+    entries = np.where(values > 0, rng.integers(1, 200, shape.shape), 0)
+    errors = np.where(entries > 0, values / np.sqrt(np.maximum(entries, 1)), 0.0)
+
+    fields = [
+        _string_field('GRAS_DATA_TITLE', title),
+        _string_field('GRAS_DATA_TYPE', 'HIST_2D'),
+        _string_field('GRAS_MODULE_NAME', 'SYNTH'),
+        _string_field('GRAS_MODULE_TYPE', 'FLUENCE'),
+        _string_field('HIST_NAME', f"SYNTH_{title.lower().replace(' ', '_')}"),
+        _number_field('HIST_SUM_ALL_BIN_VALUES', values.sum(), 'Z_AXIS_UNITS'),
+        _string_field('HIST_TITLE', f"SYNTH {title.lower()}"),
+        _string_field('X_AXIS_LABEL', 'ekin'),
+        _string_field('X_AXIS_SCALE', 'log'),
+        _string_field('X_AXIS_UNITS', 'MeV'),
+        _string_field('Y_AXIS_LABEL', 'cos theta'),
+        _string_field('Y_AXIS_SCALE', 'linear'),
+        _string_field('Z_AXIS_LABEL', 'fluence'),
+        _string_field('Z_AXIS_UNITS', 'counts/cm2'),
+    ]
+    columns = [_column(name, unit.format(unit='counts/cm2'), desc) for name, unit, desc in HIST2D_COLUMNS]
+    xi, yi = x.ravel(), y.ravel()
+    data = np.column_stack([
+        x_edges[xi], x_edges[xi + 1], np.zeros(xi.size),
+        y_edges[yi], y_edges[yi + 1], np.zeros(yi.size),
+        values.ravel(), errors.ravel(), entries.ravel(),
+    ])
+    return _block(index, fields, columns, _rows(data), tag='GRAS HISTOGRAM 2D')
+
+
+def stat_block(index, rng, title, module, module_type, name, unit, description, species=None):
+    rows = len(species) if species else 1
+    values = 10 ** rng.uniform(-2, 4, rows)
+    errors = values * rng.uniform(0.01, 0.2, rows)
+    entries = rng.integers(10, 60000, rows)
+    fields = [
+        _string_field('GRAS_DATA_TITLE', title),
+        _string_field('GRAS_DATA_TYPE', 'STAT_DOUBLE'),
+        _string_field('GRAS_MODULE_NAME', module),
+        _string_field('GRAS_MODULE_TYPE', module_type),
+    ]
+    if species:
+        fields.append(f"'PARTICLE SPECIES',   -{len(species)}," + ",".join(f"'{s}'" for s in species))
+    columns = [
+        _column(name, unit, description),
+        _column('Error', unit, f"Error {description.lower()}"),
+        _column('Entries', '', 'Number of entries'),
+        _column('Non zero entries', '', 'Number of non zero entries'),
+    ]
+    data = np.column_stack([values, errors, entries, entries])
+    return _block(index, fields, columns, _rows(data))
+
+
+def info_block(rng, events):
+    fields = [_string_field('GRAS_MODULE_NAME', 'general'), _string_field('GRAS_MODULE_TYPE', 'COMMON')]
+    columns = [_column(name, '', name) for name in INFO_COLUMNS]
+    values = [events] + list(10 ** rng.uniform(-3, 3, len(INFO_COLUMNS) - 1))
+    return _block(0, fields, columns, [_row(values)])
+
+
+def container_lines(hist_blocks=0, bins=50, seed=0, events=60000, hist2d_blocks=0, bins2d=100):
+    """
+    Řádky kontejneru: standardní bloky (totály, spektra, druhy částic, info),
+    hist_blocks dalších HIST_1D bloků 'SYNTH SPECTRUM nnn' s bins biny
+    a hist2d_blocks HIST_2D bloků 'SYNTH MAP nnn' s bins2d × bins2d buňkami.
+    """
+    rng = np.random.default_rng(seed)
+    builders = [
+        lambda i: stat_block(i, rng, 'TOTAL FLUENCE', 'FLUENCE', 'FLUENCE', 'Fluence', 'counts/cm2', 'Scalar fluence'),
+        *[lambda i, h=h: histogram_block(i, rng, *h, bins=bins) for h in STANDARD_HISTOGRAMS[:3]],
+        lambda i: stat_block(i, rng, 'LET', 'LET', 'LET', 'LET', 'counts/cm2', 'LET'),
+        lambda i: histogram_block(i, rng, *STANDARD_HISTOGRAMS[3], bins=bins),
+        lambda i: stat_block(i, rng, 'TOTAL NIEL', 'NIEL', 'NIEL', 'NIEL', 'MeV/g', 'NIEL'),
+        lambda i: histogram_block(i, rng, *STANDARD_HISTOGRAMS[4], bins=bins),
+        lambda i: stat_block(i, rng, 'TOTAL NON IONISING DOSE PER PARTICLE SPECIES', 'NIEL', 'NIEL',
+                             'NIEL', 'MeV/g', 'NIEL', species=NIEL_SPECIES),
+        *[lambda i, h=h: histogram_block(i, rng, *h, bins=bins) for h in STANDARD_HISTOGRAMS[5:]],
+        lambda i: stat_block(i, rng, 'TOTAL DOSE', 'TID', 'DOSE', 'Dose', 'rad', 'Dose/energy deposition'),
+        lambda i: stat_block(i, rng, 'TOTAL DOSE PER PARTICLE SPECIES', 'TID', 'DOSE', 'Dose', 'rad',
+                             'Dose/energy deposition', species=SPECIES),
+    ]
+    builders += [
+        lambda i, n=n: histogram_block(i, rng, f'SYNTH SPECTRUM {n:03d}', 'SYNTH', 'FLUENCE', 'fluence',
+                                       'counts/cm2', bins=bins)
+        for n in range(hist_blocks)
+    ]
+    builders += [
+        lambda i, n=n: histogram2d_block(i, rng, f'SYNTH MAP {n:03d}', bins2d)
+        for n in range(hist2d_blocks)
+    ]
+    lines = []
+    for position, build in enumerate(builders):
+        lines += build(len(builders) - position)
+    lines += info_block(rng, events)
+    lines.append("'End of File'")
+    return lines
+
+
+def write_container(path, hist_blocks=0, bins=50, seed=0, hist2d_blocks=0, bins2d=100):
+    lines = container_lines(hist_blocks, bins, seed, hist2d_blocks=hist2d_blocks, bins2d=bins2d)
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write("\n".join(lines) + "\n")
+    return os.path.getsize(path)
+
+
+def container_name(spectrum, volume):
+    """Název ve tvaru výstupů GRAS, aby seděl physical volume i typ spektra."""
+    return f"{spectrum}_SYNTH-BENCH_v6-SY{volume % 10}-V{volume:04d}-DETECTOR_MATDEF_Silicon_PV_Spectrum1.csv"
+
+
+def blocks_for_size(size_bytes, bins):
+    """Odhad počtu dalších HIST_1D bloků pro kontejner o velikosti size_bytes."""
+    base = len("\n".join(container_lines(0, bins))) + 1
+    per_block = len("\n".join(histogram_block(1, np.random.default_rng(0), 'SYNTH SPECTRUM 000', 'SYNTH',
+                                              'FLUENCE', 'fluence', 'counts/cm2', bins))) + 1
+    return max(0, math.ceil((size_bytes - base) / per_block))
+
+
+def generate_dataset(output_dir, volumes=3, spectra=SPECTRA, hist_blocks=0, bins=50, size_mb=None, seed=0,
+                     hist2d_blocks=0, bins2d=100):
+    """
+    volumes × spectra kontejnerů do output_dir; size_mb = cílová velikost jednoho
+    kontejneru (dopočítá hist_blocks). Stejný seed = stejná data. Vrací seznam cest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if size_mb is not None:
+        hist_blocks = blocks_for_size(size_mb * 2**20, bins)
+    paths = []
+    for volume in range(1, volumes + 1):
+        for s, spectrum in enumerate(spectra):
+            path = os.path.join(output_dir, container_name(spectrum, volume))
+            write_container(path, hist_blocks, bins, seed=seed * 1_000_003 + volume * len(spectra) + s,
+                            hist2d_blocks=hist2d_blocks, bins2d=bins2d)
+            paths.append(path)
+    return paths
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic GRAS CSV containers")
+    parser.add_argument('output_dir', help="directory for the containers (e.g. imported-data)")
+    parser.add_argument('--volumes', type=int, default=3, help="physical volumes (containers per spectrum)")
+    parser.add_argument('--hist-blocks', type=int, default=0, help="extra HIST_1D blocks per container")
+    parser.add_argument('--bins', type=int, default=50, help="bins per histogram")
+    parser.add_argument('--size-mb', type=float, help="target size of one container, overrides --hist-blocks")
+    parser.add_argument('--hist2d-blocks', type=int, default=0, help="HIST_2D blocks per container")
+    parser.add_argument('--bins2d', type=int, default=100, help="bins per axis of the 2D histograms")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    paths = generate_dataset(args.output_dir, args.volumes, SPECTRA, args.hist_blocks, args.bins,
+                             args.size_mb, args.seed, args.hist2d_blocks, args.bins2d)
+    total = sum(os.path.getsize(p) for p in paths)
+    print(f"✔ {len(paths)} containers, {total / 2**20:.1f} MB → {args.output_dir}")
@@ -0,0 +1,113 @@
+"""
+Doba startu vstupních bodů v čerstvém interpreteru (python -X importtime) proti
+rozpočtu a kontrola, že se při importu nenačítají těžké knihovny kroků, které
+modul sám nespouští (matplotlib jen pro kreslení, reportlab jen pro report, ...):
+
+    python -m benchmarks.import_times --repeat 5 --json imports.json
+
+Při překročení rozpočtu nebo načtení zakázané knihovny končí se stavem 1.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import time
+
+V3_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ('matplotlib', 'tqdm', 'reportlab', 'asyncio', 'pandas')
+
+# modul: (rozpočet importu v ms, knihovny, které se při importu nesmí načíst)
+ENTRY_POINTS = {
+    'main': (400, HEAVY),
+    'classes.gras_splitter': (300, HEAVY),
+    'classes.file_name_parser': (300, HEAVY),
+    'classes.block_catalogue': (300, HEAVY),
+    'classes.histogram_plotter': (350, HEAVY),
+    'classes.import_watcher': (450, ('matplotlib', 'tqdm', 'reportlab', 'pandas')),
+    'report': (700, ('matplotlib', 'tqdm', 'asyncio', 'pandas')),
+    'benchmarks.gras_generator': (250, HEAVY),
+}
+
+PROBE = "import sys, {module}; print(','.join(m for m in {heavy!r} if m in sys.modules))"
+
+
+def import_time(module, heavy):
+    """(cumulative import v s, wall procesu v s, načtené těžké knihovny) z jednoho čerstvého interpreteru."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module, heavy=tuple(heavy))],
+        cwd=V3_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    cumulative = None
+    # "import time: self [us] | cumulative | imported package", vstupní bod je bez odsazení
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].rstrip() == f" {module}":
+            cumulative = int(parts[1]) / 1e6
+    loaded = [m for m in result.stdout.strip().split(',') if m]
+    return cumulative, wall, loaded
+
+
+def measure(modules, repeat):
+    results = {}
+    for module in modules:
+        budget, heavy = ENTRY_POINTS[module]
+        samples = [import_time(module, heavy) for _ in range(repeat)]
+        results[module] = {
+            'import_median': statistics.median(s[0] for s in samples),
+            'import_min': min(s[0] for s in samples),
+            'process_median': statistics.median(s[1] for s in samples),
+            'budget': budget / 1000,
+            'heavy_loaded': sorted({m for s in samples for m in s[2]}),
+        }
+    return results
+
+
+def print_results(results):
+    print(f"{'entry point':<28}{'import ms':>11}{'min ms':>9}{'process ms':>12}{'budget ms':>11}  heavy")
+    failed = 0
+    for module, r in results.items():
+        over = r['import_median'] > r['budget']
+        failed += over or bool(r['heavy_loaded'])
+        colour = '\033[1;31m' if over else '\033[1;32m'
+        heavy = f"\033[1;31m{', '.join(r['heavy_loaded'])}\033[0m" if r['heavy_loaded'] else '-'
+        print(f"{module:<28}{colour}{r['import_median'] * 1000:>11.0f}\033[0m{r['import_min'] * 1000:>9.0f}"
+              f"{r['process_median'] * 1000:>12.0f}{r['budget'] * 1000:>11.0f}  {heavy}")
+    return failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure import time of the pipeline entry points")
+    parser.add_argument('modules', nargs='*', metavar='MODULE',
+                        help=f"entry points to measure (default: all of {', '.join(ENTRY_POINTS)})")
+    parser.add_argument('--repeat', type=int, default=5, help="fresh interpreters per entry point (median is reported)")
+    parser.add_argument('--json', metavar='PATH', help="write the results as JSON")
+    args = parser.parse_args()
+    unknown = set(args.modules) - set(ENTRY_POINTS)
+    if unknown:
+        parser.error(f"unknown entry point(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+def main():
+    args = parse_args()
+    results = measure(args.modules or list(ENTRY_POINTS), args.repeat)
+    failed = print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}, f, indent=2)
+        print(f"\n✔ Saved {args.json}")
+    if failed:
+        print(f"\n✗ {failed} entry point(s) over budget or loading heavy libraries.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Opakovatelné benchmarky pipeline nad syntetickými kontejnery (benchmarks.gras_generator).
+
+Každé opakování začíná z prázdných výstupů v pracovní složce; měří se wall/CPU
+čas a I/O (PipelineProfiler), v extra průchodu peak Python heapu (tracemalloc):
+
+    python -m benchmarks.run_benchmarks --volumes 5 --hist-blocks 40 --bins 200 --json bench.json
+    python -m benchmarks.run_benchmarks --size-mb 20 --compare bench.json
+"""
+import os
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import tracemalloc
+
+from benchmarks.gras_generator import generate_dataset, SPECTRA
+from classes.gras_splitter import GrasBlockSplitter
+from classes.histogram_plotter import scan_files, extract_data, render_file
+from classes.file_name_parser import CsvPropertiesCollector
+from classes.block_catalogue import BlockCatalogue
+from classes.histogram_store import HistogramStore
+from classes.profiler import PipelineProfiler
+from classes.report_cache import ReportCache
+from report import build_report, ASSET_DIR
+
+BENCHMARKS = ('split', 'scan_catalogue', 'scan_walk', 'extract_csv', 'extract_store', 'plot', 'properties', 'report')
+# medián pomalejší o víc než tolik oproti --compare se hlásí jako regrese
+REGRESSION_THRESHOLD = 1.10
+
+
+class BenchmarkRun:
+    """Jedno opakování všech benchmarků v pracovní složce (cwd) s daty v imported-data/."""
+    def __init__(self, jobs=1, plot_limit=20):
+        self.jobs = jobs
+        self.plot_limit = plot_limit
+        # profiler měřeného průchodu – přičte i čas worker procesů splitteru
+        self.profiler = None
+
+    def reset(self):
+        for path in ('generated-data', 'histogram-store', 'bench-plots'):
+            shutil.rmtree(path, ignore_errors=True)
+        for path in ('catalogue.sqlite', 'bench-report.pdf'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def steps(self):
+        """[(benchmark, funkce)] v pořadí pipeline; pozdější kroky stojí na výstupech dřívějších."""
+        state = {}
+
+        def split():
+            state['store'] = HistogramStore('histogram-store')
+            state['catalogue'] = BlockCatalogue('catalogue.sqlite')
+            splitter = GrasBlockSplitter(jobs=self.jobs, store=state['store'], catalogue=state['catalogue'],
+                                         profiler=self.profiler)
+            splitter.run(splitter.list_csv_files())
+
+        def scan_catalogue():
+            state['files'] = scan_files(root='generated-data', catalogue=state['catalogue'])
+
+        def scan_walk():
+            scan_files(root='generated-data')
+
+        def extract_csv():
+            for file in state['files']:
+                extract_data(file)
+
+        def extract_store():
+            for file in state['files']:
+                extract_data(file, state['store'])
+
+        def plot():
+            for file in state['files'][:self.plot_limit]:
+                render_file(file, 'generated-data', 'bench-plots', state['store'])
+
+        def properties():
+            CsvPropertiesCollector(store=state['store'], catalogue=state['catalogue'], jobs=self.jobs).collect_properties()
+            state['catalogue'].close()
+
+        def report():
+            build_report({
+                'output': 'bench-report.pdf',
+                'catalogue_path': os.path.abspath('catalogue.sqlite'),
+                'store_dir': 'histogram-store',
+                'logo_path': os.path.join(ASSET_DIR, 'logo.png'),
+            }, ReportCache())
+
+        return [
+            ('split', split), ('scan_catalogue', scan_catalogue), ('scan_walk', scan_walk),
+            ('extract_csv', extract_csv), ('extract_store', extract_store), ('plot', plot),
+            ('properties', properties), ('report', report),
+        ]
+
+    def timed(self, profiler):
+        self.reset()
+        self.profiler = profiler
+        try:
+            for name, step in self.steps():
+                with profiler.stage(name):
+                    step()
+        finally:
+            self.profiler = None
+
+    def memory(self):
+        """Peak Python heapu každého kroku v hlavním procesu (tracemalloc zpomaluje, proto zvlášť)."""
+        self.reset()
+        peaks = {}
+        tracemalloc.start()
+        try:
+            for name, step in self.steps():
+                tracemalloc.reset_peak()
+                step()
+                peaks[name] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return peaks
+
+
+def summarise(samples, peaks):
+    """{benchmark: statistiky} z profilů jednotlivých opakování."""
+    results = {}
+    for name in BENCHMARKS:
+        records = [s[name] for s in samples if name in s]
+        if not records:
+            continue
+        walls = [r['wall'] for r in records]
+        results[name] = {
+            'wall_min': min(walls),
+            'wall_median': statistics.median(walls),
+            'cpu_median': statistics.median(r['cpu'] for r in records),
+            'read_bytes': statistics.median(r['read_bytes'] for r in records),
+            'write_bytes': statistics.median(r['write_bytes'] for r in records),
+            'heap_peak': peaks.get(name),
+            'peak_rss': max(r['peak_rss'] for r in records),
+        }
+    return results
+
+
+def print_results(results, baseline=None):
+    header = f"{'benchmark':<15}{'min s':>9}{'median s':>10}{'cpu s':>9}{'read MB':>9}{'write MB':>9}{'heap MB':>9}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    print(header)
+    for name, r in results.items():
+        heap = f"{r['heap_peak'] / 2**20:>9.1f}" if r['heap_peak'] is not None else f"{'-':>9}"
+        line = (f"{name:<15}{r['wall_min']:>9.3f}{r['wall_median']:>10.3f}{r['cpu_median']:>9.3f}"
+                f"{r['read_bytes'] / 2**20:>9.1f}{r['write_bytes'] / 2**20:>9.1f}{heap}")
+        base = (baseline or {}).get(name)
+        if base:
+            ratio = r['wall_median'] / base['wall_median'] if base['wall_median'] else float('inf')
+            colour = '\033[1;31m' if ratio > REGRESSION_THRESHOLD else '\033[1;32m' if ratio < 1 / REGRESSION_THRESHOLD else ''
+            line += f"{colour}{ratio:>9.2f}x\033[0m"
+        print(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the GRAS pipeline on synthetic containers")
+    parser.add_argument('--volumes', type=int, default=3, help="physical volumes (× 3 spectra containers)")
+    parser.add_argument('--hist-blocks', type=int, default=10, help="extra HIST_1D blocks per container")
+    parser.add_argument('--bins', type=int, default=50, help="bins per histogram")
+    parser.add_argument('--size-mb', type=float, help="target size of one container, overrides --hist-blocks")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="timed repetitions (median is reported)")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="worker processes for splitting")
+    parser.add_argument('--plot-limit', type=int, default=20, help="number of blocks rendered by the plot benchmark")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--workdir', help="keep the generated data and outputs here (default: temporary directory)")
+    parser.add_argument('--json', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='PATH', help="JSON from an earlier run to compare the medians against")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='gras-bench-')
+    cwd = os.getcwd()
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    try:
+        paths = generate_dataset('imported-data', args.volumes, SPECTRA, args.hist_blocks, args.bins,
+                                 args.size_mb, args.seed)
+        dataset = {
+            'containers': len(paths),
+            'bytes': sum(os.path.getsize(p) for p in paths),
+            'volumes': args.volumes, 'hist_blocks': args.hist_blocks, 'bins': args.bins,
+            'size_mb': args.size_mb, 'seed': args.seed,
+        }
+        print(f"\033[1;36mDataset:\033[0m {dataset['containers']} containers, "
+              f"{dataset['bytes'] / 2**20:.1f} MB in {workdir}")
+
+        run = BenchmarkRun(jobs=args.jobs, plot_limit=args.plot_limit)
+        samples = []
+        for i in range(args.repeat):
+            profiler = PipelineProfiler()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                run.timed(profiler)
+            samples.append(profiler.stages)
+            print(f"  run {i + 1}/{args.repeat}: {sum(s['wall'] for s in profiler.stages.values()):.2f} s")
+        peaks = {}
+        if not args.no_memory:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                peaks = run.memory()
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = summarise(samples, peaks)
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print()
+    print_results(results, baseline)
+
+    if args.json:
+        output = {
+            'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+            'dataset': dataset,
+            'repeat': args.repeat,
+            'jobs': args.jobs,
+            'results': results,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+        print(f"\n✔ Saved {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import os
+import shutil
+from contextlib import contextmanager
+
+# zápisy menší než buffer se slévají do jednoho write() na konci
+BUFFER_SIZE = 1 << 20
+
+
+def temp_path(path):
+    """Dočasný soubor vedle cílového (stejný souborový systém -> os.replace je atomický)."""
+    head, tail = os.path.split(path)
+    return os.path.join(head, f".{tail}.{os.getpid()}.tmp")
+
+
+def fsync_dir(path):
+    """fsync adresáře, aby přežilo i přejmenování v něm (mimo POSIX nic nedělá)."""
+    if os.name != 'posix':
+        return
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_file(f):
+    """Dopíše buffer a obsah souboru na disk (před přejmenováním na cílový název)."""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+@contextmanager
+def atomic_open(path, mode='wb', encoding=None, fsync=True):
+    """
+    Otevře dočasný soubor a po úspěšném bloku ho přejmenuje na path. Přerušený
+    běh tak nikdy nenechá useknutý výstup – buď zůstane starý soubor, nebo nový.
+    S fsync (výchozí) se obsah zapíše na disk před přejmenováním a adresář po něm,
+    takže to platí i po výpadku napájení; fsync=False jen pro výstupy, které jde
+    kdykoli přegenerovat a kde na ztrátě nezáleží.
+
+        with atomic_open('file_map.json', 'w', encoding='utf-8') as f:
+            json.dump(file_map, f)
+    """
+    tmp = temp_path(path)
+    try:
+        with open(tmp, mode, buffering=BUFFER_SIZE, encoding=encoding) as f:
+            yield f
+            if fsync:
+                fsync_file(f)
+        os.replace(tmp, path)
+        if fsync:
+            fsync_dir(os.path.dirname(path))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def atomic_write(path, data, fsync=True):
+    """Zapíše bytes / str jedním write() přes atomic_open."""
+    if isinstance(data, str):
+        with atomic_open(path, 'w', encoding='utf-8', fsync=fsync) as f:
+            f.write(data)
+    else:
+        with atomic_open(path, 'wb', fsync=fsync) as f:
+            f.write(data)
+
+
+class ContainerWriter:
+    """
+    Výstupní soubory jednoho kontejneru (bloky v generated-data/<stem>/) zapisované
+    jako celek: soubory se píšou do skryté složky .<stem>.partial vedle cílové,
+    malé jedním write(), velké po kusech, každý se před zavřením fsyncne a commit()
+    po fsync .partial složky ji přejmenuje na cílovou a udělá fsync rodičovského
+    adresáře. Po pádu i výpadku napájení tak v generated-data není rozepsaný
+    kontejner ani bloky s useknutým obsahem, jen .partial složka, kterou další běh smaže.
+
+        with ContainerWriter('generated-data/<stem>') as writer:
+            writer.add('total_dose.csv', content)
+    """
+    def __init__(self, output_dir, fsync=True):
+        self.output_dir = output_dir
+        parent, name = os.path.split(os.path.normpath(output_dir))
+        self.parent = parent
+        self.staging = os.path.join(parent, f".{name}.partial")
+        # fsync bloků a adresářů (False jen pro dočasné výstupy, např. benchmarky)
+        self.fsync = fsync
+        self.files = []
+
+    def __enter__(self):
+        shutil.rmtree(self.staging, ignore_errors=True)
+        os.makedirs(self.staging)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            shutil.rmtree(self.staging, ignore_errors=True)
+
+    def add(self, name, data):
+        """data: bytes, nebo kusy bytes (velký blok se pak neskládá v paměti)."""
+        # stejný název bloku se v kontejneru přepisuje – platí poslední, jako dřív
+        with open(os.path.join(self.staging, name), 'wb', buffering=BUFFER_SIZE) as f:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                f.write(data)
+            else:
+                f.writelines(data)
+            if self.fsync:
+                fsync_file(f)
+        self.files.append(name)
+
+    def commit(self):
+        old = None
+        if os.path.exists(self.output_dir):
+            old = f"{self.staging[:-len('.partial')]}.old"
+            shutil.rmtree(old, ignore_errors=True)
+            os.replace(self.output_dir, old)
+        if self.fsync:
+            # záznamy souborů v .partial složce musí být na disku dřív než přejmenování
+            fsync_dir(self.staging)
+        os.replace(self.staging, self.output_dir)
+        if self.fsync:
+            fsync_dir(self.parent)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
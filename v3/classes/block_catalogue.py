@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import sqlite3
+
+from classes.file_name_parser import (container_physical_volume, container_spectrum_type, ContainerRecord,
+                                      BlockRecord, ENTRY_KEYS, container_line)
+from classes.gras_reader import BlockIndex, BlockTypeIndex
+from classes.atomic_output import atomic_open
+
+CATALOGUE_PATH = 'catalogue.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS containers (
+    id INTEGER PRIMARY KEY,
+    file_name TEXT NOT NULL UNIQUE,
+    folder TEXT NOT NULL,
+    source_path TEXT,
+    physical_volume TEXT NOT NULL,
+    spectrum_type TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    container_id INTEGER NOT NULL REFERENCES containers(id) ON DELETE CASCADE,
+    file_path TEXT NOT NULL UNIQUE,
+    file_name TEXT NOT NULL,
+    block_index INTEGER NOT NULL,
+    data_title TEXT,
+    data_type TEXT,
+    module_type TEXT,
+    module_name TEXT,
+    unit TEXT,
+    start_offset INTEGER NOT NULL,
+    data_offset INTEGER NOT NULL,
+    end_offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS properties (
+    block_id INTEGER NOT NULL REFERENCES blocks(id) ON DELETE CASCADE,
+    ordinal INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (block_id, ordinal)
+);
+CREATE INDEX IF NOT EXISTS idx_containers_volume ON containers(physical_volume);
+CREATE INDEX IF NOT EXISTS idx_containers_spectrum ON containers(spectrum_type);
+CREATE INDEX IF NOT EXISTS idx_blocks_container ON blocks(container_id);
+CREATE INDEX IF NOT EXISTS idx_blocks_type ON blocks(data_type);
+CREATE INDEX IF NOT EXISTS idx_blocks_module ON blocks(module_type);
+CREATE INDEX IF NOT EXISTS idx_blocks_title ON blocks(data_title);
+"""
+
+
+def block_unit(block):
+    """Jednotka prvního sloupce dat (stejně jako tabulka modulů v reportu)."""
+    return block.parsed.unit
+
+
+class BlockCatalogue:
+    """
+    SQLite katalog kontejnerů a bloků (catalogue.sqlite), který nahrazuje
+    file_map.json a properties.json. Zapisuje do něj GrasBlockSplitter
+    (kontejnery, bloky a jejich offsety v kontejneru) a CsvPropertiesCollector
+    (vlastnosti z hlaviček); report a plotter se ho jen dotazují, např.
+
+        catalogue.query_blocks(physical_volume='U1-AD585', module_type='DOSE')
+
+    JSON soubory ve starém formátu jdou vyexportovat přes export_json().
+    """
+    def __init__(self, path=CATALOGUE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        columns = {r['name'] for r in self.conn.execute("PRAGMA table_info(containers)")}
+        if 'source_path' not in columns:
+            # katalog z verze bez split-free režimu
+            self.conn.execute("ALTER TABLE containers ADD COLUMN source_path TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    # --- zápis ---
+
+    def replace_container(self, file_name, folder, blocks, source_path=None):
+        """
+        Zapíše kontejner a jeho bloky, předchozí záznam (včetně vlastností) nahradí.
+        blocks: [(cesta k CSV bloku, GrasBlock), ...]; offsety bloků jsou
+        v souboru source_path (původní kontejner).
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM containers WHERE file_name = ?", (file_name,))
+            cur = self.conn.execute(
+                "INSERT INTO containers (file_name, folder, source_path, physical_volume, spectrum_type)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (file_name, _norm(folder), source_path, container_physical_volume(file_name),
+                 container_spectrum_type(file_name)),
+            )
+            container_id = cur.lastrowid
+            rows = {}
+            # stejný název bloku se v kontejneru přepisuje – platí poslední, jako na disku
+            for file_path, block in blocks:
+                file_path = _norm(file_path)
+                rows[file_path] = (
+                    container_id, file_path, os.path.basename(file_path), block.index,
+                    block.title, block.data_type, block.module_type, block.module_name,
+                    block_unit(block), block.start, block.data_start, block.end,
+                )
+            self.conn.executemany(
+                "INSERT INTO blocks (container_id, file_path, file_name, block_index, data_title, data_type,"
+                " module_type, module_name, unit, start_offset, data_offset, end_offset)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows.values(),
+            )
+
+    def remove_container(self, file_name):
+        with self.conn:
+            self.conn.execute("DELETE FROM containers WHERE file_name = ?", (file_name,))
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM containers")
+
+    def set_properties(self, file_path, props):
+        block_id = self.conn.execute(
+            "SELECT id FROM blocks WHERE file_path = ?", (_norm(file_path),)
+        ).fetchone()
+        if block_id is None:
+            raise KeyError(f"Block {file_path} is not in the catalogue")
+        self.conn.execute("DELETE FROM properties WHERE block_id = ?", (block_id[0],))
+        self.conn.executemany(
+            "INSERT INTO properties (block_id, ordinal, key, value) VALUES (?, ?, ?, ?)",
+            [(block_id[0], i, k, v) for i, (k, v) in enumerate(props.items())],
+        )
+
+    # --- dotazy ---
+
+    def container_names(self):
+        return [r[0] for r in self.conn.execute("SELECT file_name FROM containers ORDER BY file_name")]
+
+    def has_container(self, file_name):
+        return self.conn.execute(
+            "SELECT 1 FROM containers WHERE file_name = ?", (file_name,)
+        ).fetchone() is not None
+
+    def containers(self):
+        return [dict(r) for r in self.conn.execute("SELECT * FROM containers ORDER BY file_name")]
+
+    def query_blocks(self, physical_volume=None, spectrum_type=None, module_type=None,
+                     data_type=None, data_title=None, file_name=None, container=None):
+        """Bloky (dict včetně údajů o kontejneru) podle libovolné kombinace filtrů."""
+        filters = {
+            'c.physical_volume': physical_volume,
+            'c.spectrum_type': spectrum_type,
+            'b.module_type': module_type,
+            'b.data_type': data_type,
+            'b.data_title': data_title,
+            'b.file_name': file_name,
+            'c.file_name': container,
+        }
+        where = [f"{column} = ?" for column, value in filters.items() if value is not None]
+        params = [value for value in filters.values() if value is not None]
+        sql = (
+            "SELECT b.*, c.file_name AS container_file, c.folder, c.physical_volume, c.spectrum_type"
+            " FROM blocks b JOIN containers c ON c.id = b.container_id"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY c.file_name, b.file_path"
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def block_paths(self, **filters):
+        return [row['file_path'] for row in self.query_blocks(**filters)]
+
+    def block_index(self):
+        """BlockIndex s offsety všech bloků v původních kontejnerech (pro režim bez dělení)."""
+        index = BlockIndex()
+        for r in self.conn.execute(
+            "SELECT b.file_path, c.source_path, b.start_offset, b.end_offset"
+            " FROM blocks b JOIN containers c ON c.id = b.container_id WHERE c.source_path IS NOT NULL"
+        ):
+            index.add(r[0], r[1], r[2], r[3])
+        return index
+
+    def type_index(self):
+        """BlockTypeIndex všech bloků jedním dotazem (typy se ukládají při dělení)."""
+        types = BlockTypeIndex()
+        for r in self.conn.execute("SELECT file_path, data_type, module_type, data_title FROM blocks"):
+            types.add(r[0], r[1], r[2], r[3])
+        return types
+
+    def blocks_missing_properties(self):
+        """[(kontejner, cesta k bloku)] bloků, ke kterým ještě nejsou uložené vlastnosti."""
+        return [tuple(r) for r in self.conn.execute(
+            "SELECT c.file_name, b.file_path FROM blocks b JOIN containers c ON c.id = b.container_id"
+            " WHERE NOT EXISTS (SELECT 1 FROM properties p WHERE p.block_id = b.id)"
+            " ORDER BY c.file_name, b.file_path"
+        )]
+
+    def file_map(self):
+        """Obsah file_map.json (už s prefixem generated-data/)."""
+        file_map = {name: [] for name in self.container_names()}
+        for r in self.conn.execute(
+            "SELECT c.file_name, b.file_path FROM blocks b JOIN containers c ON c.id = b.container_id"
+            " ORDER BY c.file_name, b.file_path"
+        ):
+            file_map[r[0]].append(r[1])
+        return file_map
+
+    def property_records(self):
+        """(ContainerRecord, [BlockRecord]) po kontejnerech v pořadí file_map – čte se průběžně."""
+        container = None
+        blocks = {}
+        for r in self.conn.execute(
+            "SELECT c.file_name, c.folder, c.physical_volume, b.file_path, p.key, p.value FROM properties p"
+            " JOIN blocks b ON b.id = p.block_id JOIN containers c ON c.id = b.container_id"
+            " ORDER BY c.file_name, b.file_path, p.ordinal"
+        ):
+            if container is None or container.container_file != r[0]:
+                if container is not None:
+                    yield container, list(blocks.values())
+                container = ContainerRecord(r[0], r[1], r[2])
+                blocks = {}
+            if r[3] not in blocks:
+                blocks[r[3]] = BlockRecord.from_path(container, r[3], {})
+            if r[4] not in ENTRY_KEYS:
+                blocks[r[3]].props[sys.intern(r[4])] = r[5]
+        if container is not None:
+            yield container, list(blocks.values())
+
+    def properties(self):
+        """Záznamy properties.json – jeden slovník na blok v pořadí file_map."""
+        return [block.entry() for _, blocks in self.property_records() for block in blocks]
+
+    def export_json(self, file_map_path='file_map.json', properties_path='properties.ndjson'):
+        """file_map.json a vlastnosti bloků jako NDJSON po kontejnerech (viz container_line)."""
+        with atomic_open(file_map_path, 'w', encoding='utf-8') as f:
+            json.dump(self.file_map(), f, indent=4)
+        with atomic_open(properties_path, 'w', encoding='utf-8') as f:
+            for container, blocks in self.property_records():
+                f.write(container_line(container, blocks) + "\n")
+
+
+def _norm(path):
+    return os.path.normpath(path).replace(os.sep, '/')
+
+
+if __name__ == "__main__":
+    catalogue = BlockCatalogue()
+    catalogue.export_json()
+    print(f"Exported {CATALOGUE_PATH} → file_map.json, properties.ndjson")
@@ -0,0 +1,179 @@
+import os
+import json
+import hashlib
+
+from classes.atomic_output import atomic_open
+from classes.gras_archive import container_name, split_member, source_stat, member_digest
+
+MANIFEST_VERSION = 2
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_digest(path):
+    """Hash kontejneru; u člena zip archivu jeho CRC a velikost z archivu."""
+    if split_member(path)[1] is not None:
+        return member_digest(path)
+    return file_digest(path)
+
+
+def bytes_digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def norm_path(path):
+    return os.path.normpath(path).replace(os.sep, '/')
+
+
+class BuildManifest:
+    """
+    Záznam o posledním běhu pipeline (build_manifest.json), podle kterého
+    jednotlivé kroky přeskočí práci, jejíž vstupy se nezměnily.
+
+    - containers: velikost, mtime a hash každého vstupního kontejneru
+      a hash a velikost každého bloku, který z něj splitter vytvořil
+    - stages: pro krok (scan, plot, properties) a klíč uložený hash vstupu,
+      výstupní soubory a případná data kroku
+    """
+    def __init__(self, path='build_manifest.json', reset=False):
+        self.path = path
+        self.containers = {}
+        self.stages = {}
+        if not reset and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.containers = data.get('containers', {})
+                    self.stages = data.get('stages', {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable build manifest {path}: {e}")
+        self._block_index = None
+
+    # --- kontejnery (split) ---
+
+    def container_unchanged(self, file_path, in_place=False):
+        """
+        True, pokud kontejner odpovídá záznamu a jeho bloky jsou na disku
+        se zaznamenanou velikostí – useknutý blok (třeba po výpadku napájení)
+        kontejner znovu rozdělí (u kontejnerů čtených bez dělení žádné soubory bloků nejsou).
+        Hash se počítá jen tehdy, když nesedí velikost nebo mtime.
+        """
+        record = self.containers.get(container_name(file_path))
+        if record is None:
+            return False
+        if record.get('in_place', False) != in_place:
+            return False
+        if not in_place and not self._blocks_intact(record):
+            return False
+
+        # u člena zipu velikost a mtime celého archivu
+        st = source_stat(file_path)
+        if st.st_size == record['size'] and st.st_mtime_ns == record['mtime_ns']:
+            return True
+        if st.st_size != record['size'] and split_member(file_path)[1] is None:
+            return False
+        if source_digest(file_path) != record['sha1']:
+            return False
+        # jen "touch" (nebo změna jiného člena archivu) – obsah stejný, aktualizujeme podpis
+        record['size'], record['mtime_ns'] = st.st_size, st.st_mtime_ns
+        return True
+
+    @staticmethod
+    def _blocks_intact(record):
+        sizes = record.get('sizes', {})
+        for path in record['blocks']:
+            try:
+                if os.path.getsize(path) != sizes.get(path):
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def record_container(self, file_path, blocks, in_place=False, sha1=None):
+        """
+        blocks: cesta k CSV bloku -> hash jeho obsahu; sha1: hash kontejneru
+        spočítaný při dělení (GrasBlockReader digest=True), jinak se čte soubor znovu.
+        """
+        st = source_stat(file_path)
+        record = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha1': sha1 or source_digest(file_path),
+            'blocks': {norm_path(p): d for p, d in sorted(blocks.items())},
+        }
+        if in_place:
+            record['in_place'] = True
+        else:
+            record['sizes'] = {p: os.path.getsize(p) for p in record['blocks']}
+        self.containers[container_name(file_path)] = record
+        self._block_index = None
+
+    def forget_container(self, filename):
+        self.containers.pop(filename, None)
+        self._block_index = None
+
+    def block_digest(self, path):
+        """Hash bloku zaznamenaný při dělení, jinak se spočítá ze souboru."""
+        if self._block_index is None:
+            self._block_index = {
+                p: d
+                for record in self.containers.values()
+                for p, d in record['blocks'].items()
+            }
+        key = norm_path(path)
+        digest = self._block_index.get(key)
+        if digest is None:
+            digest = file_digest(path)
+            self._block_index[key] = digest
+        return digest
+
+    # --- ostatní kroky ---
+
+    def unchanged(self, stage, key, digest):
+        record = self.stages.get(stage, {}).get(norm_path(key))
+        return (
+            record is not None
+            and record['digest'] == digest
+            and all(os.path.exists(p) for p in record['outputs'])
+        )
+
+    def get(self, stage, key):
+        record = self.stages.get(stage, {}).get(norm_path(key))
+        return record.get('data') if record else None
+
+    def record(self, stage, key, digest, outputs=(), data=None):
+        entry = {'digest': digest, 'outputs': [norm_path(p) for p in outputs]}
+        if data is not None:
+            entry['data'] = data
+        self.stages.setdefault(stage, {})[norm_path(key)] = entry
+
+    def prune(self, stage, keep_keys):
+        """
+        Odebere záznamy kroku, které už nemají vstup, a smaže jejich výstupy.
+        Vrací seznam smazaných souborů.
+        """
+        keep = {norm_path(k) for k in keep_keys}
+        records = self.stages.get(stage, {})
+        removed = []
+        for key in [k for k in records if k not in keep]:
+            for output in records.pop(key)['outputs']:
+                if os.path.exists(output):
+                    os.remove(output)
+                    removed.append(output)
+        return removed
+
+    def save(self):
+        data = {
+            'version': MANIFEST_VERSION,
+            'containers': self.containers,
+            'stages': self.stages,
+        }
+        with atomic_open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
@@ -0,0 +1,253 @@
+import os
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from classes.histogram_store import HistogramStore, load_block_with_header
+from classes.file_name_parser import format_physical_volume
+from classes.gras_header import BlockHeader
+
+SPECTRA = ('solar_proton', 'trapped_electron', 'trapped_proton')
+QUANTITIES = ('dose', 'niel', 'fluence')
+
+# STAT_DOUBLE bloky kontejneru pro jednotlivé veličiny (název CSV v generated-data)
+TOTAL_BLOCKS = {
+    'dose': 'total_dose',
+    'niel': 'total_niel',
+    'fluence': 'total_fluence',
+}
+SPECIES_BLOCKS = {
+    'dose': 'total_dose_per_particle_species',
+    'niel': 'total_non_ionising_dose_per_particle_species',
+}
+
+
+def block_species(header):
+    """Druhy částic z řádku 'PARTICLE SPECIES',   -3,'e-','gamma','proton'."""
+    return BlockHeader.parse(header).values('PARTICLE SPECIES')
+
+
+def _read_stat(csv_file, store=None, index=None):
+    """(hodnoty, chyby, jednotka, druhy částic) STAT_DOUBLE bloku; None pokud blok chybí."""
+    try:
+        header, _, columns, data = load_block_with_header(csv_file, store, index)
+    except (OSError, ValueError, KeyError):
+        return None
+    if data.shape[0] < 2 or data.shape[1] == 0:
+        return None
+    unit = columns[0][1] if columns else ''
+    return np.asarray(data[0], dtype=np.float64), np.asarray(data[1], dtype=np.float64), unit, block_species(header)
+
+
+def load_container(folder, store=None, index=None, quantities=QUANTITIES):
+    """
+    Celkové hodnoty a rozpad podle druhů částic jednoho kontejneru:
+    {veličina: {'value', 'error', 'unit', 'species': {druh: (hodnota, chyba)}}}.
+    Celková hodnota je poslední řádek bloku (stejně jako tabulka TID v reportu).
+    """
+    result = {}
+    for quantity in quantities:
+        total = _read_stat(os.path.join(folder, f"{TOTAL_BLOCKS[quantity]}.csv"), store, index)
+        if total is None:
+            continue
+        values, errors, unit, _ = total
+        entry = {'value': float(values[-1]), 'error': float(errors[-1]), 'unit': unit, 'species': {}}
+        if quantity in SPECIES_BLOCKS:
+            per_species = _read_stat(os.path.join(folder, f"{SPECIES_BLOCKS[quantity]}.csv"), store, index)
+            if per_species is not None:
+                values, errors, _, names = per_species
+                entry['species'] = {
+                    name: (float(v), float(e)) for name, v, e in zip(names, values, errors)
+                }
+        result[quantity] = entry
+    return result
+
+
+class DoseAggregation:
+    """
+    Výsledky všech objemů × spekter × veličin v jednom NumPy poli.
+
+      values, errors – float64 (objemy, spektra, veličiny), NaN = kontejner/blok chybí
+      species[veličina] – (názvy druhů, hodnoty, chyby) s poli (objemy, spektra, druhy)
+
+    Součty přes spektra a kvadratické skládání chyb jsou vektorové, totéž pole
+    používá tabulka TID v reportu i JSON export (python -m classes.dose_aggregation).
+    """
+    def __init__(self, volumes, spectra, quantities, values, errors, units, species):
+        self.volumes = list(volumes)
+        self.spectra = list(spectra)
+        self.quantities = list(quantities)
+        self.values = values
+        self.errors = errors
+        self.units = units
+        self.species = species
+
+    @classmethod
+    def from_containers(cls, cells, spectra=SPECTRA, quantities=QUANTITIES):
+        """cells: {(objem, spektrum): výsledek load_container}; neznámá spektra se ignorují."""
+        volumes = sorted({volume for volume, _ in cells})
+        v_index = {v: i for i, v in enumerate(volumes)}
+        s_index = {s: i for i, s in enumerate(spectra)}
+        shape = (len(volumes), len(spectra), len(quantities))
+        values = np.full(shape, np.nan)
+        errors = np.full(shape, np.nan)
+        units = {}
+        species_names = {q: [] for q in quantities}
+        species_cells = []
+
+        for (volume, spectrum), data in cells.items():
+            if spectrum not in s_index:
+                continue
+            v, s = v_index[volume], s_index[spectrum]
+            for q, quantity in enumerate(quantities):
+                entry = data.get(quantity)
+                if entry is None:
+                    continue
+                values[v, s, q] = entry['value']
+                errors[v, s, q] = entry['error']
+                units.setdefault(quantity, entry['unit'])
+                for name in entry['species']:
+                    if name not in species_names[quantity]:
+                        species_names[quantity].append(name)
+                species_cells.append((v, s, quantity, entry['species']))
+
+        species = {}
+        for quantity, names in species_names.items():
+            if not names:
+                continue
+            p_index = {name: i for i, name in enumerate(names)}
+            sp_values = np.full((len(volumes), len(spectra), len(names)), np.nan)
+            sp_errors = np.full_like(sp_values, np.nan)
+            for v, s, q, per_species in species_cells:
+                if q != quantity:
+                    continue
+                for name, (value, error) in per_species.items():
+                    sp_values[v, s, p_index[name]] = value
+                    sp_errors[v, s, p_index[name]] = error
+            species[quantity] = (names, sp_values, sp_errors)
+
+        return cls(volumes, spectra, quantities, values, errors, units, species)
+
+    def _q(self, quantity):
+        return self.quantities.index(quantity)
+
+    @property
+    def present(self):
+        return ~np.isnan(self.values)
+
+    def totals(self):
+        """Součet přes spektra -> (objemy, veličiny)."""
+        return np.nansum(self.values, axis=1)
+
+    def total_errors(self):
+        """Chyby součtů, kvadraticky složené přes spektra -> (objemy, veličiny)."""
+        return np.sqrt(np.nansum(self.errors ** 2, axis=1))
+
+    def species_totals(self, quantity):
+        """(názvy druhů, součty (objemy, druhy), chyby (objemy, druhy)) přes všechna spektra."""
+        names, values, errors = self.species[quantity]
+        return names, np.nansum(values, axis=1), np.sqrt(np.nansum(errors ** 2, axis=1))
+
+    def scaled(self, factor):
+        """
+        Kopie přepočtená na délku mise: všechny hodnoty i chyby × factor
+        (např. délka mise / doba, na kterou je normovaná simulace).
+        """
+        species = {q: (names, v * factor, e * factor) for q, (names, v, e) in self.species.items()}
+        return DoseAggregation(self.volumes, self.spectra, self.quantities,
+                               self.values * factor, self.errors * factor, dict(self.units), species)
+
+    def table_rows(self, quantity='dose'):
+        """Řádky tabulky [objem, hodnota ± chyba po spektrech..., součet] jako v reportu."""
+        q = self._q(quantity)
+        values = self.values[:, :, q]
+        errors = self.errors[:, :, q]
+        totals = self.totals()[:, q]
+        total_errors = self.total_errors()[:, q]
+        rows = []
+        for v, volume in enumerate(self.volumes):
+            row = [volume]
+            for s in range(len(self.spectra)):
+                if np.isnan(values[v, s]):
+                    row.append("-")
+                else:
+                    row.append(f"{values[v, s]:.3e} ± {errors[v, s]:.1e}")
+            row.append(f"{totals[v]:.3e} ± {total_errors[v]:.1e}" if totals[v] > 0 else "-")
+            rows.append(row)
+        return rows
+
+    def to_dict(self):
+        totals = self.totals()
+        total_errors = self.total_errors()
+        result = {'spectra': self.spectra, 'quantities': {}}
+        for q, quantity in enumerate(self.quantities):
+            volumes = {}
+            for v, volume in enumerate(self.volumes):
+                spectra = {
+                    spectrum: None if np.isnan(self.values[v, s, q])
+                    else {'value': float(self.values[v, s, q]), 'error': float(self.errors[v, s, q])}
+                    for s, spectrum in enumerate(self.spectra)
+                }
+                volumes[volume] = {
+                    'spectra': spectra,
+                    'total': float(totals[v, q]),
+                    'total_error': float(total_errors[v, q]),
+                }
+            if quantity in self.species:
+                names, sp_totals, sp_errors = self.species_totals(quantity)
+                for v, volume in enumerate(self.volumes):
+                    volumes[volume]['species'] = {
+                        name: {'value': float(sp_totals[v, p]), 'error': float(sp_errors[v, p])}
+                        for p, name in enumerate(names)
+                    }
+            result['quantities'][quantity] = {'unit': self.units.get(quantity, ''), 'volumes': volumes}
+        return result
+
+
+def aggregate_catalogue(catalogue, store=None, jobs=0):
+    """DoseAggregation pro všechny kontejnery v BlockCatalogue (načítání ve vláknech)."""
+    index = catalogue.block_index()
+    containers = catalogue.containers()
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda c: load_container(c['folder'], store, index), containers)
+        cells = {
+            (format_physical_volume(c['physical_volume']), c['spectrum_type']): result
+            for c, result in zip(containers, results)
+        }
+    return DoseAggregation.from_containers(cells)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dose / NIEL / fluence totals per volume and spectrum")
+    parser.add_argument('--catalogue', default='catalogue.sqlite', help="block catalogue from main.py")
+    parser.add_argument('--store', default='histogram-store', help="histogram store directory")
+    parser.add_argument('--quantity', choices=QUANTITIES, default='dose', help="quantity printed as a table")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="mission-duration scaling factor applied to all values and errors")
+    parser.add_argument('--json', metavar='PATH', help="write all quantities as JSON")
+    parser.add_argument('-j', '--jobs', type=int, default=0, help="threads for loading containers (0 = all cores)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from classes.block_catalogue import BlockCatalogue
+
+    args = parse_args()
+    catalogue = BlockCatalogue(args.catalogue)
+    aggregation = aggregate_catalogue(catalogue, HistogramStore(args.store), args.jobs)
+    catalogue.close()
+    if args.scale != 1.0:
+        aggregation = aggregation.scaled(args.scale)
+
+    unit = aggregation.units.get(args.quantity, '')
+    print(f"\033[1;36m{args.quantity.upper()} [{unit}]\033[0m  " + " | ".join(aggregation.spectra) + " | total")
+    for row in aggregation.table_rows(args.quantity):
+        print("  " + " | ".join(row))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(aggregation.to_dict(), f, indent=2, ensure_ascii=False)
+        print(f"\n✔ Saved {args.json}")
@@ -1,6 +1,35 @@
 import os
-import json
 import re
+import sys
+import json
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+from classes.build_manifest import bytes_digest
+from classes.gras_reader import read_header
+from classes.atomic_output import atomic_open
+
+# pattern pro extrakci názvu physical_volume z container_name
+PHYSICAL_VOLUME_PATTERN = re.compile(r'v6-(.*?)-DETECTOR', re.IGNORECASE)
+
+
+def container_physical_volume(container_name):
+    m = PHYSICAL_VOLUME_PATTERN.search(container_name)
+    return m.group(1).strip() if m else "N/A"
+
+
+def format_physical_volume(raw_pv):
+    """Zkrácený název physical volume pro tabulky reportu."""
+    if len(raw_pv) >= 9 and raw_pv[3] == '-':
+        return f"{raw_pv[:3]}-{raw_pv[4:9]}"
+    elif len(raw_pv) >= 8:
+        return f"{raw_pv[:3]}-{raw_pv[3:8]}"
+    return raw_pv
+
+
+def container_spectrum_type(container_name):
+    """solar_proton / trapped_proton / trapped_electron z názvu kontejneru."""
+    return '_'.join(container_name.split('_')[:2])
 
 
 def add_prefix_to_file_map(file_map_path, prefix='generated-data'):
@@ -36,84 +65,240 @@ def add_prefix_to_file_map(file_map_path, prefix='generated-data'):
     print(f"Updated {file_map_path} with prefix '{prefix}/'")
 
 
+# pole záznamu, která nejsou z hlavičky bloku (v katalogu a NDJSON se neukládají)
+ENTRY_KEYS = ('container_file', 'physical_volume', 'folder', 'file_name', 'file_path', 'plot_title')
+
+
+class ContainerRecord:
+    """Údaje kontejneru sdílené všemi jeho bloky – řetězce jsou internované, v paměti jednou."""
+    __slots__ = ('container_file', 'physical_volume', 'directory', 'folder')
+
+    def __init__(self, container_file, directory, physical_volume=None):
+        self.container_file = sys.intern(container_file)
+        # složka bloků, např. 'generated-data/<stem>'
+        self.directory = sys.intern(directory)
+        self.physical_volume = sys.intern(physical_volume or container_physical_volume(container_file))
+        self.folder = sys.intern(directory.replace('/', '__'))
+
+
+class BlockRecord:
+    """Vlastnosti jednoho bloku: odkaz na ContainerRecord, název souboru a textová pole hlavičky."""
+    __slots__ = ('container', 'file_name', 'props')
+
+    def __init__(self, container, file_name, props):
+        self.container = container
+        self.file_name = file_name
+        # klíče hlaviček se opakují v každém bloku
+        self.props = {sys.intern(k): v for k, v in props.items() if k not in ENTRY_KEYS}
+
+    @classmethod
+    def from_path(cls, container, rel_csv, props):
+        return cls(container, os.path.splitext(os.path.basename(rel_csv))[0], props)
+
+    @property
+    def file_path(self):
+        if not self.container.directory:
+            return f"{self.file_name}.csv"
+        return f"{self.container.directory}/{self.file_name}.csv"
+
+    @property
+    def plot_title(self):
+        folder = self.container.folder
+        return f"output_plots/{folder}/{self.file_name}.png" if folder else f"output_plots/{self.file_name}.png"
+
+    def entry(self):
+        """Záznam ve formátu properties.json (jeden slovník na blok)."""
+        container = self.container
+        # Zajistíme základní pole a doplníme chybějící hodnoty jako 'N/A'
+        entry = {
+            "container_file": container.container_file,
+            "physical_volume": container.physical_volume,
+            "folder": container.folder,
+            "file_name": self.file_name,
+            "file_path": self.file_path,
+            "plot_title": self.plot_title,
+            "HIST_TITLE": self.props.get("HIST_TITLE", "N/A"),
+        }
+        # Přidej další vlastnosti z CSV (bez přepsání těch, co už jsou)
+        for key, val in self.props.items():
+            if key not in entry:
+                entry[key] = val
+        return entry
+
+
+def container_line(container, blocks):
+    """
+    Jeden řádek NDJSON: údaje kontejneru jednou a pod nimi bloky jen s názvem
+    souboru a poli hlavičky. Velikost roste s počtem kontejnerů, ne bloků × cesty.
+    """
+    return json.dumps({
+        'container_file': container.container_file,
+        'physical_volume': container.physical_volume,
+        'folder': container.folder,
+        'directory': container.directory,
+        'blocks': [{'file_name': b.file_name, **b.props} for b in blocks],
+    }, ensure_ascii=False, separators=(',', ':'))
+
+
+def parse_container_line(line):
+    """(ContainerRecord, [BlockRecord]) z řádku container_line()."""
+    data = json.loads(line)
+    container = ContainerRecord(data['container_file'], data['directory'], data['physical_volume'])
+    blocks = []
+    for block in data['blocks']:
+        file_name = block.pop('file_name')
+        blocks.append(BlockRecord(container, file_name, block))
+    return container, blocks
+
+
+def read_properties(path):
+    """
+    Záznamy bloků (slovníky jako v properties.json) ze souboru vlastností:
+    NDJSON po kontejnerech z CsvPropertiesCollector / BlockCatalogue.export_json,
+    nebo starší properties.json se seznamem záznamů.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                _, blocks = parse_container_line(line)
+                for block in blocks:
+                    yield block.entry()
+
+
+def header_properties(filepath, store=None, index=None):
+    """Textová pole hlavičky bloku (popisy sloupců a numerická pole se nepřenáší)."""
+    try:
+        return read_header(filepath, store, index).properties()
+    except (OSError, ValueError) as e:
+        print(f"ERROR reading {filepath}: {e}")
+        return {}
+
+
 class CsvPropertiesCollector:
     """
     Načte file_map.json (už s prefixem) a pro každý CSV soubor extrahuje
-    vlastnosti z hlavičky. Výsledkem je properties.json.
+    vlastnosti z hlavičky. Výsledkem je properties.ndjson (řádek na kontejner,
+    viz container_line) nebo vlastnosti bloků v katalogu.
+
+    S jobs > 1 se hlavičky parsují v poolu procesů; s manifestem se přepisují
+    jen řádky změněných kontejnerů, ostatní se zkopírují z minulého výstupu.
     """
     def __init__(self,
                  root_folder='generated-data',
                  file_map_path='file_map.json',
-                 output_file='properties.json'):
+                 output_file='properties.ndjson',
+                 manifest=None,
+                 store=None,
+                 catalogue=None,
+                 index=None,
+                 jobs=1):
         self.root_folder = root_folder
         self.file_map_path = file_map_path
         self.output_file = output_file
-
-        # pattern pro klíče/hodnoty v hlavičce CSV
-        self.key_value_pattern = re.compile(r"'([^']+)',\s*-?\d+,\s*'([^']*)'")
-        # pattern pro extrakci názvu physical_volume z container_name
-        self.physical_volume_pattern = re.compile(r'v6-(.*?)-DETECTOR', re.IGNORECASE)
+        # BuildManifest pro inkrementální běh; None = vše se načte znovu
+        self.manifest = manifest
+        # HistogramStore – hlavičky bloků se berou z jeho metadat
+        self.store = store
+        # BlockCatalogue – file map se čte z katalogu a vlastnosti se ukládají do něj
+        self.catalogue = catalogue
+        # BlockIndex – hlavičky bloků bez rozdělených souborů (režim bez dělení)
+        self.index = index
+        # počet procesů pro parsování hlaviček (0 = všechna jádra)
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.physical_volume_pattern = PHYSICAL_VOLUME_PATTERN
 
     def parse_csv_headers(self, filepath):
-        props = {}
+        return header_properties(filepath, self.store, self.index)
+
+    def parse_many(self, paths):
+        """Vlastnosti hlaviček v pořadí paths; s jobs > 1 paralelně (výsledky průběžně)."""
+        paths = [p.replace('/', os.sep) for p in paths]
+        if self.jobs <= 1 or len(paths) < 2:
+            yield from map(self.parse_csv_headers, paths)
+            return
+        chunksize = max(1, len(paths) // (self.jobs * 4))
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            yield from executor.map(header_properties, paths, repeat(self.store), repeat(self.index),
+                                    chunksize=chunksize)
+
+    def load_previous(self):
+        """Řádky minulého properties.ndjson podle kontejneru (beze změny se jen zkopírují)."""
+        previous = {}
+        if not os.path.exists(self.output_file):
+            return previous
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
+            with open(self.output_file, 'r', encoding='utf-8') as f:
                 for line in f:
-                    m = self.key_value_pattern.search(line)
-                    if m:
-                        key, val = m.group(1), m.group(2)
-                        props[key] = val
-        except Exception as e:
-            print(f"ERROR reading {filepath}: {e}")
-        return props
+                    if line.strip():
+                        previous[json.loads(line)['container_file']] = line.rstrip('\n')
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+        return previous
+
+    def container_digest(self, relpaths):
+        parts = [f"{p}:{self.manifest.block_digest(p.replace('/', os.sep))}" for p in relpaths]
+        return bytes_digest("\n".join(parts).encode('utf-8'))
+
+    def collect_into_catalogue(self):
+        """Doplní vlastnosti jen blokům, které je v katalogu ještě nemají (nové nebo změněné kontejnery)."""
+        pending = self.catalogue.blocks_missing_properties()
+        self.save_into_catalogue(pending, self.parse_many([p for _, p in pending]))
+
+    def save_into_catalogue(self, pending, properties):
+        """Uloží vlastnosti bloků z blocks_missing_properties() (properties ve stejném pořadí)."""
+        # do katalogu jdou jen pole hlavičky, údaje kontejneru má v tabulce containers;
+        # HIST_TITLE je vždy, aby měl záznam i blok bez textových polí
+        for (_, rel_csv), props in zip(pending, properties):
+            self.catalogue.set_properties(rel_csv, {'HIST_TITLE': props.get('HIST_TITLE', 'N/A'), **props})
+        self.catalogue.commit()
+        print(f"\nDone — collected {len(pending)} CSVs → {self.catalogue.path}")
 
     def collect_properties(self):
+        if self.catalogue is not None:
+            return self.collect_into_catalogue()
+
         # Načteme už upravený file_map.json
         with open(self.file_map_path, 'r', encoding='utf-8') as fm:
             file_map = json.load(fm)
 
-        all_props = []
+        previous = {}
+        if self.manifest is not None:
+            previous = self.load_previous()
+            self.manifest.prune('properties', file_map.keys())
 
+        # kontejnery, jejichž bloky se musí znovu načíst
+        stale = []
         for container_name, relpaths in file_map.items():
-            # extrahujeme physical_volume
-            m = self.physical_volume_pattern.search(container_name)
-            physical_vol = m.group(1).strip() if m else "N/A"
-
-            for rel_csv in relpaths:
-                full_csv = rel_csv.replace('/', os.sep)
-                csv_props = self.parse_csv_headers(full_csv)
-
-                folder = os.path.dirname(rel_csv).replace('/', '__')
-                fname = os.path.splitext(os.path.basename(rel_csv))[0]
-                plot_path = (
-                    f"output_plots/{folder}/{fname}.png"
-                    if folder else
-                    f"output_plots/{fname}.png"
-                )
-
-                # Zajistíme základní pole a doplníme chybějící hodnoty jako 'N/A'
-                entry = {
-                    "container_file": container_name,
-                    "physical_volume": physical_vol,
-                    "folder": folder,
-                    "file_name": fname,
-                    "file_path": rel_csv,
-                    "plot_title": plot_path,
-                    "HIST_TITLE": csv_props.get("HIST_TITLE", "N/A"),
-                }
-
-                # Přidej další vlastnosti z CSV (bez přepsání těch, co už jsou)
-                for key, val in csv_props.items():
-                    if key not in entry:
-                        entry[key] = val
-
-                all_props.append(entry)
-
-        # uložíme výsledek
-        with open(self.output_file, 'w', encoding='utf-8') as out:
-            json.dump(all_props, out, indent=4, ensure_ascii=False)
-
-        print(f"\nDone — collected {len(all_props)} CSVs → {self.output_file}")
+            if self.manifest is not None:
+                digest = self.container_digest(relpaths)
+                if container_name in previous and self.manifest.unchanged('properties', container_name, digest):
+                    continue
+                self.manifest.record('properties', container_name, digest)
+            stale.append(container_name)
+
+        count = sum(len(relpaths) for relpaths in file_map.values())
+        if self.manifest is not None and not stale and set(previous) == set(file_map):
+            print(f"\nUp to date — {self.output_file} unchanged ({count} CSVs)")
+            return
+
+        stale_set = set(stale)
+        props = self.parse_many([p for name in stale for p in file_map[name]])
+        # řádky se zapisují průběžně, v paměti je vždy jen jeden kontejner
+        with atomic_open(self.output_file, 'w', encoding='utf-8') as out:
+            for container_name, relpaths in file_map.items():
+                if container_name not in stale_set:
+                    out.write(previous[container_name] + "\n")
+                    continue
+                container = ContainerRecord(container_name, os.path.dirname(relpaths[0]) if relpaths else '')
+                blocks = [BlockRecord.from_path(container, rel_csv, next(props)) for rel_csv in relpaths]
+                out.write(container_line(container, blocks) + "\n")
+
+        print(f"\nDone — collected {count} CSVs ({sum(len(file_map[n]) for n in stale)} parsed) → {self.output_file}")
 
 
 # Použití (například):
@@ -0,0 +1,125 @@
+import os
+import glob
+import gzip
+import hashlib
+import zipfile
+
+# komprimované kontejnery: 'a.csv.gz' / 'a.csv.zst' je kontejner 'a.csv'
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+ARCHIVE_SUFFIX = '.zip'
+CONTAINER_PATTERNS = ('*.csv', '*.csv.gz', '*.csv.zst', '*.zip')
+
+
+def split_member(path):
+    """
+    Kontejner uvnitř zip archivu se adresuje cestou přes archiv:
+    'imported-data/runs.zip/a.csv' -> ('imported-data/runs.zip', 'a.csv').
+    Ostatní cesty -> (path, None).
+    """
+    norm = path.replace(os.sep, '/')
+    marker = norm.lower().find(f"{ARCHIVE_SUFFIX}/")
+    if marker == -1:
+        return path, None
+    end = marker + len(ARCHIVE_SUFFIX)
+    return path[:end], norm[end + 1:]
+
+
+def container_name(path):
+    """Název kontejneru bez kompresní přípony a archivu: 'runs.zip/x/a.csv', 'a.csv.gz' -> 'a.csv'."""
+    name = os.path.basename(split_member(path)[1] or path)
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(f".csv{suffix}"):
+            return name[:-len(suffix)]
+    return name
+
+
+def is_compressed(path):
+    """True pro .csv.gz / .csv.zst a členy zip archivů – čtou se proudem, ne přes mmap."""
+    return split_member(path)[1] is not None or path.endswith(COMPRESSED_SUFFIXES)
+
+
+def source_stat(path):
+    """os.stat souboru na disku (u člena zipu celého archivu)."""
+    return os.stat(split_member(path)[0])
+
+
+def member_digest(path):
+    """Otisk člena zipu z centrálního adresáře (CRC a velikost), bez dekomprese."""
+    archive, member = split_member(path)
+    with zipfile.ZipFile(archive) as z:
+        info = z.getinfo(member)
+    return f"zip:{info.CRC:08x}:{info.file_size}"
+
+
+def zip_members(archive):
+    """Cesty kontejnerů (*.csv) uvnitř zip archivu; rozepsaný / poškozený archiv -> []."""
+    try:
+        with zipfile.ZipFile(archive) as z:
+            names = [i.filename for i in z.infolist() if not i.is_dir() and i.filename.endswith('.csv')]
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"⚠️ Skipping unreadable archive {archive}: {e}")
+        return []
+    return [f"{archive}/{name}" for name in names]
+
+
+def expand_archives(paths):
+    """Zip archivy nahradí jejich kontejnery, ostatní cesty nechá."""
+    expanded = []
+    for path in paths:
+        if path.lower().endswith(ARCHIVE_SUFFIX):
+            expanded.extend(zip_members(path))
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def list_containers(directory):
+    """Kontejnery ve složce: *.csv, *.csv.gz, *.csv.zst a *.csv uvnitř *.zip."""
+    paths = [p for pattern in CONTAINER_PATTERNS for p in glob.glob(os.path.join(directory, pattern))]
+    return sorted(expand_archives(paths))
+
+
+class DigestFile:
+    """
+    Soubor otevřený pro dekompresor, který počítá sha1 přečtených bajtů – hash
+    komprimovaného kontejneru tak vzniká při čtení, bez druhého průchodu souborem.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.sha1 = hashlib.sha1()
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.sha1.update(data)
+        return data
+
+    def hexdigest(self):
+        """sha1 celého souboru; dočte i konec, který dekompresor nepotřeboval."""
+        while self.read(1 << 20):
+            pass
+        return self.sha1.hexdigest()
+
+    def close(self):
+        self.file.close()
+
+
+def open_container(path, fileobj=None):
+    """
+    Binární proud s (dekomprimovaným) obsahem kontejneru. fileobj = už otevřený
+    komprimovaný soubor (DigestFile) pro .gz / .zst, jinak se otevře path.
+    """
+    archive, member = split_member(path)
+    if member is not None:
+        # ZipExtFile si drží vlastní odkaz na soubor, archiv jde hned zavřít
+        with zipfile.ZipFile(archive) as z:
+            return z.open(member)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb') if fileobj is None else gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(f"Reading {os.path.basename(path)} needs the optional 'zstandard' package") from None
+        source = open(path, 'rb') if fileobj is None else fileobj
+        return zstandard.ZstdDecompressor().stream_reader(source, closefd=True)
+    return open(path, 'rb')
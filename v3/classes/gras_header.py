@@ -0,0 +1,122 @@
+import re
+from collections import namedtuple
+
+# Jeden záznam hlavičky GRAS bloku:
+#   'KEY',   -1,'VALUE'                -> HeaderField('KEY', -1, 'VALUE', None)
+#   'KEY',   -3,'e-','gamma','proton'  -> HeaderField('KEY', -3, ('e-', 'gamma', 'proton'), None)
+#   'KEY',    1,  123, 'UNITS'         -> HeaderField('KEY', 1, 123.0, 'UNITS')
+# flag < 0 = počet řetězcových hodnot, flag > 0 = počet číselných hodnot
+HeaderField = namedtuple('HeaderField', 'key flag value unit')
+
+# všechny typy řádků hlavičky jedním výrazem: popis sloupce dat
+# ('lower','MeV',    1,'Bin lower edge') nebo pole 'KEY', flag, hodnoty
+HEADER_PATTERN = re.compile(
+    r"'(?P<key>[^']*)',\s*"
+    r"(?:'(?P<unit>[^']*)',\s*-?\d+,\s*'(?P<desc>[^']*)'"
+    r"|(?P<flag>-?\d+),(?P<rest>.*))"
+)
+# samostatný řádek před hlavičkou -> typ bloku, když chybí pole GRAS_DATA_TYPE
+TAG_TYPES = {'GRAS HISTOGRAM 1D': 'HIST_1D', 'GRAS HISTOGRAM 2D': 'HIST_2D'}
+QUOTED_PATTERN = re.compile(r"'([^']*)'")
+NUMERIC_LINE = re.compile(r"^\s*[\d\.\+\-]")
+
+
+def _number(token):
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def parse_field(key, flag, rest):
+    """(HeaderField, hodnota jako text) z částí řádku za klíčem a příznakem."""
+    if flag < 0:
+        values = QUOTED_PATTERN.findall(rest)[:-flag]
+        value = values[0] if len(values) == 1 else tuple(values)
+        return HeaderField(key, flag, value, None), ", ".join(values)
+    tokens = [t.strip() for t in rest.split(',')]
+    values = [_number(t) for t in tokens[:flag]]
+    unit = QUOTED_PATTERN.match(tokens[flag]) if len(tokens) > flag else None
+    field = HeaderField(key, flag, values[0] if len(values) == 1 else tuple(values), unit and unit.group(1))
+    # čísla v textu tak, jak jsou v souboru
+    return field, ", ".join(tokens[:flag])
+
+
+class BlockHeader:
+    """
+    Hlavička jednoho GRAS bloku rozparsovaná v jednom průchodu přes HEADER_PATTERN.
+    Parsování končí prvním numerickým řádkem, takže jde předat i celý text bloku.
+
+        header = BlockHeader.parse(block_lines)
+        header.get('GRAS_MODULE_TYPE'), header.values('PARTICLE SPECIES'), header.unit
+    """
+    __slots__ = ('lines', 'records', 'columns', 'shape', 'tag', 'fields', 'text_fields')
+
+    def __init__(self, lines, records, text_fields, columns, shape=None, tag=None):
+        self.lines = lines              # řádky hlavičky (str)
+        self.records = records          # [HeaderField, ...] v pořadí souboru
+        self.fields = {r.key: r.value for r in records}
+        # 'KEY' -> hodnota jako text (víc hodnot oddělených ', ') pro GrasBlock.fields, store a katalog
+        self.text_fields = text_fields
+        self.columns = columns          # popisy sloupců dat [(název, jednotka, popis), ...]
+        self.shape = shape              # (řádky, sloupce) dat z řádku '*'
+        self.tag = tag                  # samostatný řádek jako 'GRAS HISTOGRAM 1D'
+
+    @classmethod
+    def parse(cls, lines):
+        header, records, columns = [], [], []
+        text_fields = {}
+        shape = tag = None
+        for line in lines:
+            line = line.strip()
+            if not line.startswith("'"):
+                if line and NUMERIC_LINE.match(line):
+                    break
+                # prázdné řádky a "Source file: ..." z rozdělených souborů
+                continue
+            header.append(line)
+            m = HEADER_PATTERN.match(line)
+            if m is None:
+                if tag is None and line not in ("'End of Block'", "'End of File'"):
+                    tag = line.strip("'")
+            elif m.group('unit') is not None:
+                columns.append((m.group('key'), m.group('unit'), m.group('desc')))
+            elif m.group('key') == '*':
+                try:
+                    counts = [int(v) for v in m.group('rest').split(',')]
+                    shape = counts[5], counts[4]
+                except (ValueError, IndexError):
+                    pass
+            else:
+                field, text = parse_field(m.group('key'), int(m.group('flag')), m.group('rest'))
+                records.append(field)
+                text_fields[field.key] = text
+        return cls(header, records, text_fields, columns, shape, tag)
+
+    def get(self, key, default=None):
+        return self.fields.get(key, default)
+
+    def values(self, key):
+        """Hodnoty pole vždy jako seznam (i jednohodnotová a chybějící pole)."""
+        value = self.fields.get(key)
+        if value is None:
+            return []
+        return list(value) if isinstance(value, tuple) else [value]
+
+    def properties(self):
+        """Textová pole hlavičky (flag < 0) pro properties.json / katalog."""
+        return {r.key: self.text_fields[r.key] for r in self.records if r.flag < 0}
+
+    @property
+    def data_type(self):
+        """GRAS_DATA_TYPE, jinak typ podle tagu bloku ('GRAS HISTOGRAM 1D' -> HIST_1D)."""
+        return self.text_fields.get('GRAS_DATA_TYPE') or TAG_TYPES.get(self.tag)
+
+    @property
+    def unit(self):
+        """Jednotka prvního sloupce dat, který nějakou má (tabulka modulů v reportu)."""
+        for _, unit, _ in self.columns:
+            if any(c.isalpha() for c in unit):
+                return unit
+        return None
+
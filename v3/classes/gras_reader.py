@@ -0,0 +1,499 @@
+import os
+import mmap
+import re
+import hashlib
+import tempfile
+
+import numpy as np
+
+from classes.gras_header import BlockHeader
+from classes.gras_archive import is_compressed, open_container, split_member, member_digest, DigestFile
+
+END_OF_BLOCK = b"'End of Block'"
+END_OF_FILE = b"'End of File'"
+
+NUMERIC_PATTERN = re.compile(rb"^\s*[\d\.\+\-]")
+
+# po kolika bajtech se čtou komprimované kontejnery
+STREAM_CHUNK = 1 << 20
+
+
+# kolik bajtů textu dat se dekóduje najednou; výsledná pole se plní po kusech
+DECODE_CHUNK = 4 << 20
+# bloky s větším polem dat se dekódují rovnou do souboru (memmap), ne do paměti
+MEMORY_CAP = 256 << 20
+
+
+def line_chunks(buffer, start, end, chunk_bytes=DECODE_CHUNK):
+    """buffer[start:end] (mmap / bytes) po kusech končících koncem řádku, každý zhruba do chunk_bytes."""
+    while start < end:
+        stop = min(start + chunk_bytes, end)
+        if stop < end:
+            nl = buffer.rfind(b"\n", start, stop)
+            # řádek delší než kus -> kus až do jeho konce
+            stop = nl + 1 if nl != -1 else (buffer.find(b"\n", stop, end) + 1 or end)
+        yield buffer[start:stop]
+        start = stop
+
+
+def parse_numbers(chunk):
+    """Čísla oddělená čárkami / mezerami / konci řádků -> float64 pole; nečíselný token -> ValueError."""
+    try:
+        return np.array(chunk.replace(b",", b" ").split(), dtype=np.float64)
+    except ValueError as e:
+        raise ValueError(f"Malformed numeric data: {e}") from None
+
+
+def decode_range(buffer, start, end, shape=None, out=None, chunk_bytes=DECODE_CHUNK):
+    """
+    Numerická část bloku buffer[start:end] -> float64 pole (řádky, sloupce).
+    Se známým tvarem (shape z hlavičky '*' nebo předané out) se text dekóduje
+    po kusech rovnou do předalokovaného pole – out může být i memmap, navíc je
+    v paměti jen jeden kus textu. Počet hodnot musí tvaru odpovídat, useknutý
+    nebo přebývající řádek je ValueError. Bez tvaru se kusy spojí a počet
+    sloupců se vezme z prvního řádku.
+    """
+    if out is not None:
+        shape = out.shape
+    if shape is not None and shape[0] * shape[1] > 0:
+        array = np.empty(shape) if out is None else out
+        row = 0
+        for chunk in line_chunks(buffer, start, end, chunk_bytes):
+            values = parse_numbers(chunk)
+            rows = values.size // shape[1]
+            if rows * shape[1] != values.size or row + rows > shape[0]:
+                raise ValueError(f"Numeric block does not match its shape {tuple(shape)}: "
+                                 f"{values.size} values after row {row}")
+            array[row:row + rows] = values.reshape(rows, shape[1])
+            row += rows
+        if row != shape[0]:
+            raise ValueError(f"Numeric block does not match its shape {tuple(shape)}: only {row} rows")
+        return array
+
+    parts = [parse_numbers(chunk) for chunk in line_chunks(buffer, start, end, chunk_bytes)]
+    values = np.concatenate(parts) if parts else np.empty(0)
+    if shape is not None and values.size:
+        raise ValueError(f"Numeric block does not match its shape {tuple(shape)}: {values.size} values")
+    if values.size == 0:
+        return values.reshape(0, 0)
+    # první neprázdný řádek celý, i když je delší než chunk_bytes
+    first = start
+    while first < end and buffer[first:first + 1].isspace():
+        first += 1
+    nl = buffer.find(b"\n", first, end)
+    ncols = bytes(buffer[first:nl if nl != -1 else end]).count(b",") + 1
+    if values.size % ncols:
+        raise ValueError(f"Numeric block has {values.size} values, not a multiple of {ncols} columns")
+    return values.reshape(-1, ncols)
+
+
+def decode_numeric(data_bytes, shape=None, out=None):
+    """Numerická část bloku (bytes) -> float64 pole (řádky, sloupce), viz decode_range."""
+    return decode_range(data_bytes, 0, len(data_bytes), shape, out)
+
+
+def block_file_stem(title):
+    """Název CSV souboru bloku tak, jak ho ukládá GrasBlockSplitter."""
+    if not title:
+        return "info"
+    return title.replace(" ", "_").replace("/", "_").lower()
+
+
+class GrasBlock:
+    """
+    Jeden blok GRAS kontejneru. Drží jen řádky hlavičky a bajtové rozsahy;
+    hlavička se rozparsuje (BlockHeader) až při prvním přístupu k polím,
+    samotná data se čtou přes GrasBlockReader.read_data().
+    """
+    __slots__ = ('index', 'header', 'start', 'data_start', 'end', '_parsed')
+
+    def __init__(self, index, header, start, data_start, end):
+        self.index = index
+        self.header = header          # řádky hlavičky (str, bez konce řádku)
+        self.start = start            # offset prvního řádku bloku
+        self.data_start = data_start  # offset prvního numerického řádku
+        self.end = end                # offset za posledním řádkem dat
+        self._parsed = None
+
+    @property
+    def parsed(self):
+        if self._parsed is None:
+            self._parsed = BlockHeader.parse(self.header)
+        return self._parsed
+
+    @property
+    def fields(self):
+        """'KEY' -> hodnota z hlavičky jako text (víc hodnot oddělených ', ')."""
+        return self.parsed.text_fields
+
+    @property
+    def title(self):
+        return self.fields.get('GRAS_DATA_TITLE')
+
+    @property
+    def data_type(self):
+        return self.parsed.data_type
+
+    @property
+    def module_type(self):
+        return self.fields.get('GRAS_MODULE_TYPE')
+
+    @property
+    def module_name(self):
+        return self.fields.get('GRAS_MODULE_NAME')
+
+    @property
+    def shape(self):
+        """(řádky, sloupce) dat podle úvodního řádku '*', None pokud chybí."""
+        return self.parsed.shape
+
+    @property
+    def columns(self):
+        """Popisy sloupců dat jako [(název, jednotka, popis), ...]."""
+        return self.parsed.columns
+
+    @property
+    def file_stem(self):
+        return block_file_stem(self.title)
+
+    def __repr__(self):
+        return (f"GrasBlock({self.index}, {self.title!r}, {self.data_type!r}, "
+                f"bytes={self.start}-{self.end})")
+
+
+def scan_blocks(buffer, pos, size, base=0, index=0):
+    """
+    Bloky v buffer[pos:size] (mmap nebo bytes). Offsety bloků jsou posunuté
+    o base – polohu bufferu v kontejneru – a číslují se od index + 1.
+    """
+    header = []
+    start = None
+
+    while pos < size:
+        nl = buffer.find(b"\n", pos, size)
+        line_end = size if nl == -1 else nl + 1
+        line = buffer[pos:line_end].strip()
+
+        if line == END_OF_BLOCK or line == END_OF_FILE:
+            if start is not None:
+                index += 1
+                yield GrasBlock(index, header, base + start, base + pos, base + pos)
+                header, start = [], None
+            pos = line_end
+            if line == END_OF_FILE:
+                break
+            continue
+
+        if line.startswith(b"'"):
+            if start is None:
+                start = pos
+            header.append(line.decode('utf-8'))
+            pos = line_end
+            continue
+
+        if line and NUMERIC_PATTERN.match(line):
+            # data bloku: konec najdeme přímo v bufferu, bez dalšího dělení na řádky
+            if start is None:
+                start = pos
+            end = buffer.find(END_OF_BLOCK, pos, size)
+            if end == -1:
+                end = buffer.find(END_OF_FILE, pos, size)
+            if end == -1:
+                end = size
+            index += 1
+            yield GrasBlock(index, header, base + start, base + pos, base + end)
+            header, start = [], None
+            pos = end
+            continue
+
+        # prázdné řádky a "Source file: ..." z rozdělených souborů
+        pos = line_end
+
+    if start is not None:
+        index += 1
+        yield GrasBlock(index, header, base + start, base + size, base + size)
+
+
+def _block_end(buffer, start):
+    """Konec řádku s prvním oddělovačem bloku v buffer[start:], None pokud ještě není celý."""
+    hits = [i for i in (buffer.find(END_OF_BLOCK, start), buffer.find(END_OF_FILE, start)) if i != -1]
+    if not hits:
+        return None
+    nl = buffer.find(b"\n", min(hits))
+    return None if nl == -1 else nl + 1
+
+
+class GrasBlockReader:
+    """
+    Streamovací čtečka GRAS CSV. Soubor se namapuje přes mmap a bloky se
+    hledají řádek po řádku, takže paměť nezávisí na velikosti souboru.
+
+    Funguje jak na původních kontejnerech (bloky oddělené 'End of Block'),
+    tak na už rozdělených souborech z generated-data (jeden blok do EOF,
+    řádek "Source file: ..." se přeskočí).
+
+        with GrasBlockReader(path) as reader:
+            for block in reader:
+                data = reader.read_data(block)
+
+    start/end omezí čtení na bajtový výřez souboru (jeden blok z BlockIndex).
+
+    Komprimované kontejnery (.csv.gz, .csv.zst, člen .zip) se čtou proudem
+    z dekompresoru bez rozbalení na disk; bloky jde číst jen během iterace,
+    vždy ten naposledy vrácený.
+
+    S digest=True se při iteraci počítá i hash celého kontejneru (stejný jako
+    build_manifest.source_digest), po projití všech bloků je v reader.digest.
+    """
+    def __init__(self, path, start=0, end=None, memory_cap=None, digest=False):
+        self.path = path
+        self.start = start
+        self.end = end
+        # největší pole dat bloku dekódované do paměti (read_array), None = MEMORY_CAP
+        self.memory_cap = memory_cap or MEMORY_CAP
+        self.compute_digest = digest
+        self.digest = None
+        self._file = None
+        self._mm = None
+        # proud dekompresoru a offset self._mm v dekomprimovaném kontejneru
+        self._stream = None
+        self._base = 0
+        # komprimovaný soubor pod dekompresorem, počítá hash (digest=True)
+        self._raw = None
+
+    def __enter__(self):
+        if is_compressed(self.path):
+            if self.start or self.end is not None:
+                raise ValueError(f"Byte ranges cannot be read from compressed container {self.path}")
+            if self.compute_digest and split_member(self.path)[1] is not None:
+                # člen zipu: CRC a velikost z centrálního adresáře archivu
+                self.digest = member_digest(self.path)
+            elif self.compute_digest:
+                self._raw = DigestFile(self.path)
+            self._stream = open_container(self.path, self._raw)
+            self._mm = b""
+            self._base = 0
+            return self
+        self._file = open(self.path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # prázdný soubor nejde namapovat
+            self._mm = b""
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        if self._file is not None:
+            self._file.close()
+        if self._stream is not None:
+            self._stream.close()
+        if self._raw is not None:
+            self._raw.close()
+        self._mm = None
+        self._file = None
+        self._stream = None
+        self._raw = None
+
+    def __iter__(self):
+        if self._stream is not None:
+            return self._iter_stream()
+        size = len(self._mm) if self.end is None else min(self.end, len(self._mm))
+        blocks = scan_blocks(self._mm, self.start, size)
+        if self.compute_digest and not self.start and self.end is None:
+            return self._hashed(blocks)
+        return blocks
+
+    def _hashed(self, blocks):
+        # hash po blocích hned za čtením, dokud je blok v cache; pak i zbytek za 'End of File'
+        sha1 = hashlib.sha1()
+        done = 0
+        for block in blocks:
+            yield block
+            sha1.update(self._mm[done:block.end])
+            done = block.end
+        sha1.update(self._mm[done:])
+        self.digest = sha1.hexdigest()
+
+    def _finish_stream(self):
+        if self._raw is not None:
+            self.digest = self._raw.hexdigest()
+
+    def _iter_stream(self):
+        """
+        Bloky z dekomprimovaného proudu: čte se po STREAM_CHUNK, z bufferu se vždy
+        odřízne kus po řádek s oddělovačem bloku a ten se projde jako mmap.
+        V paměti je tak jen rozepsaný blok a číst jde jen ten poslední vrácený.
+        """
+        buffer = bytearray()
+        searched = 0
+        index = 0
+        eof = False
+        while True:
+            cut = _block_end(buffer, searched)
+            if cut is None:
+                if not eof:
+                    chunk = self._stream.read(STREAM_CHUNK)
+                    # oddělovač může být na posledním neúplném řádku
+                    searched = buffer.rfind(b"\n") + 1
+                    buffer += chunk
+                    eof = not chunk
+                    continue
+                if not buffer:
+                    self._finish_stream()
+                    return
+                cut = len(buffer)
+            self._base += len(self._mm)
+            self._mm = bytes(buffer[:cut])
+            del buffer[:cut]
+            searched = 0
+            for block in scan_blocks(self._mm, 0, len(self._mm), self._base, index):
+                index = block.index
+                yield block
+            if self._mm.rstrip().endswith(END_OF_FILE):
+                self._finish_stream()
+                return
+
+    def _range(self, start, end):
+        """Offsety v kontejneru -> offsety v self._mm (u proudu jen kus s posledním blokem)."""
+        if start < self._base:
+            raise ValueError(f"Block already read past in compressed container {self.path}")
+        return start - self._base, end - self._base
+
+    def _slice(self, start, end):
+        start, end = self._range(start, end)
+        return self._mm[start:end]
+
+    def read_block(self, block):
+        """Celý text bloku (hlavička + data) bez oddělovače 'End of Block'."""
+        return self._slice(block.start, block.end).strip()
+
+    def iter_block(self, block, chunk_bytes=DECODE_CHUNK):
+        """Text bloku jako read_block(), ale po kusech – velký blok se nemusí kopírovat celý."""
+        start, end = self._range(block.start, block.end)
+        while end > start and self._mm[end - 1:end].isspace():
+            end -= 1
+        yield from line_chunks(self._mm, start, end, chunk_bytes)
+
+    def read_data(self, block):
+        """Numerická část bloku jako bajty."""
+        return self._slice(block.data_start, block.end)
+
+    def read_array(self, block, out=None):
+        """
+        Numerická část bloku jako float64 pole (řádky, sloupce), dekódovaná po kusech
+        do předalokovaného pole. Pole větší než memory_cap se plní do dočasného
+        memmapu na disku; out = vlastní cílové pole (např. memmap ve store).
+        """
+        shape = block.shape
+        if out is None and shape is not None and shape[0] * shape[1] * 8 > self.memory_cap:
+            out = np.memmap(tempfile.TemporaryFile(), dtype=np.float64, mode='w+', shape=shape)
+        start, end = self._range(block.data_start, block.end)
+        return decode_range(self._mm, start, end, shape, out, min(DECODE_CHUNK, self.memory_cap))
+
+
+class BlockIndex:
+    """
+    Bajtový index bloků v původních kontejnerech pro režim bez dělení:
+    cesta bloku (jak by ležel v generated-data) -> (kontejner, začátek, konec).
+    Bloky se čtou jako mmap výřezy kontejneru, žádné mezisoubory nevznikají.
+
+        with index.open('generated-data/<stem>/total_dose.csv') as reader:
+            block = next(iter(reader))
+    """
+    def __init__(self, locations=None):
+        self.locations = {_norm(p): tuple(loc) for p, loc in (locations or {}).items()}
+
+    def __contains__(self, path):
+        return _norm(path) in self.locations
+
+    def __len__(self):
+        return len(self.locations)
+
+    def add(self, path, source, start, end):
+        self.locations[_norm(path)] = (source, start, end)
+
+    def open(self, path):
+        source, start, end = self.locations[_norm(path)]
+        return GrasBlockReader(source, start, end)
+
+    def read_text(self, path):
+        """Text bloku (hlavička + data) tak, jak by ho obsahoval rozdělený soubor."""
+        source, start, end = self.locations[_norm(path)]
+        with open(source, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start).strip().decode('utf-8')
+
+
+class BlockTypeIndex:
+    """
+    Typy bloků z hlaviček: cesta bloku -> (GRAS_DATA_TYPE, GRAS_MODULE_TYPE, titul).
+    Plní se jednou (z katalogu nebo store, kam se typy zapisují při dělení) a dotazy
+    jako "všechny HIST_1D bloky" nebo "STAT_DOUBLE modulu DOSE" jsou jen vyhledání
+    v množinách, soubory bloků se neotevírají.
+
+        types.paths(data_type='HIST_1D', module_type='MULASSIS')
+    """
+    FIELDS = ('data_type', 'module_type', 'title')
+
+    def __init__(self):
+        self.types = {}
+        self._by = {field: {} for field in self.FIELDS}
+
+    def __contains__(self, path):
+        return _norm(path) in self.types
+
+    def __len__(self):
+        return len(self.types)
+
+    def add(self, path, data_type, module_type=None, title=None):
+        path = _norm(path)
+        self.types[path] = (data_type, module_type, title)
+        for field, value in zip(self.FIELDS, self.types[path]):
+            self._by[field].setdefault(value, set()).add(path)
+
+    def get(self, path):
+        """(data_type, module_type, title) bloku, nebo None."""
+        return self.types.get(_norm(path))
+
+    def paths(self, data_type=None, module_type=None, title=None):
+        """Seřazené cesty bloků, které odpovídají všem zadaným filtrům."""
+        matches = [
+            self._by[field].get(value, set())
+            for field, value in zip(self.FIELDS, (data_type, module_type, title))
+            if value is not None
+        ]
+        if not matches:
+            return sorted(self.types)
+        matches.sort(key=len)
+        return sorted(matches[0].intersection(*matches[1:]))
+
+
+def _norm(path):
+    return os.path.normpath(path).replace(os.sep, '/')
+
+
+def read_header(path, store=None, index=None):
+    """
+    BlockHeader prvního bloku souboru: z metadat HistogramStore, z výřezu kontejneru
+    přes BlockIndex, jinak ze souboru (čte se jen po první numerický řádek).
+    """
+    stored = store.lookup(path) if store is not None else None
+    if stored is not None:
+        return BlockHeader.parse(stored.header)
+    reader = index.open(path) if index is not None and path in index else GrasBlockReader(path)
+    with reader:
+        block = next(iter(reader), None)
+    if block is None:
+        raise ValueError(f"No GRAS block found in {path}")
+    return block.parsed
+
+
+def iter_blocks(path):
+    """Projde soubor a vrací jen hlavičky bloků (GrasBlock) bez načtení dat."""
+    with GrasBlockReader(path) as reader:
+        yield from reader
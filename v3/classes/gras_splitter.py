@@ -1,24 +1,67 @@
 import os
-import re
-import glob
 import shutil
 import json
+import hashlib
+import itertools
+import contextlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from classes.gras_reader import GrasBlockReader
+from classes.atomic_output import ContainerWriter, atomic_open
+from classes.gras_archive import list_containers, container_name, is_compressed
+from classes.profiler import span
+
+# výsledek split_container(): hash kontejneru spočítaný při čtení
+# a {cesta k bloku: (hash obsahu, GrasBlock)}
+SplitResult = namedtuple('SplitResult', 'sha1 blocks')
+
 
 class GrasBlockSplitter:
-    def __init__(self, input_dir="imported-data", output_dir="generated-data"):
+    def __init__(self, input_dir="imported-data", output_dir="generated-data", jobs=1, manifest=None, store=None, catalogue=None,
+                 split_free=False, profiler=None, memory_cap=None):
         self.input_dir = input_dir
         self.output_dir = output_dir
+        # počet procesů pro paralelní dělení kontejnerů (0 = všechna jádra)
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        # BuildManifest pro inkrementální běh; None = vše se vždy přegeneruje
+        self.manifest = manifest
+        # HistogramStore – při dělení se data bloků rovnou uloží i binárně
+        self.store = store
+        # BlockCatalogue – kontejnery a bloky se zapisují do SQLite místo file_map.json
+        self.catalogue = catalogue
+        # režim bez dělení: bloky se nezapisují, čtou se přímo z kontejneru přes
+        # offsety v katalogu (BlockCatalogue.block_index()); cesty v generated-data
+        # zůstávají jen jako klíče bloků
+        self.split_free = split_free
+        # PipelineProfiler – čas, CPU a I/O každého kontejneru
+        self.profiler = profiler
+        # největší pole dat bloku dekódované do paměti (bajty), None = gras_reader.MEMORY_CAP;
+        # větší bloky jdou po kusech rovnou do souborů store
+        self.memory_cap = memory_cap
+        if split_free and catalogue is None:
+            raise ValueError("Split-free mode needs a BlockCatalogue with block offsets")
+
+    def __getstate__(self):
+        # do worker procesů jde jen to, co potřebuje split_container;
+        # manifest a katalog (SQLite spojení) zůstávají v hlavním procesu
+        state = self.__dict__.copy()
+        state['manifest'] = None
+        state['catalogue'] = None
+        state['profiler'] = None
+        return state
 
     def clear_screen(self):
         os.system('cls' if os.name == 'nt' else 'clear')
 
     def list_csv_files(self):
-        return sorted(glob.glob(f"{self.input_dir}/*.csv"))
+        # *.csv, komprimované *.csv.gz / *.csv.zst a kontejnery v *.zip archivech
+        return list_containers(self.input_dir)
 
     def show_menu(self, files):
         print("\033[1;36mFound the following CSV files:\033[0m\n")
         for idx, file in enumerate(files, start=1):
-            print(f"  \033[93m{idx:2})\033[0m {os.path.basename(file)}")
+            print(f"  \033[93m{idx:2})\033[0m {os.path.relpath(file, self.input_dir)}")
         print("\n\033[1;32mEnter the numbers of the files to process (e.g. 1,2,4) or 'a' for all:\033[0m")
         return input("➤ Your choice: ").strip()
 
@@ -35,42 +78,202 @@ class GrasBlockSplitter:
                 continue
         return [files[i] for i in indices]
 
+    def container_output_dir(self, file_path):
+        filename = container_name(file_path)
+        base_folder_name = os.path.splitext(filename)[0]  # název složky podle jména souboru bez přípony
+        return os.path.join(self.output_dir, base_folder_name)
+
+    def split_container(self, file_path):
+        """Rozdělí jeden kontejner na bloky, bez výpisů. Vrací SplitResult."""
+        filename = container_name(file_path)
+        if self.split_free and is_compressed(file_path):
+            # offsety v katalogu míří do souboru na disku, do komprimovaného nejde skočit
+            raise ValueError("compressed containers cannot be read in place, split them or decompress first")
+        output_dir = self.container_output_dir(file_path)
+        # bloky se píšou do .partial složky a do output_dir se přejmenují až celé
+        writer = contextlib.nullcontext() if self.split_free else ContainerWriter(output_dir)
+
+        # data bloků jdou do store hned při čtení, kontejner se v paměti neskládá;
+        # bez dělení se bloky čtou z kontejneru a store se nepíše
+        write_store = self.store is not None and not self.split_free
+        store = (self.store.writer(os.path.basename(output_dir), filename, self.memory_cap) if write_store
+                 else contextlib.nullcontext())
+
+        blocks = {}
+        # hash kontejneru pro manifest se počítá při stejném čtení, soubor se nečte podruhé
+        with GrasBlockReader(file_path, memory_cap=self.memory_cap, digest=True) as reader, writer, store, span('parse'):
+            for block in reader:
+                output_path = os.path.join(output_dir, f"{block.file_stem}.csv")
+                blocks[output_path] = (self.write_block(writer, reader, block, filename), block)
+                if write_store:
+                    store.add(block, reader)
+            sha1 = reader.digest
+        return SplitResult(sha1, blocks)
+
+    def write_block(self, writer, reader, block, filename):
+        """
+        Zapíše text bloku s řádkem "Source file: ..." po kusech (v režimu bez dělení
+        jen projde) a vrátí jeho sha1 – stejný jako bytes_digest() celého obsahu.
+        """
+        digest = hashlib.sha1()
+
+        def chunks():
+            for chunk in itertools.chain([f"Source file: {filename}\n".encode("utf-8")], reader.iter_block(block)):
+                digest.update(chunk)
+                yield chunk
+
+        if self.split_free:
+            for _ in chunks():
+                pass
+        else:
+            writer.add(f"{block.file_stem}.csv", chunks())
+        return digest.hexdigest()
+
     def process_file(self, file_path):
         filename = os.path.basename(file_path)
-        base_folder_name = os.path.splitext(filename)[0]  # název složky podle jména souboru bez přípony
-        output_dir = os.path.join(self.output_dir, base_folder_name)
-        os.makedirs(output_dir, exist_ok=True)
+        output_dir = self.container_output_dir(file_path)
 
         print(f"\n\033[1;34m▶ Processing:\033[0m {filename}")
         print(f"   \033[1;33m→ Output Directory:\033[0m {output_dir}")
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            blocks = f.read().split("'End of Block'")
+        if self.profiler is None:
+            result = self.split_container(file_path)
+        else:
+            result = self.profiler.call('split', file_path, self.split_container, file_path)
 
-        saved = 0
-        for i, block in enumerate(blocks, start=1):
-            block = block.strip()
-            if not block or block == "'End of File'":
-                continue
+        print(f"   \033[1;32m✓ {len(result.blocks)} blocks {'indexed' if self.split_free else 'saved'}.\033[0m")
+        return result
+
+    def process_files(self, selected_files):
+        """
+        Zpracuje vybrané kontejnery (sériově nebo v process poolu podle self.jobs).
+        Chyba v jednom kontejneru neukončí ostatní – vrací seznam úspěšně
+        zpracovaných souborů v původním pořadí a slovník chyb.
+        """
+        failed = {}
+        split = {}
 
-            title_match = re.search(r"'GRAS_DATA_TITLE'\s*,\s*-1\s*,\s*'([^']+)'", block)
-            title = title_match.group(1).replace(" ", "_").replace("/", "_") if title_match else f"info"
-            output_path = os.path.join(output_dir, f"{title.lower()}.csv")
+        if self.jobs <= 1 or len(selected_files) <= 1:
+            for file_path in selected_files:
+                try:
+                    split[file_path] = self.process_file(file_path)
+                except Exception as e:
+                    failed[file_path] = e
+        else:
+            workers = min(self.jobs, len(selected_files))
+            print(f"   \033[1;33m→ Using {workers} worker processes\033[0m")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                task = self.split_container if self.profiler is None else self.profiler.wrap(self.split_container)
+                futures = {
+                    executor.submit(task, file_path): file_path
+                    for file_path in selected_files
+                }
+                for future in as_completed(futures):
+                    file_path = futures[future]
+                    filename = os.path.basename(file_path)
+                    try:
+                        split[file_path] = future.result()
+                        if self.profiler is not None:
+                            split[file_path] = self.profiler.unwrap('split', file_path, split[file_path])
+                    except Exception as e:
+                        failed[file_path] = e
+                        continue
+                    action = 'indexed' if self.split_free else 'saved'
+                    print(f"\033[1;34m▶ {filename}\033[0m \033[1;32m✓ {len(split[file_path].blocks)} blocks {action}.\033[0m")
+
+        for file_path, error in failed.items():
+            print(f"\033[1;31m✗ Failed to split {os.path.basename(file_path)}: {error}\033[0m")
+            # neúplný výstup by se jinak dostal do dalších kroků
+            self.forget_container(file_path)
+
+        for file_path in selected_files:
+            if file_path in split:
+                self.record_split(file_path, split[file_path])
 
-            with open(output_path, "w", encoding="utf-8") as out: out.write(f"Source file: {filename}\n"); out.write(block); saved += 1
+        processed = [f for f in selected_files if f not in failed]
+        return processed, failed
 
+    def record_split(self, file_path, result):
+        """Zapíše SplitResult ze split_container() do manifestu a katalogu (v hlavním procesu)."""
+        blocks = result.blocks
+        if self.manifest is not None:
+            self.manifest.record_container(
+                file_path, {p: d for p, (d, _) in blocks.items()}, in_place=self.split_free, sha1=result.sha1
+            )
+        if self.catalogue is not None:
+            self.catalogue.replace_container(
+                container_name(file_path),
+                self.container_output_dir(file_path),
+                [(p, block) for p, (_, block) in blocks.items()],
+                source_path=os.path.abspath(file_path),
+            )
 
-        print(f"   \033[1;32m✓ {saved} blocks saved.\033[0m")
+    def forget_container(self, file_path):
+        """Odstraní všechny výstupy kontejneru (bloky, store, záznam v manifestu a katalogu)."""
+        filename = container_name(file_path)
+        output_dir = self.container_output_dir(file_path)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        if self.store is not None:
+            self.store.remove_container(os.path.basename(output_dir))
+        if self.manifest is not None:
+            self.manifest.forget_container(filename)
+        if self.catalogue is not None:
+            self.catalogue.remove_container(filename)
 
+    def is_up_to_date(self, file_path):
+        filename = container_name(file_path)
+        stem = os.path.basename(self.container_output_dir(file_path))
+        if self.store is not None and not self.split_free and not self.store.has_container(stem):
+            return False
+        if self.catalogue is not None and not self.catalogue.has_container(filename):
+            return False
+        return self.manifest.container_unchanged(file_path, in_place=self.split_free)
 
+    def prepare_incremental(self, selected_files):
+        """
+        Smaže výstupy kontejnerů, které už nejsou vybrané nebo se změnily,
+        a vrátí jen kontejnery, které je potřeba znovu rozdělit.
+        """
+        if not self.split_free:
+            os.makedirs(self.output_dir, exist_ok=True)
+        selected_dirs = {os.path.basename(self.container_output_dir(f)) for f in selected_files}
+        selected_names = {container_name(f) for f in selected_files}
+
+        entries = os.listdir(self.output_dir) if os.path.isdir(self.output_dir) else []
+        stale = {f"{entry}.csv" for entry in entries if entry not in selected_dirs}
+        stale.update(f for f in self.manifest.containers if f not in selected_names)
+        if self.store is not None:
+            stale.update(f"{stem}.csv" for stem in self.store.containers() if stem not in selected_dirs)
+        if self.catalogue is not None:
+            stale.update(f for f in self.catalogue.container_names() if f not in selected_names)
+        for filename in sorted(stale):
+            self.forget_container(filename)
+
+        pending = []
+        for file_path in selected_files:
+            if self.is_up_to_date(file_path):
+                print(f"   \033[1;32m✓ {os.path.basename(file_path)} is up to date, skipping.\033[0m")
+                continue
+            output_dir = self.container_output_dir(file_path)
+            shutil.rmtree(output_dir, ignore_errors=True)
+            if self.split_free and self.store is not None:
+                # data ve store by byla z dřívějšího rozdělení kontejneru
+                self.store.remove_container(os.path.basename(output_dir))
+            pending.append(file_path)
+        if self.split_free:
+            # prázdné kořeny po dřívějším běhu s dělením
+            for root in (self.output_dir, self.store.root if self.store is not None else None):
+                if root and os.path.isdir(root) and not os.listdir(root):
+                    os.rmdir(root)
+        return pending
 
     def generate_file_map(self, selected_files):
         file_map = {}
 
         for file_path in selected_files:
-            filename = os.path.basename(file_path)
-            base_folder_name = os.path.splitext(filename)[0]
-            output_dir = os.path.join(self.output_dir, base_folder_name)
+            filename = container_name(file_path)
+            output_dir = self.container_output_dir(file_path)
+            base_folder_name = os.path.basename(output_dir)
 
             new_files = sorted([
                 os.path.join(base_folder_name, f)
@@ -80,35 +283,57 @@ class GrasBlockSplitter:
 
             file_map[filename] = new_files
 
-        with open("file_map.json", "w", encoding="utf-8") as f:
+        # file_map.json se přepíše až celý, přerušený běh nechá předchozí
+        with atomic_open("file_map.json", "w", encoding="utf-8") as f:
             json.dump(file_map, f, indent=4)
 
         print("\n\033[1;36m✔ File map saved to 'file_map.json'.\033[0m\n")
 
 
-    def run(self):
-        self.clear_screen()
-        print("\033[1;35mGRAS Block Splitter\033[0m")
+    def run(self, selected_files=None):
+        """
+        selected_files = None -> interaktivní výběr z menu; jinak se zpracují zadané
+        kontejnery bez dotazů a mazání obrazovky. Vrací (zpracované, {soubor: chyba}).
+        """
+        if selected_files is None:
+            self.clear_screen()
+            print("\033[1;35mGRAS Block Splitter\033[0m")
 
-        csv_files = self.list_csv_files()
-        if not csv_files:
-            print(f"\033[1;31mNo CSV files found in '{self.input_dir}' directory.\033[0m")
-            return
+            csv_files = self.list_csv_files()
+            if not csv_files:
+                print(f"\033[1;31mNo CSV files found in '{self.input_dir}' directory.\033[0m")
+                return [], {}
 
-        user_choice = self.show_menu(csv_files)
-        selected_files = self.get_selected_files(csv_files, user_choice)
+            user_choice = self.show_menu(csv_files)
+            selected_files = self.get_selected_files(csv_files, user_choice)
 
         if not selected_files:
             print("\n\033[1;31m No valid files selected. Exiting.\033[0m")
-            return
+            return [], {}
 
-        shutil.rmtree(self.output_dir, ignore_errors=True)
-        os.makedirs(self.output_dir, exist_ok=True)
+        if self.manifest is None:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            if not self.split_free:
+                os.makedirs(self.output_dir, exist_ok=True)
+            if self.store is not None:
+                shutil.rmtree(self.store.root, ignore_errors=True)
+            if self.catalogue is not None:
+                self.catalogue.clear()
+            pending = selected_files
+        else:
+            pending = self.prepare_incremental(selected_files)
 
         print("\n\033[1;36mProcessing selected files...\033[0m")
-        for file_path in selected_files:
-            self.process_file(file_path)
+        processed, failed = self.process_files(pending)
+        processed = [f for f in selected_files if f not in failed]
 
-        self.generate_file_map(selected_files)
+        if self.catalogue is None:
+            self.generate_file_map(processed)
+        else:
+            print(f"\n\033[1;36m✔ {len(processed)} containers indexed in '{self.catalogue.path}'.\033[0m\n")
 
-        print("\n\033[1;32m✔ All selected files processed successfully.\033[0m\n")
+        if failed:
+            print(f"\n\033[1;31m✗ {len(failed)} of {len(selected_files)} files failed, see errors above.\033[0m\n")
+        else:
+            print("\n\033[1;32m✔ All selected files processed successfully.\033[0m\n")
+        return processed, failed
@@ -0,0 +1,379 @@
+import os
+
+import numpy as np
+
+from classes.histogram_store import HIST_COLUMNS, HIST2D_COLUMNS, load_block
+
+
+def log_edges(histograms, nbins=None):
+    """
+    Společné logaritmické hrany přes rozsah všech histogramů (kladné hrany).
+    nbins = None -> tolik binů, kolik má nejjemnější histogram.
+    """
+    lower = min(h.lower[h.lower > 0].min() for h in histograms)
+    upper = max(h.upper.max() for h in histograms)
+    if nbins is None:
+        nbins = max(len(h) for h in histograms)
+    return np.logspace(np.log10(lower), np.log10(upper), nbins + 1)
+
+
+def group_slices(n, max_groups):
+    """Začátky skupin sousedních binů, aby jich bylo nejvýš max_groups (pro np.add.reduceat)."""
+    factor = -(-n // max_groups)
+    return np.arange(0, n, factor), factor
+
+
+def rebin_matrix(lower, upper, edges, log=True):
+    """
+    Matice (staré biny, nové biny) s podílem obsahu starého binu, který padne do
+    nového binu; obsah se v binu bere rovnoměrně (v log x, pokud log=True).
+    Nový obsah = obsah @ matice, kvadratické chyby = chyby² @ matice².
+    """
+    new_lower, new_upper = edges[:-1], edges[1:]
+    if log and (lower > 0).all() and (edges > 0).all():
+        lower, upper = np.log(lower), np.log(upper)
+        new_lower, new_upper = np.log(new_lower), np.log(new_upper)
+    overlap = (np.minimum(upper[:, None], new_upper[None, :])
+               - np.maximum(lower[:, None], new_lower[None, :]))
+    width = (upper - lower)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(width > 0, np.clip(overlap, 0, None) / width, 0.0)
+
+
+class Histogram:
+    """
+    1D histogram GRAS bloku (HIST_1D): hrany binů, obsah, chyby a počty vstupů.
+    Obsah je obsah binu (součet odpovídá HIST_SUM_ALL_BIN_VALUES), chyby se při
+    sčítání skládají kvadraticky. Všechny operace jsou nad celými poli.
+
+        total = Histogram.from_block(a) + Histogram.from_block(b)
+        coarse = total.rebin(log_edges([total], nbins=20))
+    """
+    __slots__ = ('lower', 'upper', 'values', 'errors', 'entries', 'meta')
+
+    def __init__(self, lower, upper, values, errors, entries=None, meta=None):
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.errors = np.asarray(errors, dtype=np.float64)
+        self.entries = (np.zeros_like(self.values) if entries is None
+                        else np.asarray(entries, dtype=np.float64))
+        # pole hlavičky (popisky os, titulek, ...) z prvního zdroje
+        self.meta = dict(meta or {})
+
+    @classmethod
+    def from_block(cls, csv_file, store=None, index=None):
+        fields, _, data = load_block(csv_file, store, index)
+        return cls.from_columns(fields, data, csv_file)
+
+    @classmethod
+    def from_columns(cls, fields, data, csv_file):
+        if data.shape[0] != len(HIST_COLUMNS):
+            raise ValueError(f"Expected {len(HIST_COLUMNS)} histogram columns in {csv_file}, got {data.shape[0]}")
+        col = {name: data[i] for i, name in enumerate(HIST_COLUMNS)}
+        meta = dict(fields)
+        meta['csv_path'] = csv_file
+        return cls(col['lower'], col['upper'], col['value'], col['error'], col['entries'], meta)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f"Histogram({self.meta.get('GRAS_DATA_TITLE', '')!r}, bins={len(self)}, integral={self.integral():.4g})"
+
+    @property
+    def edges(self):
+        return np.append(self.lower, self.upper[-1])
+
+    @property
+    def centers(self):
+        return (self.lower + self.upper) / 2
+
+    @property
+    def widths(self):
+        return self.upper - self.lower
+
+    def same_binning(self, other):
+        return (len(self) == len(other)
+                and np.allclose(self.lower, other.lower) and np.allclose(self.upper, other.upper))
+
+    def __add__(self, other):
+        if not isinstance(other, Histogram):
+            return NotImplemented
+        if not self.same_binning(other):
+            raise ValueError("Histograms have different binning, rebin them onto common edges first")
+        return Histogram(self.lower, self.upper,
+                         self.values + other.values,
+                         np.hypot(self.errors, other.errors),
+                         self.entries + other.entries,
+                         self.meta)
+
+    def __radd__(self, other):
+        # sum([...]) začíná nulou
+        if other == 0:
+            return self
+        return NotImplemented
+
+    def scaled(self, factor):
+        return Histogram(self.lower, self.upper, self.values * factor, self.errors * abs(factor),
+                         self.entries, self.meta)
+
+    def rebin(self, edges, log=True):
+        edges = np.asarray(edges, dtype=np.float64)
+        matrix = rebin_matrix(self.lower, self.upper, edges, log)
+        return Histogram(edges[:-1], edges[1:],
+                         self.values @ matrix,
+                         np.sqrt(self.errors ** 2 @ matrix ** 2),
+                         self.entries @ matrix,
+                         self.meta)
+
+    def downsampled(self, max_bins):
+        """
+        Nejvýš max_bins binů sloučením sousedních (obsah a počty se sčítají, chyby
+        kvadraticky) – pro kreslení jemně binovaných spekter. Menší histogram vrací beze změny.
+        """
+        if len(self) <= max_bins:
+            return self
+        starts, factor = group_slices(len(self), max_bins)
+        ends = np.minimum(starts + factor, len(self)) - 1
+        return Histogram(self.lower[starts], self.upper[ends],
+                         np.add.reduceat(self.values, starts),
+                         np.sqrt(np.add.reduceat(self.errors ** 2, starts)),
+                         np.add.reduceat(self.entries, starts),
+                         self.meta)
+
+    def integral(self):
+        return float(self.values.sum())
+
+    def integral_error(self):
+        return float(np.sqrt((self.errors ** 2).sum()))
+
+    def cumulative(self, reverse=False):
+        """
+        Kumulativní spektrum; reverse=True dá integrál nad hranou (např. fluence > E),
+        hodnota i-tého binu pak patří k jeho dolní hraně.
+        """
+        values, errors2 = self.values, self.errors ** 2
+        if reverse:
+            values = np.cumsum(values[::-1])[::-1]
+            errors2 = np.cumsum(errors2[::-1])[::-1]
+        else:
+            values = np.cumsum(values)
+            errors2 = np.cumsum(errors2)
+        return Histogram(self.lower, self.upper, values, np.sqrt(errors2), self.entries, self.meta)
+
+    def plot_data(self, title=None):
+        """Slovník ve formátu extract_data(), aby šel vykreslit přes draw_histogram()."""
+        fields = self.meta
+        xlabel = fields.get('X_AXIS_LABEL', 'x')
+        ylabel = fields.get('Y_AXIS_LABEL', 'y')
+        if fields.get('X_AXIS_UNITS'):
+            xlabel += f" [{fields['X_AXIS_UNITS']}]"
+        if fields.get('Y_AXIS_UNITS'):
+            ylabel += f" [{fields['Y_AXIS_UNITS']}]"
+        csv_path = fields.get('csv_path', '')
+        return {
+            'bin_lower': self.lower,
+            'bin_upper': self.upper,
+            'bin_center': self.centers,
+            'dose': self.values,
+            'dose_error': self.errors,
+            'xlabel': xlabel,
+            'ylabel': ylabel,
+            'title': title if title is not None else fields.get('HIST_TITLE', ''),
+            'xscale': fields.get('X_AXIS_SCALE', 'linear'),
+            'file_name': os.path.basename(csv_path),
+            'csv_path': csv_path,
+        }
+
+
+class Histogram2D:
+    """
+    2D histogram GRAS bloku (HIST_2D): hrany binů v x a y a mřížky obsahu a chyb
+    (y, x). Buňky se z řádků bloku rozmístí podle dolních hran, na pořadí řádků
+    nezáleží; chybějící buňky jsou nulové.
+    """
+    __slots__ = ('x_edges', 'y_edges', 'values', 'errors', 'meta')
+
+    def __init__(self, x_edges, y_edges, values, errors, meta=None):
+        self.x_edges = np.asarray(x_edges, dtype=np.float64)
+        self.y_edges = np.asarray(y_edges, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.errors = np.asarray(errors, dtype=np.float64)
+        self.meta = dict(meta or {})
+
+    @classmethod
+    def from_block(cls, csv_file, store=None, index=None):
+        fields, _, data = load_block(csv_file, store, index)
+        return cls.from_columns(fields, data, csv_file)
+
+    @classmethod
+    def from_columns(cls, fields, data, csv_file):
+        if data.shape[0] != len(HIST2D_COLUMNS):
+            raise ValueError(f"Expected {len(HIST2D_COLUMNS)} 2D histogram columns in {csv_file}, got {data.shape[0]}")
+        col = {name: data[i] for i, name in enumerate(HIST2D_COLUMNS)}
+        x_lower, xi = np.unique(col['xlower'], return_inverse=True)
+        y_lower, yi = np.unique(col['ylower'], return_inverse=True)
+        values = np.zeros((len(y_lower), len(x_lower)))
+        errors = np.zeros_like(values)
+        values[yi, xi] = col['value']
+        errors[yi, xi] = col['error']
+        meta = dict(fields)
+        meta['csv_path'] = csv_file
+        return cls(np.append(x_lower, col['xupper'].max()), np.append(y_lower, col['yupper'].max()),
+                   values, errors, meta)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __repr__(self):
+        return f"Histogram2D({self.meta.get('GRAS_DATA_TITLE', '')!r}, bins={self.shape[1]}x{self.shape[0]})"
+
+    def downsampled(self, max_x, max_y=None):
+        """Nejvýš max_x × max_y buněk sloučením sousedních (obsah se sčítá, chyby kvadraticky)."""
+        max_y = max_x if max_y is None else max_y
+        ny, nx = self.shape
+        if nx <= max_x and ny <= max_y:
+            return self
+        xs, _ = group_slices(nx, max_x)
+        ys, _ = group_slices(ny, max_y)
+
+        def merge(grid):
+            return np.add.reduceat(np.add.reduceat(grid, xs, axis=1), ys, axis=0)
+
+        return Histogram2D(np.append(self.x_edges[xs], self.x_edges[-1]), np.append(self.y_edges[ys], self.y_edges[-1]),
+                           merge(self.values), np.sqrt(merge(self.errors ** 2)), self.meta)
+
+    def integral(self):
+        return float(self.values.sum())
+
+    def plot_data(self, title=None):
+        """Slovník pro draw_histogram2d() (obdoba Histogram.plot_data)."""
+        fields = self.meta
+        labels = {}
+        for axis in ('X', 'Y', 'Z'):
+            label = fields.get(f'{axis}_AXIS_LABEL', axis.lower() if axis != 'Z' else 'value')
+            if fields.get(f'{axis}_AXIS_UNITS'):
+                label += f" [{fields[f'{axis}_AXIS_UNITS']}]"
+            labels[axis] = label
+        csv_path = fields.get('csv_path', '')
+        return {
+            'kind': 'hist2d',
+            'x_edges': self.x_edges,
+            'y_edges': self.y_edges,
+            'values': self.values,
+            'xlabel': labels['X'],
+            'ylabel': labels['Y'],
+            'zlabel': labels['Z'],
+            'title': title if title is not None else fields.get('HIST_TITLE', ''),
+            'xscale': fields.get('X_AXIS_SCALE', 'linear'),
+            'yscale': fields.get('Y_AXIS_SCALE', 'linear'),
+            'file_name': os.path.basename(csv_path),
+            'csv_path': csv_path,
+        }
+
+
+def load_histogram(csv_file, store=None, index=None):
+    """Histogram nebo Histogram2D podle sloupců bloku (blok se načte jen jednou)."""
+    fields, names, data = load_block(csv_file, store, index)
+    cls = Histogram2D if tuple(names) == HIST2D_COLUMNS else Histogram
+    return cls.from_columns(fields, data, csv_file)
+
+
+class HistogramStack:
+    """
+    N histogramů se společnými hranami jako pole (N, biny) – pro kombinování
+    spekter z více kontejnerů (spektra jednoho objemu, objemy mezi sebou).
+    Histogramy s jinými hranami se převedou přes rebin_matrix, stejné hrany
+    se přepočítávají jen jednou.
+    """
+    def __init__(self, edges, values, errors, entries, labels=None, meta=None):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.values = values
+        self.errors = errors
+        self.entries = entries
+        self.labels = list(labels) if labels is not None else [str(i) for i in range(len(values))]
+        self.meta = dict(meta or {})
+
+    @classmethod
+    def from_histograms(cls, histograms, edges=None, labels=None, log=True):
+        """edges = None -> hrany prvního histogramu (ostatní se na ně přebinují)."""
+        histograms = list(histograms)
+        if not histograms:
+            raise ValueError("No histograms to stack")
+        edges = histograms[0].edges if edges is None else np.asarray(edges, dtype=np.float64)
+        n, nbins = len(histograms), len(edges) - 1
+        values = np.empty((n, nbins))
+        errors2 = np.empty((n, nbins))
+        entries = np.empty((n, nbins))
+
+        # histogramy se stejnými hranami jako jedno maticové násobení
+        groups = {}
+        for i, h in enumerate(histograms):
+            groups.setdefault((h.lower.tobytes(), h.upper.tobytes()), []).append(i)
+        for rows in groups.values():
+            first = histograms[rows[0]]
+            stacked_values = np.stack([histograms[i].values for i in rows])
+            stacked_errors2 = np.stack([histograms[i].errors for i in rows]) ** 2
+            stacked_entries = np.stack([histograms[i].entries for i in rows])
+            if len(first) == nbins and np.allclose(first.edges, edges):
+                values[rows], errors2[rows], entries[rows] = stacked_values, stacked_errors2, stacked_entries
+            else:
+                matrix = rebin_matrix(first.lower, first.upper, edges, log)
+                values[rows] = stacked_values @ matrix
+                errors2[rows] = stacked_errors2 @ matrix ** 2
+                entries[rows] = stacked_entries @ matrix
+        return cls(edges, values, np.sqrt(errors2), entries, labels, histograms[0].meta)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return Histogram(self.edges[:-1], self.edges[1:], self.values[i], self.errors[i],
+                         self.entries[i], self.meta)
+
+    def sum(self):
+        """Součet všech histogramů, chyby kvadraticky."""
+        return Histogram(self.edges[:-1], self.edges[1:],
+                         self.values.sum(axis=0),
+                         np.sqrt((self.errors ** 2).sum(axis=0)),
+                         self.entries.sum(axis=0),
+                         self.meta)
+
+    def integrals(self):
+        return self.values.sum(axis=1)
+
+    def normalised(self, mode='integral'):
+        """
+        Dávková normalizace všech řádků: 'integral' (součet = 1), 'max' (maximum = 1)
+        nebo 'width' (obsah / šířka binu, tj. diferenciální spektrum).
+        """
+        if mode == 'integral':
+            scale = self.values.sum(axis=1, keepdims=True)
+        elif mode == 'max':
+            scale = self.values.max(axis=1, keepdims=True)
+        elif mode == 'width':
+            scale = np.diff(self.edges)[None, :]
+        else:
+            raise ValueError(f"Unknown normalisation {mode!r}")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(scale != 0, self.values / scale, 0.0)
+            errors = np.where(scale != 0, self.errors / np.abs(scale), 0.0)
+        return HistogramStack(self.edges, values, errors, self.entries, self.labels, self.meta)
+
+    def cumulative(self, reverse=False):
+        values, errors2 = self.values, self.errors ** 2
+        if reverse:
+            values = np.cumsum(values[:, ::-1], axis=1)[:, ::-1]
+            errors2 = np.cumsum(errors2[:, ::-1], axis=1)[:, ::-1]
+        else:
+            values = np.cumsum(values, axis=1)
+            errors2 = np.cumsum(errors2, axis=1)
+        return HistogramStack(self.edges, values, np.sqrt(errors2), self.entries, self.labels, self.meta)
+
+
+def combine(csv_files, store=None, index=None, edges=None):
+    """Součet HIST_1D bloků (např. stejné spektrum ze všech částí spektra jednoho objemu)."""
+    histograms = [Histogram.from_block(f, store, index) for f in csv_files]
+    return HistogramStack.from_histograms(histograms, edges, labels=csv_files).sum()
@@ -1,144 +1,578 @@
 import os
-import re
-import pandas as pd
+import math
 import numpy as np
-import matplotlib.pyplot as plt
-from tqdm import tqdm
-from io import StringIO
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+from classes.gras_reader import GrasBlockReader, BlockTypeIndex
+from classes.histogram import load_histogram, Histogram2D
+from classes.build_manifest import bytes_digest
+from classes.plot_cache import content_key
+from classes.atomic_output import atomic_open
+from classes.profiler import span
+from classes.file_name_parser import container_physical_volume, container_spectrum_type, format_physical_volume
+
+# matplotlib a tqdm se načítají až ve funkcích, které kreslí – import modulu kvůli
+# scan_files / plot_output_path (main.py, report, watch) tak nestojí ~0.5 s
 ROOT_DIR = 'generated-data'
 OUTPUT_ROOT = 'plots'
+# typy bloků, které se kreslí po jednom (layout 'single')
+PLOT_TYPES = ('HIST_1D', 'HIST_2D')
+# jemnější histogramy se kreslí sloučené – víc sloupců / buněk než pixelů grafu nemá smysl
+MAX_PLOT_BINS = 2000
+MAX_PLOT_CELLS = 600
+
 
+def block_types(root=ROOT_DIR, manifest=None, store=None, catalogue=None):
+    """
+    BlockTypeIndex bloků pod root. Typy se berou z katalogu nebo metadat store, kam
+    se zapisují při dělení; jen bez nich se projdou hlavičky souborů (s manifestem
+    jen u změněných souborů).
+    """
+    if catalogue is not None:
+        return catalogue.type_index()
+    if store is not None and store.containers():
+        return store.type_index(root)
 
-def scan_files(root=ROOT_DIR):
-    matched_files = []
+    types = BlockTypeIndex()
+    seen = []
     for subdir, dirs, files in os.walk(root):
+        # .partial / .old složky rozepsaných kontejnerů (ContainerWriter)
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
         for file in files:
-            if file.endswith('.csv'):
-                filepath = os.path.join(subdir, file)
-                with open(filepath, 'r') as f:
-                    for line in f:
-                        if "'GRAS_DATA_TYPE',   -1,'HIST_1D'" in line:
-                            matched_files.append(filepath)
-                            break
-    return matched_files
-
-
-def extract_data(csv_file):
-    metadata = {}
-    data_lines = []
-
-    with open(csv_file, 'r') as f:
-        for line in f:
-            stripped = line.strip()
-            if stripped.startswith("'"):
-                content = stripped.lstrip("'").strip()
-                if content.startswith('X_AXIS_SCALE'):
-                    metadata['x_axis_scale'] = content.split(',')[2].strip().strip("'\"")
-                elif content.startswith('X_AXIS_UNITS'):
-                    metadata['x_axis_units'] = content.split(',')[2].strip().strip("'\"")
-                elif content.startswith('Y_AXIS_UNITS'):
-                    metadata['y_axis_units'] = content.split(',')[2].strip().strip("'\"")
-                elif content.startswith('X_AXIS_LABEL'):
-                    metadata['x_axis_label'] = content.split(',')[2].strip().strip("'\"")
-                elif content.startswith('Y_AXIS_LABEL'):
-                    metadata['y_axis_label'] = content.split(',')[2].strip().strip("'\"")
-                elif content.startswith('HIST_TITLE'):
-                    metadata['title'] = content.split(',')[2].strip().strip("'\"")
-            if re.match(r'^\s*[\d\.\+\-]', line):
-                data_lines.append(line)
-
-    xlabel = metadata.get('x_axis_label', 'x')
-    ylabel = metadata.get('y_axis_label', 'y')
-    title = metadata.get('title', '')
-    xunits = metadata.get('x_axis_units', '')
-    yunits = metadata.get('y_axis_units', '')
-    xscale = metadata.get('x_axis_scale', 'linear')
-
-    if xunits:
-        xlabel += f" [{xunits}]"
-    if yunits:
-        ylabel += f" [{yunits}]"
-
-    column_names = ['lower', 'upper', 'mean', 'value', 'error', 'entries']
-    data_str = ''.join(data_lines)
-    df = pd.read_csv(StringIO(data_str), header=None, names=column_names).astype(float)
-
-    bin_lower = df['lower'].values
-    bin_upper = df['upper'].values
-    bin_center = (bin_lower + bin_upper) / 2
-    dose = df['value'].values
-    dose_error = df['error'].values
-
-    return {
-        'bin_lower': bin_lower,
-        'bin_upper': bin_upper,
-        'bin_center': bin_center,
-        'dose': dose,
-        'dose_error': dose_error,
-        'xlabel': xlabel,
-        'ylabel': ylabel,
-        'title': title,
-        'xscale': xscale,
-        'file_name': os.path.basename(csv_file),
-        'csv_path': csv_file
-    }
+            if not file.endswith('.csv'):
+                continue
+            filepath = os.path.join(subdir, file)
+            seen.append(filepath)
+            if manifest is not None:
+                digest = manifest.block_digest(filepath)
+                if manifest.unchanged('types', filepath, digest):
+                    types.add(filepath, *manifest.get('types', filepath))
+                    continue
+            # rozdělený soubor má jediný blok, stačí první hlavička
+            with GrasBlockReader(filepath) as reader:
+                block = next(iter(reader), None)
+            entry = (block.data_type, block.module_type, block.title) if block is not None else (None, None, None)
+            types.add(filepath, *entry)
+            if manifest is not None:
+                manifest.record('types', filepath, digest, data=list(entry))
+    if manifest is not None:
+        manifest.prune('types', seen)
+        # záznamy starší verze (jen seznam typů souboru)
+        manifest.prune('scan', ())
+    return types
+
+
+def scan_files(root=ROOT_DIR, data_type='HIST_1D', manifest=None, store=None, catalogue=None,
+               module_type=None, title=None, types=None):
+    """
+    Cesty bloků pod root podle typu (a volitelně modulu a titulu); data_type může
+    být i n-tice typů (PLOT_TYPES). Pro opakované dotazy stačí jednou sestavit
+    block_types() a předávat ho jako types.
+    """
+    if types is None:
+        types = block_types(root, manifest, store, catalogue)
+    prefix = os.path.normpath(root).replace(os.sep, '/') + '/'
+    data_types = data_type if isinstance(data_type, (tuple, list)) else (data_type,)
+    paths = set()
+    for t in data_types:
+        paths.update(types.paths(data_type=t, module_type=module_type, title=title))
+    return [path.replace('/', os.sep) for path in sorted(paths) if path.startswith(prefix)]
+
+
+def extract_data(csv_file, store=None, index=None):
+    """Data grafu bloku (1D nebo 2D podle sloupců), u jemných histogramů sloučená pro kreslení."""
+    histogram = load_histogram(csv_file, store, index)
+    if isinstance(histogram, Histogram2D):
+        return histogram.downsampled(MAX_PLOT_CELLS).plot_data()
+    return histogram.downsampled(MAX_PLOT_BINS).plot_data()
+
+
+def draw_histogram(ax, data, rel_path):
+    ax.bar(data['bin_lower'], data['dose'],
+           width=(data['bin_upper'] - data['bin_lower']),
+           align='edge',
+           edgecolor='black',
+           alpha=0.6,
+           label='Dose per bin')
+
+    if np.any(data['dose_error'] > 0):
+        ax.errorbar(data['bin_center'], data['dose'],
+                    yerr=data['dose_error'],
+                    fmt='o',
+                    ecolor='firebrick',
+                    elinewidth=2,
+                    capsize=5,
+                    capthick=2,
+                    markersize=6,
+                    label='Error')
+
+    ax.set_xscale(data['xscale'])
+    ax.set_xlabel(data['xlabel'])
+    ax.set_ylabel(data['ylabel'])
+    ax.set_title(f"{data['title']}\n{rel_path.replace('_', ' ').capitalize()} - ({data['file_name']})")
+    ax.set_xlim(data['bin_lower'].min(), data['bin_upper'].max())
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5, alpha=0.7)
+    ax.legend()
+
+
+def draw_histogram2d(figure, ax, data, rel_path):
+    from matplotlib.colors import LogNorm
+
+    values = data['values']
+    positive = values > 0
+    # spektra přes řády -> logaritmická barevná škála, prázdné buňky bez barvy
+    norm = LogNorm(vmin=values[positive].min(), vmax=values.max()) if positive.any() else None
+    mesh = ax.pcolormesh(data['x_edges'], data['y_edges'], np.ma.masked_where(~positive, values),
+                         norm=norm, shading='flat')
+    figure.colorbar(mesh, ax=ax, label=data['zlabel'])
+    ax.set_xscale(data['xscale'])
+    ax.set_yscale(data['yscale'])
+    ax.set_xlabel(data['xlabel'])
+    ax.set_ylabel(data['ylabel'])
+    ax.set_title(f"{data['title']}\n{rel_path.replace('_', ' ').capitalize()} - ({data['file_name']})")
+
+
+# Jedna figura/osy na proces – vytvoření figury je nejdražší část vykreslení.
+# Figure bez pyplotu se ukládá přes Agg canvas, nic interaktivního se nenačítá.
+_figure = None
+_axes = None
+
+
+def _default_subplot_params():
+    from matplotlib import rcParams
+
+    return {k: rcParams[f'figure.subplot.{k}'] for k in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')}
+
+
+def _init_renderer():
+    global _figure, _axes
+    from matplotlib.figure import Figure
+
+    _figure = Figure(figsize=(12, 5))
+    _axes = _figure.add_subplot()
+
+
+# Výstupní profily grafu: přípona a dpi (None = vektor). Všechny vybrané profily
+# se uloží z jednoho vykreslení figury.
+PLOT_PROFILES = {
+    'png': ('.png', 300),
+    'pdf': ('.pdf', None),
+    'svg': ('.svg', None),
+    'thumb': ('.thumb.png', 40),
+}
+DEFAULT_PROFILES = ('png',)
+# zvýšit při změně vzhledu grafů – zneplatní PlotCache
+RENDER_VERSION = 1
+
+
+def plot_output_path(file, root_dir, output_root, profile='png'):
+    # Same relative subfolder and filename as the CSV, but .png (.pdf, .svg, .thumb.png)
+    rel_path = os.path.relpath(os.path.dirname(file), root_dir)
+    file_stem = os.path.basename(file).replace('.csv', PLOT_PROFILES[profile][0])
+    return os.path.join(output_root, rel_path, file_stem)
+
+
+def save_figure(figure, path, dpi):
+    """savefig přes dočasný soubor a rename – přerušený běh nenechá useknutý graf."""
+    with atomic_open(path) as f:
+        figure.savefig(f, format=os.path.splitext(path)[1][1:], dpi=dpi)
+
+
+def save_profiles(figure, base_path, profiles, png_dpi=None):
+    """Uloží figuru do všech profilů; base_path je cesta bez přípony. Vrací seznam souborů."""
+    outputs = []
+    for profile in profiles:
+        ext, dpi = PLOT_PROFILES[profile]
+        output_path = f"{base_path}{ext}"
+        save_figure(figure, output_path, png_dpi if profile == 'png' and png_dpi else dpi or 'figure')
+        outputs.append(output_path)
+    return outputs
+
+
+def render_file(file, root_dir, output_root, store=None, index=None, profiles=DEFAULT_PROFILES, cache=None):
+    """Vykreslí blok do všech profilů (první výstup je hlavní) a vrátí seznam souborů."""
+    with span('extract'):
+        data = extract_data(file, store, index)
+
+    # Determine relative subfolder and create matching output folder
+    rel_path = os.path.relpath(os.path.dirname(file), root_dir)
+    outputs = {profile: plot_output_path(file, root_dir, output_root, profile) for profile in profiles}
+    os.makedirs(os.path.dirname(outputs[profiles[0]]), exist_ok=True)
+
+    hist2d = data.get('kind') == 'hist2d'
+    missing = list(profiles)
+    keys = {}
+    if cache is not None:
+        if hist2d:
+            base = (RENDER_VERSION, 'hist2d', data['x_edges'], data['y_edges'], data['values'], data['xlabel'],
+                    data['ylabel'], data['zlabel'], data['title'], data['xscale'], data['yscale'],
+                    data['file_name'], rel_path)
+        else:
+            base = (RENDER_VERSION, data['bin_lower'], data['bin_upper'], data['dose'], data['dose_error'],
+                    data['xlabel'], data['ylabel'], data['title'], data['xscale'], data['file_name'], rel_path)
+        keys = {profile: content_key(*base, profile, *PLOT_PROFILES[profile]) for profile in profiles}
+        missing = [p for p in profiles if not cache.fetch(keys[p], PLOT_PROFILES[p][0], outputs[p])]
+
+    if missing:
+        with span('draw'):
+            if hist2d:
+                # barevná škála přidává osy – 2D graf má vlastní figuru, sdílená zůstává čistá
+                from matplotlib.figure import Figure
+
+                figure = Figure(figsize=(12, 5))
+                draw_histogram2d(figure, figure.add_subplot(), data, rel_path)
+            else:
+                if _figure is None:
+                    _init_renderer()
+                figure = _figure
+                _axes.clear()
+                # tight_layout vychází z aktuálních okrajů – vrátíme výchozí, aby graf
+                # nezávisel na tom, co se na figuru kreslilo předtím
+                _figure.subplots_adjust(**_default_subplot_params())
+                draw_histogram(_axes, data, rel_path)
+            figure.tight_layout()
+
+        with span('save'):
+            for profile in missing:
+                ext, dpi = PLOT_PROFILES[profile]
+                save_figure(figure, outputs[profile], dpi or 'figure')
+                if cache is not None:
+                    cache.put(keys[profile], ext, outputs[profile])
+    return [outputs[p] for p in profiles]
+
+
+# --- dávkové layouty: mřížka bloků kontejneru / překryv stejné veličiny ---
+# Figury se drží podle tvaru layoutu a artisty (sloupce, chybové úsečky, schody)
+# se při dalším grafu jen přenastaví přes set_height/set_segments/set_data.
+# Nový artist vzniká jen tehdy, když se změní počet binů nebo křivek.
+
+GRID_COLUMNS = 2
+LAYOUT_DPI = 150
+_layouts = {}
+
+
+def _layout(kind, nrows, ncols, panel_size):
+    key = (kind, nrows, ncols)
+    if key not in _layouts:
+        from matplotlib.figure import Figure
+
+        figure = Figure(figsize=(panel_size[0] * ncols, panel_size[1] * nrows))
+        axes = figure.subplots(nrows, ncols, squeeze=False).ravel()
+        _layouts[key] = (figure, axes, [{} for _ in axes])
+    return _layouts[key]
+
+
+def _update_bars(ax, artists, data):
+    lower, upper = data['bin_lower'], data['bin_upper']
+    values, errors, centers = data['dose'], data['dose_error'], data['bin_center']
+    bars = artists.get('bars')
+    if bars is None or len(bars.patches) != len(values):
+        if bars is not None:
+            bars.remove()
+            artists['errors'].remove()
+        artists['bars'] = ax.bar(lower, values, width=upper - lower, align='edge',
+                                 edgecolor='black', linewidth=0.5, alpha=0.6)
+        artists['errors'] = ax.errorbar(centers, values, yerr=errors, fmt='none',
+                                        ecolor='firebrick', elinewidth=1, capsize=2)
+    else:
+        for rect, x, width, height in zip(bars.patches, lower, upper - lower, values):
+            rect.set_x(x)
+            rect.set_width(width)
+            rect.set_height(height)
+        _, caplines, (barlines,) = artists['errors'].lines
+        low, high = values - errors, values + errors
+        barlines.set_segments(np.stack([np.column_stack([centers, low]), np.column_stack([centers, high])], axis=1))
+        caplines[0].set_data(centers, low)
+        caplines[1].set_data(centers, high)
+
+    has_errors = bool(np.any(errors > 0))
+    for artist in artists['errors'].get_children():
+        artist.set_visible(has_errors)
+
+    ax.set_xscale(data['xscale'])
+    ax.set_xlim(lower.min(), upper.max())
+    top = float(np.max(values + errors)) if len(values) else 0.0
+    bottom = min(0.0, float(np.min(values - errors))) if len(values) else 0.0
+    ax.set_ylim(bottom, top * 1.05 if top > 0 else 1.0)
+
+
+def _style_axes(ax, data, title):
+    ax.set_xlabel(data['xlabel'], fontsize=8)
+    ax.set_ylabel(data['ylabel'], fontsize=8)
+    ax.set_title(title, fontsize=9)
+    ax.tick_params(labelsize=7)
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5, alpha=0.7)
+
+
+def render_grid(files, base_path, title, store=None, index=None, ncols=GRID_COLUMNS, profiles=DEFAULT_PROFILES):
+    """Všechny zadané bloky do jedné figury (mřížka ncols sloupců)."""
+    ncols = max(1, min(ncols, len(files)))
+    nrows = math.ceil(len(files) / ncols)
+    figure, axes, artists = _layout('grid', nrows, ncols, (6, 3.2))
+
+    for i, ax in enumerate(axes):
+        if i >= len(files):
+            ax.set_visible(False)
+            continue
+        ax.set_visible(True)
+        with span('extract'):
+            data = extract_data(files[i], store, index)
+        _update_bars(ax, artists[i], data)
+        _style_axes(ax, data, f"{data['title']} ({data['file_name']})")
+
+    figure.suptitle(title, fontsize=10)
+    figure.tight_layout()
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    with span('save'):
+        return save_profiles(figure, base_path, profiles, LAYOUT_DPI)
+
+
+def render_overlay(files, labels, base_path, store=None, index=None, profiles=DEFAULT_PROFILES):
+    """Stejná veličina z více kontejnerů jako schodové křivky na společných osách."""
+    figure, (ax,), (artists,) = _layout('overlay', 1, 1, (12, 5))
+    with span('extract'):
+        series = [extract_data(f, store, index) for f in files]
+
+    steps = artists.get('steps', [])
+    if len(steps) != len(series):
+        for step in steps:
+            step.remove()
+        steps = [ax.stairs(d['dose'], np.append(d['bin_lower'], d['bin_upper'][-1]), linewidth=1.5)
+                 for d in series]
+        artists['steps'] = steps
+    for step, data, label in zip(steps, series, labels):
+        step.set_data(data['dose'], np.append(data['bin_lower'], data['bin_upper'][-1]))
+        step.set_label(label)
+
+    lower = min(d['bin_lower'].min() for d in series)
+    upper = max(d['bin_upper'].max() for d in series)
+    values = np.concatenate([d['dose'] for d in series])
+    positive = values[values > 0]
+    ax.set_xscale(series[0]['xscale'])
+    ax.set_xlim(lower, upper)
+    if positive.size:
+        ax.set_yscale('log')
+        ax.set_ylim(positive.min() / 2, positive.max() * 2)
+    else:
+        ax.set_yscale('linear')
+        ax.set_ylim(0, 1)
+    _style_axes(ax, series[0], series[0]['title'])
+    ax.legend(fontsize=7)
+
+    figure.tight_layout()
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    with span('save'):
+        return save_profiles(figure, base_path, profiles, LAYOUT_DPI)
+
+
+def container_label(container_dir):
+    """'U1-AD585 solar_proton' z názvu složky kontejneru."""
+    name = os.path.basename(container_dir)
+    return f"{format_physical_volume(container_physical_volume(name))} {container_spectrum_type(name)}"
+
+
+def render_group(layout, key, files, base_path, store=None, index=None, profiles=DEFAULT_PROFILES):
+    if layout == 'grid':
+        return render_grid(files, base_path, key.replace('_', ' '), store, index, profiles=profiles)
+    labels = [container_label(os.path.dirname(f)) for f in files]
+    return render_overlay(files, labels, base_path, store, index, profiles)
 
 
 class HistogramPlotter:
-    def __init__(self, files, root_dir=ROOT_DIR, output_root=OUTPUT_ROOT):
+    def __init__(self, files, root_dir=ROOT_DIR, output_root=OUTPUT_ROOT, jobs=1, manifest=None, store=None,
+                 index=None, layout='single', profiles=DEFAULT_PROFILES, cache=None, progress=True, profiler=None):
         self.files = files
         self.root_dir = root_dir
         self.output_root = output_root
+        # počet procesů pro vykreslování (0 = všechna jádra)
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        # BuildManifest pro inkrementální běh; None = vykreslí se vše
+        self.manifest = manifest
+        # HistogramStore – data bloků se čtou z binárního cache místo CSV
+        self.store = store
+        # BlockIndex – v režimu bez dělení se bloky čtou z původních kontejnerů
+        self.index = index
+        # 'single' = PNG na blok, 'grid' = bloky kontejneru v jedné figuře,
+        # 'overlay' = stejný blok ze všech kontejnerů na společných osách
+        self.layout = layout
+        # výstupní profily (PLOT_PROFILES) ukládané z jednoho vykreslení
+        self.profiles = tuple(profiles)
+        # PlotCache – grafy se stejným obsahem se nekreslí znovu
+        self.cache = cache
+        # False = bez progress barů (neinteraktivní běh)
+        self.progress = progress
+        # PipelineProfiler – čas, CPU a I/O každého grafu
+        self.profiler = profiler
+        # soubor / skupina -> chyba z posledního plot_all()
+        self.failed = {}
+        self._digests = {}
+
+    def outdated_files(self):
+        """Soubory, jejichž graf chybí nebo vznikl z jiného obsahu bloku. Smaže grafy zaniklých bloků."""
+        from tqdm import tqdm
+
+        if self.manifest is None:
+            return list(self.files)
+
+        removed = self.manifest.prune('plot', self.files)
+        if removed:
+            for folder in {os.path.dirname(p) for p in removed}:
+                if os.path.isdir(folder) and not os.listdir(folder):
+                    os.rmdir(folder)
+            tqdm.write(f"🧹 Removed {len(removed)} stale plot(s).")
+
+        outdated = []
+        for file in self.files:
+            digest = self._with_profiles(self.manifest.block_digest(file))
+            if not self.manifest.unchanged('plot', file, digest):
+                self._digests[file] = digest
+                outdated.append(file)
+        skipped = len(self.files) - len(outdated)
+        if skipped:
+            tqdm.write(f"✓ {skipped} plot(s) up to date, skipping.")
+        return outdated
+
+    def _with_profiles(self, digest):
+        # jiná sada profilů = jiné výstupy, záznam v manifestu pak nesedí
+        if self.profiles == DEFAULT_PROFILES:
+            return digest
+        return f"{digest}:{','.join(self.profiles)}"
+
+    def _failed(self, key, error, action='process'):
+        from tqdm import tqdm
+
+        self.failed[key] = error
+        tqdm.write(f"❌ Failed to {action} {key}: {error}")
+
+    def _task(self, func):
+        return func if self.profiler is None else self.profiler.wrap(func)
+
+    def _call(self, key, func, *args):
+        if self.profiler is None:
+            return func(*args)
+        return self.profiler.call('plot', key, func, *args)
+
+    def _result(self, key, value):
+        return value if self.profiler is None else self.profiler.unwrap('plot', key, value)
+
+    def _rendered(self, file, outputs):
+        if self.manifest is not None:
+            self.manifest.record('plot', file, self._digests[file], outputs)
+
+    def groups(self):
+        """{klíč skupiny: soubory} pro layout 'grid' (podle kontejneru) nebo 'overlay' (podle bloku)."""
+        groups = {}
+        for file in sorted(self.files):
+            if self.layout == 'grid':
+                key = os.path.relpath(os.path.dirname(file), self.root_dir)
+            else:
+                key = os.path.splitext(os.path.basename(file))[0]
+            groups.setdefault(key, []).append(file)
+        return groups
+
+    def group_output_path(self, key):
+        """Cesta výstupu skupiny bez přípony (doplní ji profil)."""
+        folder = 'grids' if self.layout == 'grid' else 'overlays'
+        return os.path.join(self.output_root, folder, key.replace(os.sep, '__'))
+
+    def plot_groups(self):
+        from tqdm import tqdm
+
+        stage = f"plot-{self.layout}"
+        groups = self.groups()
+        pending = {}
+        if self.manifest is not None:
+            self.manifest.prune(stage, groups)
+        for key, files in groups.items():
+            if self.manifest is not None:
+                digest = self._with_profiles(bytes_digest("\n".join(
+                    f"{f}:{self.manifest.block_digest(f)}" for f in files).encode('utf-8')))
+                if self.manifest.unchanged(stage, key, digest):
+                    continue
+                self._digests[key] = digest
+            pending[key] = files
+        skipped = len(groups) - len(pending)
+        if skipped:
+            tqdm.write(f"✓ {skipped} {self.layout} figure(s) up to date, skipping.")
+
+        def done(key, outputs):
+            if self.manifest is not None:
+                self.manifest.record(stage, key, self._digests[key], outputs)
+
+        if self.jobs <= 1 or len(pending) <= 1:
+            for key, files in tqdm(pending.items(), desc=f"Generating {self.layout} figures", unit="fig",
+                                   disable=not self.progress):
+                try:
+                    done(key, self._call(key, render_group, self.layout, key, files, self.group_output_path(key),
+                                         self.store, self.index, self.profiles))
+                except Exception as e:
+                    self._failed(key, e, 'render')
+            return
+
+        workers = min(self.jobs, len(pending))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._task(render_group), self.layout, key, files, self.group_output_path(key),
+                                self.store, self.index, self.profiles): key
+                for key, files in pending.items()
+            }
+            with tqdm(total=len(futures), desc=f"Generating {self.layout} figures ({workers} workers)", unit="fig",
+                      disable=not self.progress) as bar:
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        done(key, self._result(key, future.result()))
+                    except Exception as e:
+                        self._failed(key, e, 'render')
+                    bar.update(1)
 
     def plot_all(self):
-        for file in tqdm(self.files, desc="Generating plots", unit="file"):
-            try:
-                data = extract_data(file)
-            except Exception as e:
-                tqdm.write(f"❌ Failed to process {file}: {e}")
-                continue
+        if self.layout != 'single':
+            return self.plot_groups()
+
+        self.plot_files(self.outdated_files())
+        self.prune_cache()
+
+    def prune_cache(self):
+        from tqdm import tqdm
+
+        if self.cache is None:
+            return
+        removed = self.cache.prune()
+        if removed:
+            tqdm.write(f"🧹 Removed {removed} least recently used plot(s) from {self.cache.root}.")
+
+    def plot_files(self, files):
+        from tqdm import tqdm
+
+        if self.jobs <= 1 or len(files) <= 1:
+            for file in tqdm(files, desc="Generating plots", unit="file", disable=not self.progress):
+                try:
+                    outputs = self._call(file, render_file, file, self.root_dir, self.output_root, self.store,
+                                         self.index, self.profiles, self.cache)
+                except Exception as e:
+                    self._failed(file, e)
+                    continue
+                self._rendered(file, outputs)
+            return
 
-            # Determine relative subfolder and create matching output folder
-            rel_path = os.path.relpath(os.path.dirname(file), self.root_dir)
-            output_dir = os.path.join(self.output_root, rel_path)
-            os.makedirs(output_dir, exist_ok=True)
-
-            fig, ax = plt.subplots(figsize=(12, 5))
-
-            ax.bar(data['bin_lower'], data['dose'],
-                   width=(data['bin_upper'] - data['bin_lower']),
-                   align='edge',
-                   edgecolor='black',
-                   alpha=0.6,
-                   label='Dose per bin')
-
-            if np.any(data['dose_error'] > 0):
-                ax.errorbar(data['bin_center'], data['dose'],
-                            yerr=data['dose_error'],
-                            fmt='o',
-                            ecolor='firebrick',
-                            elinewidth=2,
-                            capsize=5,
-                            capthick=2,
-                            markersize=6,
-                            label='Error')
-
-            ax.set_xscale(data['xscale'])
-            ax.set_xlabel(data['xlabel'])
-            ax.set_ylabel(data['ylabel'])
-            ax.set_title(f"{data['title']}\n{rel_path.replace('_', ' ').capitalize()} - ({data['file_name']})")
-            ax.set_xlim(data['bin_lower'].min(), data['bin_upper'].max())
-            ax.grid(True, which='both', linestyle='--', linewidth=0.5, alpha=0.7)
-            ax.legend()
-
-            fig.tight_layout()
-
-            # Save with same filename but .png
-            file_stem = data['file_name'].replace('.csv', '.png')
-            output_path = os.path.join(output_dir, file_stem)
-            fig.savefig(output_path, dpi=300)
-            plt.close(fig)
+        workers = min(self.jobs, len(files))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer) as executor:
+            futures = {
+                executor.submit(self._task(render_file), file, self.root_dir, self.output_root, self.store,
+                                self.index, self.profiles, self.cache): file
+                for file in files
+            }
+            # progress se počítá v hlavním procesu podle dokončených úloh
+            with tqdm(total=len(futures), desc=f"Generating plots ({workers} workers)", unit="file",
+                      disable=not self.progress) as bar:
+                for future in as_completed(futures):
+                    file = futures[future]
+                    try:
+                        self._rendered(file, self._result(file, future.result()))
+                    except Exception as e:
+                        self._failed(file, e)
+                    bar.update(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,351 @@
+import os
+import json
+import struct
+
+import numpy as np
+
+from classes.gras_reader import GrasBlockReader, BlockTypeIndex, MEMORY_CAP
+from classes.atomic_output import fsync_file, fsync_dir
+
+STORE_DIR = 'histogram-store'
+HIST_COLUMNS = ('lower', 'upper', 'mean', 'value', 'error', 'entries')
+HIST2D_COLUMNS = ('xlower', 'xupper', 'xmean', 'ylower', 'yupper', 'ymean', 'value', 'error', 'entries')
+# pole store podle sloupců bloku: druh -> (přípona souboru, sloupce)
+ARRAYS = {
+    'HIST_1D': ('', HIST_COLUMNS),
+    'HIST_2D': ('.hist2d', HIST2D_COLUMNS),
+}
+# hlavička .npy s rezervou, aby šla po zápisu dat přepsat skutečným počtem binů
+NPY_HEADER_SIZE = 128
+
+
+def array_kind(columns):
+    """Druh pole store (klíč ARRAYS) podle názvů sloupců bloku, None = data jdou do metadat."""
+    names = tuple(c[0] for c in columns)
+    return next((kind for kind, (_, cols) in ARRAYS.items() if names == cols), None)
+
+
+def npy_header(ncols, nbins):
+    """
+    Hlavička .npy (verze 1.0, NPY_HEADER_SIZE bajtů) pro float64 pole (sloupce, biny)
+    ve fortran pořadí – na disku jsou to řádky dat bloků za sebou, jak jdou v CSV.
+    """
+    header = f"{{'descr': '{np.dtype(np.float64).str}', 'fortran_order': True, 'shape': ({ncols}, {nbins}), }}"
+    prefix = np.lib.format.magic(1, 0)
+    padding = NPY_HEADER_SIZE - len(prefix) - 2 - len(header) - 1
+    return prefix + struct.pack('<H', len(header) + padding + 1) + header.encode('latin1') + b' ' * padding + b'\n'
+
+
+def load_block(csv_file, store=None, index=None):
+    """
+    První blok CSV souboru jako (pole hlavičky, názvy sloupců, data (sloupce, řádky)).
+    Když je blok ve store, nic se neparsuje a sloupce jsou pohledy do memmapu.
+    Když je v BlockIndex, čte se přímo výřez původního kontejneru.
+    """
+    _, fields, columns, data = load_block_with_header(csv_file, store, index)
+    return fields, [c[0] for c in columns], data
+
+
+def load_block_with_header(csv_file, store=None, index=None):
+    """Jako load_block, ale vrací (řádky hlavičky, pole, popisy sloupců, data)."""
+    stored = store.lookup(csv_file) if store is not None else None
+    if stored is not None:
+        return stored.header, stored.fields, [tuple(c) for c in stored.meta['columns']], stored.data
+
+    if index is not None and csv_file in index:
+        reader = index.open(csv_file)
+    else:
+        reader = GrasBlockReader(csv_file)
+    with reader:
+        block = next(iter(reader), None)
+        if block is None:
+            raise ValueError(f"No GRAS block found in {csv_file}")
+        data = reader.read_array(block).T
+    return block.header, block.fields, block.columns, data
+
+
+def extract_scalar(csv_file, store=None, index=None):
+    """
+    STAT_DOUBLE blok (total_dose, total_fluence, ...) -> slovník hodnot podle
+    názvů sloupců, např. {'Dose': 12.3, 'Error': 0.4, 'Entries': ..., ...}.
+    Bloky s více řádky (po druzích částic) mají místo skalárů pole po řádcích.
+    """
+    fields, names, data = load_block(csv_file, store, index)
+    if data.shape[1] == 1:
+        values = {name: float(column[0]) for name, column in zip(names, data)}
+    else:
+        values = {name: np.asarray(column) for name, column in zip(names, data)}
+    return {
+        'values': values,
+        'data': data,
+        'title': fields.get('GRAS_DATA_TITLE', ''),
+        'module_type': fields.get('GRAS_MODULE_TYPE', ''),
+        'file_name': os.path.basename(csv_file),
+        'csv_path': csv_file
+    }
+
+
+class StoredBlock:
+    """Jeden blok ze store: metadata hlavičky + sloupce dat (pohledy do memmapu)."""
+    __slots__ = ('name', 'meta', 'data')
+
+    def __init__(self, name, meta, data):
+        self.name = name
+        self.meta = meta
+        self.data = data  # (sloupce, řádky)
+
+    @property
+    def fields(self):
+        return self.meta['fields']
+
+    @property
+    def header(self):
+        return self.meta['header']
+
+    @property
+    def data_type(self):
+        return self.meta.get('data_type') or self.meta['fields'].get('GRAS_DATA_TYPE')
+
+    @property
+    def column_names(self):
+        return [c[0] for c in self.meta['columns']]
+
+    def column(self, name):
+        return self.data[self.column_names.index(name)]
+
+
+class ContainerStoreWriter:
+    """
+    Zápis jednoho kontejneru do store blok po bloku (GrasBlockSplitter.split_container).
+    Data histogramů jdou rovnou do těla .npy souborů, takže kontejner není v paměti
+    nikdy celý: blok do memory_cap se dekóduje do pole a zapíše jedním tofile(),
+    větší se dekóduje po kusech textu přímo do memmapu výřezu souboru.
+    Soubory se píšou jako .tmp, v close() se fsyncnou a až pak přejmenují na místo.
+
+        with store.writer(stem, 'container.csv') as writer:
+            for block in reader:
+                writer.add(block, reader)
+    """
+    def __init__(self, store, stem, source, memory_cap=None):
+        self.store = store
+        self.stem = stem
+        self.source = source
+        self.memory_cap = memory_cap or MEMORY_CAP
+        self.blocks = {}
+        # druh pole -> [otevřený .tmp soubor, počet binů]
+        self._files = {}
+
+    def __enter__(self):
+        os.makedirs(self.store.root, exist_ok=True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _file(self, kind):
+        if kind not in self._files:
+            f = open(f"{self.store.array_path(self.stem, kind)}.tmp", 'w+b')
+            f.write(npy_header(len(ARRAYS[kind][1]), 0))
+            self._files[kind] = [f, 0]
+        return self._files[kind]
+
+    def _meta(self, block):
+        return {
+            'index': block.index,
+            'data_type': block.data_type,
+            'fields': block.fields,
+            'header': block.header,
+            'columns': block.columns,
+        }
+
+    def add(self, block, reader):
+        """Blok z GrasBlockReader; data se čtou až tady, do paměti nejvýš memory_cap."""
+        kind = array_kind(block.columns)
+        shape = block.shape
+        ncols = len(ARRAYS[kind][1]) if kind is not None else None
+        if kind is None or shape is None or shape[1] != ncols or shape[0] * ncols * 8 <= self.memory_cap:
+            return self.add_array(block, reader.read_array(block))
+
+        entry = self._file(kind)
+        f, offset = entry
+        position = NPY_HEADER_SIZE + offset * ncols * 8
+        f.truncate(position + shape[0] * ncols * 8)
+        out = np.memmap(f, dtype=np.float64, mode='r+', offset=position, shape=shape)
+        reader.read_array(block, out=out)
+        out.flush()
+        del out
+        f.seek(0, os.SEEK_END)
+        self._record(block, kind, offset, shape[0])
+        entry[1] += shape[0]
+
+    def add_array(self, block, data):
+        """Blok s už dekódovanými daty (řádky, sloupce)."""
+        kind = array_kind(block.columns)
+        if kind is None or data.ndim != 2 or data.shape[1] != len(ARRAYS[kind][1]):
+            meta = self._meta(block)
+            meta['rows'] = data.tolist()
+            self.blocks[block.file_stem] = meta
+            return
+        entry = self._file(kind)
+        np.ascontiguousarray(data, dtype=np.float64).tofile(entry[0])
+        self._record(block, kind, entry[1], data.shape[0])
+        entry[1] += data.shape[0]
+
+    def _record(self, block, kind, offset, nbins):
+        meta = self._meta(block)
+        meta['offset'] = offset
+        meta['nbins'] = nbins
+        if kind != 'HIST_1D':
+            meta['array'] = kind
+        self.blocks[block.file_stem] = meta
+
+    def close(self):
+        # pole HIST_1D má každý kontejner (i prázdné), podle něj has_container()
+        self._file('HIST_1D')
+        for kind, (f, nbins) in self._files.items():
+            f.seek(0)
+            f.write(npy_header(len(ARRAYS[kind][1]), nbins))
+            fsync_file(f)
+            f.close()
+        json_path = self.store.json_path(self.stem)
+        with open(f"{json_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'source': self.source, 'blocks': self.blocks}, f, ensure_ascii=False)
+            fsync_file(f)
+        for kind in ARRAYS:
+            path = self.store.array_path(self.stem, kind)
+            if kind in self._files:
+                os.replace(f"{path}.tmp", path)
+            elif os.path.exists(path):
+                # pole druhu, který v nové verzi kontejneru už není
+                os.remove(path)
+        os.replace(f"{json_path}.tmp", json_path)
+        fsync_dir(self.store.root)
+        self.store.forget(self.stem)
+
+    def abort(self):
+        for kind, (f, _) in self._files.items():
+            f.close()
+            os.remove(f"{self.store.array_path(self.stem, kind)}.tmp")
+        self._files = {}
+
+
+class HistogramStore:
+    """
+    Binární sloupcový cache bloků, který vzniká jednou při dělení kontejneru.
+
+    Pro každý kontejner (<stem> = název složky v generated-data) jsou soubory:
+      <stem>.npy        – float64 pole (6, N): sloupce lower/upper/mean/value/error/entries
+                          všech HIST_1D bloků za sebou; čte se přes mmap, bloky jsou pohledy
+      <stem>.hist2d.npy – stejně pro HIST_2D bloky (9 sloupců HIST2D_COLUMNS), jen když nějaké jsou
+      <stem>.json       – metadata bloků (pole hlavičky, řádky hlavičky, popisy sloupců,
+                          offset a počet binů v poli; ostatní bloky mají data přímo v 'rows')
+    Pole jsou ve fortran pořadí (na disku řádky dat za sebou), aby šla psát blok po bloku.
+    """
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self._meta = {}
+        self._arrays = {}
+
+    def __getstate__(self):
+        # do worker procesů posíláme jen cestu, memmapy si otevřou samy
+        return {'root': self.root}
+
+    def __setstate__(self, state):
+        self.__init__(state['root'])
+
+    def array_path(self, stem, kind='HIST_1D'):
+        return os.path.join(self.root, f"{stem}{ARRAYS[kind][0]}.npy")
+
+    def json_path(self, stem):
+        return os.path.join(self.root, f"{stem}.json")
+
+    def _paths(self, stem):
+        return self.array_path(stem), self.json_path(stem)
+
+    def containers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.root) if f.endswith('.json'))
+
+    def has_container(self, stem):
+        return all(os.path.exists(p) for p in self._paths(stem))
+
+    def writer(self, stem, source, memory_cap=None):
+        """ContainerStoreWriter pro zápis kontejneru blok po bloku."""
+        return ContainerStoreWriter(self, stem, source, memory_cap)
+
+    def write_container(self, stem, source, blocks):
+        """blocks: [(GrasBlock, pole dat (sloupce, řádky)), ...]"""
+        with self.writer(stem, source) as writer:
+            for block, data in blocks:
+                writer.add_array(block, data.T)
+
+    def forget(self, stem):
+        """Zahodí načtená metadata a memmapy kontejneru (po přepsání / smazání souborů)."""
+        self._meta.pop(stem, None)
+        for kind in ARRAYS:
+            self._arrays.pop((stem, kind), None)
+
+    def remove_container(self, stem):
+        for path in [self.array_path(stem, kind) for kind in ARRAYS] + [self.json_path(stem)]:
+            if os.path.exists(path):
+                os.remove(path)
+        self.forget(stem)
+
+    def meta(self, stem):
+        if stem not in self._meta:
+            json_path = self.json_path(stem)
+            if not os.path.exists(json_path):
+                return None
+            with open(json_path, 'r', encoding='utf-8') as f:
+                self._meta[stem] = json.load(f)
+        return self._meta[stem]
+
+    def array(self, stem, kind='HIST_1D'):
+        if (stem, kind) not in self._arrays:
+            self._arrays[stem, kind] = np.load(self.array_path(stem, kind), mmap_mode='r')
+        return self._arrays[stem, kind]
+
+    def get(self, stem, name):
+        meta = self.meta(stem)
+        if meta is None or name not in meta['blocks']:
+            return None
+        block_meta = meta['blocks'][name]
+        if 'offset' in block_meta:
+            start = block_meta['offset']
+            data = self.array(stem, block_meta.get('array', 'HIST_1D'))[:, start:start + block_meta['nbins']]
+        else:
+            data = np.array(block_meta['rows'], dtype=np.float64, ndmin=2).T
+        return StoredBlock(name, block_meta, data)
+
+    def lookup(self, csv_path):
+        """Blok podle cesty k CSV v generated-data (<root>/<stem>/<name>.csv)."""
+        stem = os.path.basename(os.path.dirname(csv_path))
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        return self.get(stem, name)
+
+    def type_index(self, root):
+        """BlockTypeIndex bloků kontejnerů, které mají složku v root (z metadat, CSV se neotevírají)."""
+        types = BlockTypeIndex()
+        for stem in self.containers():
+            if not os.path.isdir(os.path.join(root, stem)):
+                continue
+            for name, block_meta in self.meta(stem)['blocks'].items():
+                fields = block_meta['fields']
+                types.add(os.path.join(root, stem, f"{name}.csv"),
+                          block_meta.get('data_type') or fields.get('GRAS_DATA_TYPE'),
+                          fields.get('GRAS_MODULE_TYPE'), fields.get('GRAS_DATA_TITLE'))
+        return types
+
+    def block_names(self, stem, data_type=None):
+        meta = self.meta(stem)
+        if meta is None:
+            return []
+        return sorted(
+            name for name, block_meta in meta['blocks'].items()
+            if data_type is None
+            or (block_meta.get('data_type') or block_meta['fields'].get('GRAS_DATA_TYPE')) == data_type
+        )
@@ -0,0 +1,355 @@
+import os
+import time
+import zlib
+import asyncio
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from classes.gras_reader import END_OF_FILE
+from classes.gras_archive import list_containers, container_name, is_compressed, source_stat, open_container
+from classes.histogram_plotter import HistogramPlotter, scan_files, render_file, _init_renderer, DEFAULT_PROFILES, PLOT_TYPES
+from classes.file_name_parser import CsvPropertiesCollector
+
+QUEUE_SIZE = 8
+
+
+def container_complete(path, tail=64):
+    """True, pokud kontejner končí řádkem 'End of File' (GRAS ho zapisuje jako poslední)."""
+    if is_compressed(path):
+        return stream_complete(path, tail)
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - tail))
+            return f.read().rstrip().endswith(END_OF_FILE)
+    except OSError:
+        return False
+
+
+def stream_complete(path, tail=64, chunk_size=1 << 20):
+    """
+    container_complete() pro .gz / .zst / člen zipu: proud se celý dekomprimuje
+    a drží se jen jeho konec. Useknutý gzip skončí bez traileru (EOFError), zip
+    člen na CRC, zstd bez posledního rámce nemá 'End of File'.
+    """
+    errors = (OSError, EOFError, zlib.error, zipfile.BadZipFile)
+    try:
+        import zstandard
+        errors += (zstandard.ZstdError,)
+    except ImportError:
+        pass
+    try:
+        stream = open_container(path)
+    except RuntimeError:
+        # chybějící zstandard ohlásí až dělení
+        return True
+    except errors:
+        return False
+    end = b''
+    try:
+        with stream:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                end = (end + chunk)[-tail:]
+    except errors:
+        return False
+    return end.rstrip().endswith(END_OF_FILE)
+
+
+def file_signature(path):
+    try:
+        st = source_stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _executor(jobs, initializer=None):
+    if jobs <= 1:
+        return ThreadPoolExecutor(max_workers=1, initializer=initializer)
+    return ProcessPoolExecutor(max_workers=jobs, initializer=initializer)
+
+
+def _log(message):
+    print(f"\033[90m[{time.strftime('%H:%M:%S')}]\033[0m {message}", flush=True)
+
+
+class ImportWatcher:
+    """
+    Režim démona (main.py --watch): sleduje imported-data/ a kontejnery, které
+    doběhly, rovnou rozdělí, zaindexuje, vykreslí a případně přegeneruje report.
+
+    Kroky běží jako asyncio úlohy spojené omezenými frontami:
+
+        poll -> [split] -> split workery -> [plot] -> plot -> [report] -> report
+
+    Blokující práce (dělení, kreslení, report) běží v poolu, takže smyčka zůstává
+    volná pro další soubory; plná fronta zpomalí předchozí krok místo hromadění
+    práce. Katalog (SQLite) a manifest se mění jen ve vlákně smyčky. Dělení a
+    kreslení jednoho kontejneru se vylučují zámkem podle jeho složky v generated-data.
+
+    Kontejner je hotový, když končí 'End of File' a mezi dvěma průchody se
+    nezměnila jeho velikost ani mtime; komprimovaný se pro kontrolu konce celý
+    dekomprimuje (ve vlákně mimo smyčku, jednou pro každý podpis). Překreslují se jen grafy bloků, jejichž
+    hash se podle manifestu změnil; report bere nezměněné kontejnery z ReportCache.
+    """
+    def __init__(self, splitter, catalogue, manifest, store=None, jobs=1, output_root='output_plots',
+                 profiles=DEFAULT_PROFILES, cache=None, report_config=None, interval=2.0,
+                 queue_size=QUEUE_SIZE):
+        if manifest is None:
+            raise ValueError("Watch mode needs a BuildManifest to tell changed containers apart")
+        self.splitter = splitter
+        self.catalogue = catalogue
+        self.manifest = manifest
+        self.store = store
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.output_root = output_root
+        self.profiles = tuple(profiles)
+        # PlotCache pro render_file
+        self.cache = cache
+        # config pro report.build_report; None = report se negeneruje
+        self.report_config = report_config
+        # perioda procházení imported-data/ v sekundách
+        self.interval = interval
+        self.queue_size = queue_size
+        # kontejner -> podpis (velikost, mtime) z minulého průchodu / poslaný ke zpracování /
+        # ustálený, ale bez 'End of File'
+        self._seen = {}
+        self._queued = {}
+        self._incomplete = {}
+        # složka kontejneru -> zámek / počet čekajících a běžících dělení (i odebrání)
+        self._locks = {}
+        self._splitting = {}
+
+    # --- sledování složky ---
+
+    def poll_once(self):
+        """
+        Jeden průchod imported-data/: vrací (kandidáty, odebrané kontejnery). Kandidát
+        je nový/změněný kontejner (cesta, podpis), jehož podpis se od minulého průchodu
+        nezměnil; jestli je celý, rozhodne complete_containers(). Kontejner je
+        kandidátem jen jednou pro každý stabilní podpis.
+        """
+        present = {}
+        for path in list_containers(self.splitter.input_dir):
+            signature = file_signature(path)
+            if signature is not None:
+                present[path] = signature
+
+        candidates = [
+            (path, signature) for path, signature in present.items()
+            if self._seen.get(path) == signature
+            and signature not in (self._queued.get(path), self._incomplete.get(path))
+        ]
+        self._seen = present
+
+        present_names = {container_name(p) for p in present}
+        removed = [
+            os.path.join(self.splitter.input_dir, name)
+            for name in self.catalogue.container_names() + list(self.manifest.containers)
+            if name not in present_names
+        ]
+        # odebrání se pošle jen jednou (None), znovu přidaný soubor má zase podpis
+        removed = sorted({p for p in removed if not (p in self._queued and self._queued[p] is None)})
+        for path in removed:
+            self._queued[path] = None
+            self._incomplete.pop(path, None)
+        return candidates, removed
+
+    @staticmethod
+    def complete_containers(candidates):
+        """Kandidáti z poll_once(), kteří končí 'End of File'; jen čte soubory (běží v executoru)."""
+        return [path for path, _ in candidates if container_complete(path)]
+
+    def container_stem(self, path):
+        return os.path.basename(self.splitter.container_output_dir(path))
+
+    def file_stem(self, file):
+        return os.path.relpath(file, self.splitter.output_dir).split(os.sep)[0]
+
+    def lock(self, stem):
+        return self._locks.setdefault(stem, asyncio.Lock())
+
+    async def queue_split(self, split_queue, action, path):
+        stem = self.container_stem(path)
+        self._splitting[stem] = self._splitting.get(stem, 0) + 1
+        await split_queue.put((action, path))
+
+    def split_done(self, stem):
+        self._splitting[stem] -= 1
+        if not self._splitting[stem]:
+            del self._splitting[stem]
+
+    async def poll(self, loop, split_queue):
+        while True:
+            candidates, removed = self.poll_once()
+            for path in removed:
+                await self.queue_split(split_queue, 'remove', path)
+            # dekomprese .gz / .zst kandidátů mimo smyčku událostí
+            complete = await loop.run_in_executor(None, self.complete_containers, candidates) if candidates else []
+            for path, signature in candidates:
+                if path not in complete:
+                    self._incomplete[path] = signature
+                    continue
+                self._queued[path] = signature
+                # plná fronta = workery nestíhají, počkáme na ně
+                await self.queue_split(split_queue, 'split', path)
+            await asyncio.sleep(self.interval)
+
+    # --- kroky ---
+
+    async def split_worker(self, loop, executor, split_queue, plot_queue):
+        while True:
+            action, path = await split_queue.get()
+            name = container_name(path)
+            stem = self.container_stem(path)
+            try:
+                async with self.lock(stem):
+                    done = await self.process_container(loop, executor, action, path)
+            finally:
+                self.split_done(stem)
+                split_queue.task_done()
+            # až po split_done(): plot() přeskakuje kontejnery s čekajícím dělením
+            if done:
+                await plot_queue.put(name)
+
+    async def process_container(self, loop, executor, action, path):
+        """Rozdělí nebo odebere kontejner (volá se se zámkem jeho složky); False = selhalo."""
+        name = container_name(path)
+        try:
+            if action == 'remove':
+                self.splitter.forget_container(path)
+                self.manifest.save()
+                _log(f"\033[1;33m− {name}\033[0m removed")
+            elif self.splitter.is_up_to_date(path):
+                _log(f"\033[1;32m✓ {name}\033[0m up to date")
+            else:
+                start = time.perf_counter()
+                self.splitter.forget_container(path)
+                # hash kontejneru se spočítá už ve workeru při dělení
+                result = await loop.run_in_executor(executor, self.splitter.split_container, path)
+                self.splitter.record_split(path, result)
+                await self.collect_properties(loop, name)
+                self.manifest.save()
+                _log(f"\033[1;34m▶ {name}\033[0m \033[1;32m✓ {len(result.blocks)} blocks "
+                     f"{'indexed' if self.splitter.split_free else 'saved'}\033[0m "
+                     f"\033[90m({time.perf_counter() - start:.2f} s)\033[0m")
+            return True
+        except Exception as e:
+            _log(f"\033[1;31m✗ Failed to process {name}: {e}\033[0m")
+            self.splitter.forget_container(path)
+            return False
+
+    async def collect_properties(self, loop, name):
+        """Vlastnosti bloků kontejneru name: hlavičky se parsují mimo smyčku, do katalogu se zapíšou v ní."""
+        collector = CsvPropertiesCollector(
+            root_folder=self.splitter.output_dir,
+            store=self.store,
+            catalogue=self.catalogue,
+            index=self.block_index(),
+        )
+        # jen bloky tohoto kontejneru – ostatní může právě mazat jiný worker
+        pending = [block for block in self.catalogue.blocks_missing_properties() if block[0] == name]
+        properties = await loop.run_in_executor(None, lambda: list(collector.parse_many([p for _, p in pending])))
+        collector.save_into_catalogue(pending, properties)
+
+    def block_index(self):
+        return self.catalogue.block_index() if self.splitter.split_free else None
+
+    async def plot(self, loop, executor, plot_queue, report_queue):
+        while True:
+            # dávka: všechno, co se nahromadilo během minulého kreslení
+            changed = {await plot_queue.get()}
+            while not plot_queue.empty():
+                changed.add(plot_queue.get_nowait())
+
+            index = self.block_index()
+            plotter = HistogramPlotter(
+                scan_files(root=self.splitter.output_dir, catalogue=self.catalogue, data_type=PLOT_TYPES),
+                root_dir=self.splitter.output_dir,
+                output_root=self.output_root,
+                manifest=self.manifest,
+                store=self.store,
+                index=index,
+                profiles=self.profiles,
+                cache=self.cache,
+            )
+            # prune grafů odebraných kontejnerů a výběr bloků se změněným hashem; kontejnery
+            # s čekajícím nebo běžícím dělením se vykreslí, až je split_worker znovu pošle
+            files = [file for file in plotter.outdated_files() if self.file_stem(file) not in self._splitting]
+            # zámky drží nové dělení kontejneru, dokud se jeho bloky kreslí
+            locks = [self.lock(stem) for stem in sorted({self.file_stem(file) for file in files})]
+            for lock in locks:
+                await lock.acquire()
+            start = time.perf_counter()
+            failed = 0
+            try:
+                futures = {
+                    file: loop.run_in_executor(executor, render_file, file, plotter.root_dir, plotter.output_root,
+                                               self.store, index, self.profiles, self.cache)
+                    for file in files
+                }
+                for file, future in futures.items():
+                    try:
+                        plotter._rendered(file, await future)
+                    except Exception as e:
+                        failed += 1
+                        _log(f"\033[1;31m❌ Failed to process {file}: {e}\033[0m")
+            finally:
+                for lock in locks:
+                    lock.release()
+            self.manifest.save()
+            if self.cache is not None:
+                # procházení cache mimo smyčku událostí
+                await loop.run_in_executor(None, self.cache.prune)
+            if files:
+                _log(f"📊 {len(files) - failed} plot(s) rendered for {', '.join(sorted(changed))} "
+                     f"\033[90m({time.perf_counter() - start:.2f} s)\033[0m")
+
+            for _ in changed:
+                plot_queue.task_done()
+            try:
+                # jedna čekající přestavba reportu pokryje všechny změny
+                report_queue.put_nowait(True)
+            except asyncio.QueueFull:
+                pass
+
+    async def report(self, loop, report_queue):
+        from report import build_report
+
+        while True:
+            await report_queue.get()
+            start = time.perf_counter()
+            try:
+                output = await loop.run_in_executor(None, build_report, self.report_config)
+                _log(f"📄 {output} rebuilt \033[90m({time.perf_counter() - start:.2f} s)\033[0m")
+            except Exception as e:
+                _log(f"\033[1;31m✗ Failed to build the report: {e}\033[0m")
+            finally:
+                report_queue.task_done()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        if not self.splitter.split_free:
+            os.makedirs(self.splitter.output_dir, exist_ok=True)
+        split_queue = asyncio.Queue(self.queue_size)
+        plot_queue = asyncio.Queue(self.queue_size)
+        report_queue = asyncio.Queue(1)
+
+        _log(f"\033[1;35mWatching '{self.splitter.input_dir}'\033[0m every {self.interval:g} s "
+             f"({self.jobs} worker(s), Ctrl+C to stop)")
+        with _executor(self.jobs) as split_executor, _executor(self.jobs, _init_renderer) as plot_executor:
+            tasks = [asyncio.create_task(self.poll(loop, split_queue))]
+            tasks += [
+                asyncio.create_task(self.split_worker(loop, split_executor, split_queue, plot_queue))
+                for _ in range(self.jobs)
+            ]
+            tasks.append(asyncio.create_task(self.plot(loop, plot_executor, plot_queue, report_queue)))
+            if self.report_config is not None:
+                tasks.append(asyncio.create_task(self.report(loop, report_queue)))
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self.manifest.save()
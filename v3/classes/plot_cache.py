@@ -0,0 +1,85 @@
+import os
+import shutil
+import hashlib
+
+from classes.atomic_output import temp_path
+
+PLOT_CACHE_DIR = 'plot-cache'
+# nad tuto velikost prune() maže nejdéle nepoužité grafy
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def content_key(*parts):
+    """SHA-1 přes všechny části obsahu grafu (pole dat, popisky, nastavení výstupu)."""
+    h = hashlib.sha1()
+    for part in parts:
+        if hasattr(part, 'tobytes'):
+            h.update(part.tobytes())
+        else:
+            h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class PlotCache:
+    """
+    Obsahově adresovaný cache vykreslených grafů: <root>/<ab>/<hash><přípona>.
+    Stejná data a nastavení dají stejný hash, takže se graf nekreslí znovu ani
+    po --rebuild nebo přejmenování výstupní složky; do výstupu se jen nalinkuje.
+    Každý změněný blok přidá nové grafy, proto prune() drží cache pod max_bytes
+    (mtime souboru = poslední použití).
+    """
+    def __init__(self, root=PLOT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, key, ext):
+        return os.path.join(self.root, key[:2], f"{key}{ext}")
+
+    def fetch(self, key, ext, dest):
+        """Zkopíruje (hardlink, jinak kopie) graf z cache do dest; False pokud v cache není."""
+        src = self.path(key, ext)
+        if not os.path.exists(src):
+            return False
+        # použití posune graf na konec fronty pro prune()
+        os.utime(src)
+        os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+        # dest se nahradí až hotovým souborem
+        tmp = temp_path(dest)
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+        os.replace(tmp, dest)
+        return True
+
+    def put(self, key, ext, src):
+        dest = self.path(key, ext)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = temp_path(dest)
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dest)
+
+    def prune(self):
+        """Smaže nejdéle nepoužité grafy, dokud je cache větší než max_bytes. Vrací počet smazaných."""
+        entries = []
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+import functools
+from contextlib import contextmanager
+
+from classes.atomic_output import atomic_open
+
+try:
+    import resource
+except ImportError:
+    # Windows – peak RSS se neměří
+    resource = None
+
+_local = threading.local()
+
+
+def _io_counters(scope='thread-self'):
+    """(přečtené, zapsané) bajty vlákna / procesu z /proc (Linux), jinak (0, 0)."""
+    try:
+        with open(f'/proc/{scope}/io', 'rb') as f:
+            counters = dict(line.split(b':') for line in f.read().splitlines())
+        return int(counters[b'rchar']), int(counters[b'wchar'])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def peak_rss(who=None):
+    """Nejvyšší RSS procesu (nebo ukončených potomků) v bajtech od jeho startu."""
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # Linux hlásí kB, macOS bajty
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def _snapshot():
+    read, written = _io_counters()
+    return time.perf_counter(), time.thread_time(), read, written
+
+
+def _delta(start, end):
+    return {
+        'start': start[0],
+        'wall': end[0] - start[0],
+        'cpu': end[1] - start[1],
+        'read_bytes': end[2] - start[2],
+        'write_bytes': end[3] - start[3],
+    }
+
+
+@contextmanager
+def span(name):
+    """
+    Pod-úsek práce na jednom souboru (např. 'extract' v render_file). Měří se jen
+    uvnitř call_profiled, jinak je to prázdný context manager.
+    """
+    spans = getattr(_local, 'spans', None)
+    if spans is None:
+        yield
+        return
+    start = _snapshot()
+    try:
+        yield
+    finally:
+        spans.append((name, _delta(start, _snapshot())))
+
+
+def call_profiled(func, *args, **kwargs):
+    """
+    Zavolá func (typicky v worker procesu) a vrátí (výsledek, vzorek) s časem, CPU
+    a I/O vlákna, peak RSS procesu a pod-úseky ze span().
+    """
+    _local.spans = spans = []
+    start = _snapshot()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        _local.spans = None
+    sample = _delta(start, _snapshot())
+    sample.update(pid=os.getpid(), tid=threading.get_native_id(), peak_rss=peak_rss(), spans=spans)
+    return result, sample
+
+
+class PipelineProfiler:
+    """
+    Měření pipeline (main.py --profile): pro každý krok a soubor wall/CPU čas,
+    přečtené a zapsané bajty a peak RSS, volitelně cProfile hlavního procesu po krocích.
+
+        with profiler.stage('plot'):
+            future = executor.submit(profiler.wrap(render_file), file, ...)
+            outputs = profiler.unwrap('plot', file, future.result())
+
+    Krok zahrnuje hlavní proces i práci workerů (jejich vzorky se přičtou);
+    uloží se jako Chrome trace (chrome://tracing, Perfetto) se souhrnem v 'summary'.
+    Bajty jsou rchar/wchar z /proc (včetně čtení z page cache, bez čtení přes mmap),
+    mimo Linux 0. Pod-úseky ('extract', 'draw', ...) se v souhrnu sčítají přes
+    soubory, s více workery tedy mohou přesáhnout wall čas kroku.
+    """
+    def __init__(self, cprofile_dir=None):
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        # adresář pro <krok>.prof z cProfile; None = bez cProfile
+        self.cprofile_dir = cprofile_dir
+        self.stages = {}
+        self.files = []
+        self.events = []
+        self._active = []
+        self._workers = set()
+
+    # --- kroky ---
+
+    @contextmanager
+    def stage(self, name):
+        profile = None
+        if self.cprofile_dir is not None:
+            profile = cProfile.Profile()
+            profile.enable()
+        read, written = _io_counters('self')
+        totals = {'wall': time.perf_counter(), 'cpu': time.process_time(),
+                  'read_bytes': read, 'write_bytes': written, 'files': 0,
+                  'worker_cpu': 0.0, 'worker_read_bytes': 0, 'worker_write_bytes': 0, 'worker_peak_rss': 0,
+                  'spans': {}}
+        self._active.append(totals)
+        try:
+            yield
+        finally:
+            self._active.pop()
+            if profile is not None:
+                profile.disable()
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.cprofile_dir, f"{name}.prof"))
+            self._finish_stage(name, totals)
+
+    def _finish_stage(self, name, totals):
+        end = time.perf_counter()
+        read, written = _io_counters('self')
+        start = totals['wall']
+        record = {
+            'wall': end - start,
+            'cpu': time.process_time() - totals['cpu'] + totals['worker_cpu'],
+            'read_bytes': read - totals['read_bytes'] + totals['worker_read_bytes'],
+            'write_bytes': written - totals['write_bytes'] + totals['worker_write_bytes'],
+            'peak_rss': peak_rss(),
+            'worker_peak_rss': totals['worker_peak_rss'],
+            'files': totals['files'],
+            # součet pod-úseků souborů (extract, draw, save, ...) přes celý krok
+            'spans': totals['spans'],
+        }
+        # opakovaný krok (např. plot po dávkách) se sčítá
+        previous = self.stages.get(name)
+        if previous is not None:
+            for key in ('wall', 'cpu', 'read_bytes', 'write_bytes', 'files'):
+                record[key] += previous[key]
+            for key in ('peak_rss', 'worker_peak_rss'):
+                record[key] = max(record[key], previous[key])
+            for key, wall in previous['spans'].items():
+                record['spans'][key] = record['spans'].get(key, 0.0) + wall
+        self.stages[name] = record
+        self.events.append(self._event(name, 'stage', start, end - start, self.pid, threading.get_native_id(), {
+            k: v for k, v in record.items() if k not in ('wall', 'spans')
+        }))
+
+    # --- soubory ---
+
+    def wrap(self, func):
+        """Funkce pro executor.submit, která vrací (výsledek, vzorek) – viz unwrap()."""
+        return functools.partial(call_profiled, func)
+
+    def call(self, stage, key, func, *args, **kwargs):
+        """Sériové volání v hlavním procesu se záznamem vzorku."""
+        return self.unwrap(stage, key, call_profiled(func, *args, **kwargs))
+
+    def unwrap(self, stage, key, value):
+        result, sample = value
+        self.record(stage, key, sample)
+        return result
+
+    def record(self, stage, key, sample):
+        entry = {'stage': stage, 'file': key, **{k: v for k, v in sample.items() if k not in ('start', 'spans')}}
+        entry['spans'] = {}
+        for name, delta in sample['spans']:
+            entry['spans'][name] = entry['spans'].get(name, 0.0) + delta['wall']
+        self.files.append(entry)
+
+        pid, tid = sample['pid'], sample['tid']
+        if pid != self.pid:
+            self._workers.add(pid)
+        args = {k: sample[k] for k in ('cpu', 'read_bytes', 'write_bytes', 'peak_rss')}
+        self.events.append(self._event(os.path.basename(key), stage, sample['start'], sample['wall'], pid, tid,
+                                       {'file': key, **args}))
+        for name, delta in sample['spans']:
+            self.events.append(self._event(name, stage, delta['start'], delta['wall'], pid, tid,
+                                           {'cpu': delta['cpu']}))
+
+        if self._active:
+            totals = self._active[-1]
+            totals['files'] += 1
+            for name, delta in sample['spans']:
+                totals['spans'][name] = totals['spans'].get(name, 0.0) + delta['wall']
+            if pid != self.pid:
+                # práce workerů není v čítačích hlavního procesu
+                totals['worker_cpu'] += sample['cpu']
+                totals['worker_read_bytes'] += sample['read_bytes']
+                totals['worker_write_bytes'] += sample['write_bytes']
+                totals['worker_peak_rss'] = max(totals['worker_peak_rss'], sample['peak_rss'])
+
+    # --- výstup ---
+
+    def _event(self, name, category, start, duration, pid, tid, args):
+        return {
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': round((start - self.origin) * 1e6, 1), 'dur': round(duration * 1e6, 1),
+            'pid': pid, 'tid': tid, 'args': args,
+        }
+
+    def trace(self):
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'args': {'name': 'main'}}]
+        metadata += [
+            {'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': f'worker {pid}'}}
+            for pid in sorted(self._workers)
+        ]
+        return {
+            'traceEvents': metadata + sorted(self.events, key=lambda e: e['ts']),
+            'displayTimeUnit': 'ms',
+            'summary': {'stages': self.stages, 'files': self.files},
+        }
+
+    def save(self, path):
+        with atomic_open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.trace(), f)
+
+    def summary_lines(self):
+        lines = [f"{'stage':<12}{'wall s':>9}{'cpu s':>9}{'read MB':>10}{'write MB':>10}{'rss MB':>9}{'files':>7}"]
+        for name, s in self.stages.items():
+            rss = max(s['peak_rss'], s['worker_peak_rss'])
+            lines.append(f"{name:<12}{s['wall']:>9.2f}{s['cpu']:>9.2f}{s['read_bytes'] / 2**20:>10.1f}"
+                         f"{s['write_bytes'] / 2**20:>10.1f}{rss / 2**20:>9.0f}{s['files']:>7}")
+            for span_name, wall in s['spans'].items():
+                lines.append(f"  ↳ {span_name:<8}{wall:>9.2f}")
+        return lines
@@ -1,64 +1,301 @@
 import os
-import time
-from tqdm import tqdm
+import sys
+import glob
+import argparse
+import contextlib
 
 from classes.gras_splitter import GrasBlockSplitter
-from classes.histogram_plotter import HistogramPlotter, scan_files
-from classes.file_name_parser import CsvPropertiesCollector, add_prefix_to_file_map
+from classes.gras_archive import list_containers, expand_archives, container_name
+from classes.histogram_plotter import HistogramPlotter, scan_files, PLOT_PROFILES, PLOT_TYPES
+from classes.file_name_parser import CsvPropertiesCollector
+from classes.block_catalogue import BlockCatalogue
+from classes.build_manifest import BuildManifest
+from classes.histogram_store import HistogramStore
+from classes.plot_cache import PlotCache, DEFAULT_MAX_BYTES as PLOT_CACHE_BYTES
+from classes.profiler import PipelineProfiler
+
+STAGES = ('split', 'plot', 'props', 'report')
+DEFAULT_STAGES = 'split,plot,props'
 
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
 
-def main():
-    # 1) Split GRAS CSVs into blocks
-    print("🔧 Splitting GRAS CSV files...")
-    splitter = GrasBlockSplitter()
-    splitter.run()
-    time.sleep(0.5)
-    clear_screen()
-
-    # 2) Scan for HIST_1D CSV files
-    print("🔍 Scanning for matching CSV files...")
-    files = scan_files(root='generated-data')
-    if not files:
-        print("❌ No matching files found with 'GRAS_DATA_TYPE',   -1,'HIST_1D'.")
-        return
-    print(f"✅ Found {len(files)} matching file(s).")
-    time.sleep(0.5)
-    clear_screen()
-
-    # 3) Generate histograms
-    print("📊 Generating and saving histogram plots...")
-    plotter = HistogramPlotter(
-        files,
-        root_dir='generated-data',
-        output_root='output_plots'
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="GRAS radiation analysis pipeline",
+        epilog="Without INPUT patterns the containers are picked from a menu over --input-dir; "
+               "when stdin is not a terminal (CI, cluster jobs) all of them are processed.",
     )
-    plotter.plot_all()
-    time.sleep(0.5)
-    clear_screen()
-
-    # 4) Přidání prefixu do file_map.json
-    print("🔧 Přidávám prefix 'generated-data/' do file_map.json (pokud tam není)...")
-    add_prefix_to_file_map('file_map.json', prefix='generated-data')
-    time.sleep(0.5)
-    clear_screen()
-
-    # 5) Collect CSV header properties
-    print("📝 Extracting CSV header properties and saving to JSON...")
-    collector = CsvPropertiesCollector(
-        root_folder='generated-data',
-        file_map_path='file_map.json',
-        output_file='properties.json'
+    parser.add_argument('inputs', nargs='*', metavar='INPUT',
+                        help="container files (.csv, .csv.gz, .csv.zst, .zip), directories or glob patterns, e.g. 'runs/*/*.csv'")
+    parser.add_argument('--input-dir', default='imported-data',
+                        help="directory with GRAS containers for the menu and --watch")
+    parser.add_argument('--generated-dir', default='generated-data',
+                        help="output root for the split block CSVs")
+    parser.add_argument('--plots-dir', default='output_plots',
+                        help="output root for the plots")
+    parser.add_argument('--report-output', default='report_header_stretched.pdf',
+                        help="PDF written by the report stage")
+    parser.add_argument('--stages', default=DEFAULT_STAGES,
+                        help=f"comma-separated stages to run, in pipeline order: {','.join(STAGES)}")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="no progress output; only errors are printed (to stderr)")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="number of worker processes for splitting and plotting (0 = all cores)")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="ignore build_manifest.json and regenerate all outputs")
+    parser.add_argument('--export-json', action='store_true',
+                        help="also export file_map.json and properties.ndjson from the block catalogue")
+    parser.add_argument('--layout', choices=('single', 'grid', 'overlay'), default='single',
+                        help="one PNG per block, one grid figure per container, or overlays of each block across containers")
+    parser.add_argument('--plot-formats', default='png',
+                        help="comma-separated plot outputs rendered in one pass: png, pdf, svg, thumb")
+    parser.add_argument('--plot-cache-mb', type=float, default=PLOT_CACHE_BYTES / 2**20, metavar='MB',
+                        help="size cap of plot-cache/; least recently used plots are removed after plotting")
+    parser.add_argument('--memory-cap', type=float, default=256, metavar='MB',
+                        help="largest block decoded in memory while splitting; bigger blocks are streamed to the store")
+    parser.add_argument('--no-split', action='store_true',
+                        help="do not write generated-data/ block files, read blocks in place from imported-data/")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running: split, plot and index containers in imported-data/ as they finish")
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help="seconds between scans of imported-data/ in --watch mode")
+    parser.add_argument('--report', action='store_true',
+                        help="in --watch mode also rebuild the PDF report after every change")
+    parser.add_argument('--profile', metavar='TRACE_JSON',
+                        help="measure wall/CPU time, I/O and peak RSS per stage and file, write a Chrome trace")
+    parser.add_argument('--cprofile', metavar='DIR',
+                        help="also run cProfile over each stage of the main process, DIR/<stage>.prof")
+    args = parser.parse_args()
+    if args.watch and args.layout != 'single':
+        parser.error("--watch renders per-block plots only (--layout single)")
+    unknown = set(args.plot_formats.split(',')) - set(PLOT_PROFILES)
+    if unknown:
+        parser.error(f"unknown plot format(s): {', '.join(sorted(unknown))}")
+    if args.memory_cap <= 0:
+        parser.error("--memory-cap must be positive")
+    # MB -> bajty pro GrasBlockSplitter
+    args.memory_cap = int(args.memory_cap * 2**20)
+    if args.plot_cache_mb < 0:
+        parser.error("--plot-cache-mb must not be negative")
+    args.plot_cache_bytes = int(args.plot_cache_mb * 2**20)
+
+    args.stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    args.files = expand_inputs(args.inputs) if args.inputs else None
+    if args.inputs and not args.files:
+        parser.error("no GRAS containers match the given INPUT patterns")
+    if args.files:
+        names = [container_name(f) for f in args.files]
+        duplicates = sorted({n for n in names if names.count(n) > 1})
+        if duplicates:
+            # výstupy kontejnerů jsou pojmenované podle názvu souboru
+            parser.error(f"containers with the same file name in several inputs: {', '.join(duplicates)}")
+    # menu jen v terminálu a bez zadaných vstupů
+    args.interactive = args.files is None and sys.stdin.isatty() and not args.quiet
+    return args
+
+
+def expand_inputs(patterns):
+    """
+    Soubory kontejnerů podle cest, složek (všechny kontejnery včetně komprimovaných)
+    a glob vzorů; zip archivy se rozbalí na jednotlivé kontejnery.
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = list_containers(pattern)
+        else:
+            matches = expand_archives(m for m in glob.glob(pattern) if os.path.isfile(m))
+        if not matches:
+            print(f"⚠️ No files match {pattern!r}", file=sys.stderr)
+        files.update(matches)
+    return sorted(files)
+
+
+def watch(args, manifest, store, catalogue):
+    # asyncio a watcher jen pro --watch
+    import asyncio
+    from classes.import_watcher import ImportWatcher
+
+    splitter = GrasBlockSplitter(input_dir=args.input_dir, output_dir=args.generated_dir, jobs=args.jobs,
+                                 manifest=manifest, store=store, catalogue=catalogue, split_free=args.no_split,
+                                 memory_cap=args.memory_cap)
+    watcher = ImportWatcher(
+        splitter,
+        catalogue,
+        manifest,
+        store=store,
+        jobs=args.jobs,
+        output_root=args.plots_dir,
+        profiles=args.plot_formats.split(','),
+        cache=PlotCache('plot-cache', args.plot_cache_bytes),
+        report_config=report_config(args) if args.report else None,
+        interval=args.interval,
     )
-    collector.collect_properties()
-    time.sleep(0.5)
-    clear_screen()
+    try:
+        asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        print("\n\033[1;36m✔ Watch mode stopped.\033[0m")
+    finally:
+        if args.export_json:
+            catalogue.export_json('file_map.json', 'properties.ndjson')
+        catalogue.close()
+    return 0
+
+
+def report_config(args):
+    return {
+        'output': args.report_output,
+        'catalogue_path': os.path.abspath('catalogue.sqlite'),
+        'store_dir': 'histogram-store',
+        'generated_dir': args.generated_dir,
+    }
+
+
+def run_stages(args, manifest, store, catalogue, profiler=None):
+    """Spustí vybrané kroky; vrací {krok nebo soubor: chyba} pro výsledný stav."""
+    errors = {}
+    # mezi kroky se obrazovka maže jen v interaktivním běhu
+    clear = clear_screen if args.interactive else (lambda: None)
+    # měření kroků (--profile); bez profileru prázdný kontext
+    stage = profiler.stage if profiler is not None else (lambda name: contextlib.nullcontext())
+
+    # 1) Split GRAS CSVs into blocks
+    if 'split' in args.stages:
+        print("🔧 Splitting GRAS CSV files...")
+        splitter = GrasBlockSplitter(input_dir=args.input_dir, output_dir=args.generated_dir, jobs=args.jobs,
+                                     manifest=manifest, store=store, catalogue=catalogue, split_free=args.no_split,
+                                     profiler=profiler, memory_cap=args.memory_cap)
+        selected = args.files
+        if selected is None and not args.interactive:
+            selected = splitter.list_csv_files()
+        with stage('split'):
+            _, failed = splitter.run(selected)
+            manifest.save()
+        errors.update(failed)
+        clear()
+
+    # bajtové offsety bloků v kontejnerech; bez --no-split se bloky čtou ze souborů
+    index = catalogue.block_index() if args.no_split else None
+
+    if 'plot' in args.stages:
+        # 2) Scan for HIST_1D (a v layoutu 'single' i HIST_2D) CSV files
+        print("🔍 Scanning for matching CSV files...")
+        with stage('scan'):
+            # mřížky a překryvy skládají jen 1D histogramy
+            data_type = PLOT_TYPES if args.layout == 'single' else 'HIST_1D'
+            files = scan_files(root=args.generated_dir, catalogue=catalogue, data_type=data_type)
+        if files:
+            print(f"✅ Found {len(files)} matching file(s).")
+            clear()
+
+            # 3) Generate histograms
+            print("📊 Generating and saving histogram plots...")
+            plotter = HistogramPlotter(
+                files,
+                root_dir=args.generated_dir,
+                output_root=args.plots_dir,
+                jobs=args.jobs,
+                manifest=manifest,
+                store=store,
+                index=index,
+                layout=args.layout,
+                profiles=args.plot_formats.split(','),
+                cache=PlotCache('plot-cache', args.plot_cache_bytes),
+                progress=not args.quiet,
+                profiler=profiler,
+            )
+            with stage('plot'):
+                plotter.plot_all()
+                manifest.save()
+            errors.update(plotter.failed)
+        else:
+            print("❌ No histogram blocks found in the block catalogue.")
+        clear()
+
+    # 4) Collect CSV header properties
+    if 'props' in args.stages:
+        print("📝 Extracting CSV header properties into the block catalogue...")
+        collector = CsvPropertiesCollector(
+            root_folder=args.generated_dir,
+            store=store,
+            catalogue=catalogue,
+            index=index,
+            jobs=args.jobs,
+        )
+        with stage('properties'):
+            collector.collect_properties()
+        clear()
+
+    # 5) Volitelný export file_map.json / properties.ndjson
+    if args.export_json:
+        print("🔧 Exporting file_map.json and properties.ndjson from the block catalogue...")
+        with stage('export'):
+            catalogue.export_json('file_map.json', 'properties.ndjson')
+
+    # 6) PDF report (reportlab se načítá jen pro tento krok)
+    if 'report' in args.stages:
+        print("📄 Building the PDF report...")
+        with stage('report'):
+            from report import build_report
+
+            try:
+                print(f"✅ Saved {build_report(report_config(args))}")
+            except Exception as e:
+                print(f"❌ Failed to build the report: {e}")
+                errors['report'] = e
+    return errors
+
+
+def main():
+    args = parse_args()
+    manifest = BuildManifest('build_manifest.json', reset=args.rebuild)
+    store = HistogramStore('histogram-store')
+    catalogue = BlockCatalogue('catalogue.sqlite')
+
+    if args.watch:
+        return watch(args, manifest, store, catalogue)
+
+    profiler = None
+    if args.profile or args.cprofile:
+        profiler = PipelineProfiler(cprofile_dir=args.cprofile)
+
+    try:
+        if args.quiet:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                errors = run_stages(args, manifest, store, catalogue, profiler)
+        else:
+            errors = run_stages(args, manifest, store, catalogue, profiler)
+    finally:
+        catalogue.close()
+
+    if profiler is not None:
+        if args.profile:
+            profiler.save(args.profile)
+        if not args.quiet:
+            print("\n\033[1;36m⏱ Pipeline profile\033[0m")
+            for line in profiler.summary_lines():
+                print(f"  {line}")
+            if args.profile:
+                print(f"  → {args.profile} (chrome://tracing, ui.perfetto.dev)")
+            if args.cprofile:
+                print(f"  → {args.cprofile}/<stage>.prof (python -m pstats)")
 
-    print("✅ All tasks completed successfully.")
+    if errors:
+        for key, error in errors.items():
+            print(f"✗ {key}: {error}", file=sys.stderr)
+        print(f"✗ {len(errors)} error(s).", file=sys.stderr)
+        return 1
+    if not args.quiet:
+        print("✅ All tasks completed successfully.")
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
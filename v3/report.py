@@ -1,282 +1,641 @@
+import reportlab
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
+from reportlab.lib.utils import ImageReader, _digester
 from reportlab.platypus import PageBreak
 from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfdoc import PDFImageXObject, PDFObjectReference
 from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import copy
+import io
 import json
 import os
-from reportlab.platypus import Spacer, SimpleDocTemplate, Table, TableStyle, Image, Paragraph
+import time
+import tempfile
+from reportlab.platypus import Spacer, SimpleDocTemplate, Table, TableStyle, Image, Paragraph, Flowable
 from reportlab.lib.enums import TA_CENTER
 import csv
 
-order_number = "123456789"
-gras_version = "5.0.1"
-generated_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-title = "Simulace zařízení UIEHTGUWEIFGHS298"
-logo_path = "report/logo.png"
-trapped_proton_name = "Trapped Proton"
-trapped_electron_name = "Trapped Electron"
-solar_proton_name = "Solar Proton"
-
-ttf_folder = os.path.join(os.path.dirname(__file__), 'report')
-pdfmetrics.registerFont(TTFont('ArialNarrow', os.path.join(ttf_folder, 'arialnarrow.ttf')))
-pdfmetrics.registerFont(TTFont('ArialNarrowBold', os.path.join(ttf_folder, 'arialnarrow_bold.ttf')))
-pdfmetrics.registerFont(TTFont('ArialNarrowBoldItalic', os.path.join(ttf_folder, 'arialnarrow_bolditalic.ttf')))
-
-font_basic = "ArialNarrow"
-font_bold = "ArialNarrowBold"
-font_bolditalic = "ArialNarrowBoldItalic"
-
-bold_italic = ParagraphStyle(name="BoldItalic", fontName=font_bolditalic, fontSize=14, alignment=TA_CENTER, textColor=colors.teal, leading=20)
-bold_title = ParagraphStyle(name="BoldTitle", fontName=font_bold, fontSize=18, alignment=TA_CENTER, textColor=colors.teal, leading=24)
-cell_style = ParagraphStyle(name="Cell", fontName=font_basic, fontSize=10, alignment=TA_CENTER, textColor=colors.teal, leading=14)
-header_style = ParagraphStyle(name="Heading1", fontName=font_bold, fontSize=14, textColor=colors.black, spaceAfter=8)
-normal_style = ParagraphStyle(name="Normal", fontName=font_basic, fontSize=10, leading=14)
-highlight_style = ParagraphStyle(name="Highlight", fontName=font_basic, fontSize=10, textColor=colors.red)
-
-doc = SimpleDocTemplate(
-    "report_header_stretched.pdf",
-    pagesize=A4,
-    leftMargin=20*mm, rightMargin=20*mm,
-    topMargin=20*mm, bottomMargin=20*mm
-)
-
-img_reader = ImageReader(logo_path)
-orig_width, orig_height = img_reader.getSize()
-pixel_to_mm = 25.4 / 72
-orig_width_mm = orig_width * pixel_to_mm
-orig_height_mm = orig_height * pixel_to_mm
-col_width = 68 * mm
-new_width = col_width * 0.40
-new_height = orig_height_mm / orig_width_mm * new_width
-
-logo = Image(logo_path)
-logo.drawWidth = new_width
-logo.drawHeight = new_height
-
-data = [
-    [logo, Paragraph("GRAS SIMULATION SUMMARY", bold_italic), Paragraph(f"Order number:<br/>{order_number}", cell_style)],
-    ["", Paragraph(title, bold_title), Paragraph(f"Generated on:<br/>{generated_date}", cell_style)],
-]
-col_widths = [34 * mm, 102 * mm, 34 * mm]
-table = Table(data, colWidths=col_widths)
-table.setStyle(TableStyle([
-    ("GRID", (0, 0), (-1, -1), 1, colors.teal),
-    ("SPAN", (0, 0), (0, 1)),
+from classes.histogram_store import HistogramStore
+from classes.block_catalogue import BlockCatalogue
+from classes.gras_reader import read_header
+from classes.dose_aggregation import DoseAggregation, load_container
+from classes.file_name_parser import format_physical_volume, read_properties
+from classes.histogram_plotter import plot_output_path
+from classes.report_cache import ReportCache, DEFAULT_MAX_BYTES
+
+BASE_DIR = os.path.dirname(__file__)
+ASSET_DIR = os.path.join(BASE_DIR, 'report')
+
+DEFAULT_CONFIG = {
+    'order_number': "123456789",
+    'gras_version': "5.0.1",
+    'title': "Simulace zařízení UIEHTGUWEIFGHS298",
+    'logo_path': "report/logo.png",
+    'output': "report_header_stretched.pdf",
+    # catalogue.sqlite z main.py, jinak file_map.json + properties.ndjson
+    'catalogue_path': os.path.join(BASE_DIR, 'catalogue.sqlite'),
+    'file_map_path': os.path.join(BASE_DIR, 'file_map.json'),
+    'properties_path': os.path.join(BASE_DIR, 'properties.ndjson'),
+    # binární cache bloků z GrasBlockSplitter (pokud chybí, čte se přímo z CSV)
+    'store_dir': 'histogram-store',
+    # počet vláken pro načítání dat kontejnerů (0 = podle počtu jader)
+    'jobs': 0,
+    # grafy z main.py (např. 'output_plots'); None = report bez sekce grafů
+    'plots_dir': None,
+    # kořen cest bloků v katalogu (main.py --generated-dir, i v režimu --no-split),
+    # podle něj se hledají grafy v plots_dir
+    'generated_dir': 'generated-data',
+    # 'svg' se vloží vektorově (potřebuje svglib), jinak / 'png' jako obrázek
+    'plot_format': 'svg',
+    # PNG grafy jako předem zakódované PDF obrázky v ReportCache (PreparedImage) – jen na
+    # ověřené verzi reportlab, jinak / False se vkládají přes platypus Image
+    'prepared_images': True,
+}
+
+# verze reportlab (major.minor), na kterých PreparedImage odpovídá canvas.drawImage()
+PREPARED_IMAGE_VERSIONS = ('5.0',)
+
+SPECTRUM_NAMES = {
+    "solar_proton": "Solar Proton",
+    "trapped_proton": "Trapped Proton",
+    "trapped_electron": "Trapped Electron",
+}
+
+FONT_BASIC = "ArialNarrow"
+FONT_BOLD = "ArialNarrowBold"
+FONT_BOLDITALIC = "ArialNarrowBoldItalic"
+
+TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.teal),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
     ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
     ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-    ("LEFTPADDING", (0, 0), (-1, -1), 8),
-    ("RIGHTPADDING", (0, 0), (-1, -1), 8),
-    ("TOPPADDING", (0, 0), (-1, -1), 6),
-    ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-]))
-
-content = [table, Spacer(1, 12)]
-content.append(Paragraph("1. SCOPE OF THE SIMULATION", header_style))
-content.append(Paragraph(
-    f"This document presents the results of computer simulations for radiation analysis performed using a local <br/>"
-    f"copy of GRAS <b><font>(version {gras_version})</font></b> in combination with Geant4 version 10.07 (patch 2) for L²SIM project <b><font style='italic'>{order_number}</font></b>.",
-    normal_style
-))
-content.append(Spacer(1, 6))
-content.append(Paragraph("The simulation was performed for the following analyzed volumes:", normal_style))
-
-file_map_path = os.path.join(os.path.dirname(__file__), 'file_map.json')
-with open(file_map_path, "r") as f:
-    file_map = json.load(f)
-
-props_path = os.path.join(os.path.dirname(__file__), 'properties.json')
-with open(props_path, 'r') as pf:
-    props_list = json.load(pf)
-
-pv_map = {}
-for item in props_list:
-    base = os.path.dirname(item['file_path'])
-    pv_map[base] = item.get('physical_volume', '')
-
-analyzed_files = sorted(file_map.keys())
-if analyzed_files:
-    for file_key in analyzed_files:
-        display_name = file_key.split('_', 2)[-1].rsplit('_', 1)[0]
-        bullet = Paragraph(f"&nbsp;&nbsp;&nbsp;&bull;&nbsp;<font color='orange'>{display_name}</font>", normal_style)
-        content.append(bullet)
-else:
-    content.append(Paragraph("<font color='red'>No analyzed volumes found in the input.</font>", highlight_style))
-
-content.append(Spacer(1, 12))
-content.append(Paragraph("Table <b><font color='gray'>[1.1]</font></b> shows parts of the spectrum used in the simulation.", normal_style))
-content.append(Paragraph("<i>Table 1.1: Parts of the spectrum used in the simulation</i>", normal_style))
-
-spectrum_table_data = [["PART OF THE SPECTRUM", "NUMBER OF EVENTS", "PHYSICAL VOLUME"]]
-label_map = {"solar_proton": solar_proton_name, "trapped_proton": trapped_proton_name, "trapped_electron": trapped_electron_name}
-for file_key in analyzed_files:
-    spectrum_type = '_'.join(file_key.split('_')[:2])
-    paths = file_map[file_key]
-    folder = os.path.dirname(paths[0]) if paths else ""
-    info_path = next((p for p in paths if p.endswith('info.csv')), None)
-    event_count = 'N/A'
-    if info_path and os.path.exists(info_path):
-        with open(info_path, 'r', newline='') as f_csv:
-            reader = csv.reader(f_csv)
-            rows = [row for row in reader if row]
-            last_row = rows[-1]
-            event_count = last_row[0].strip().strip("'\"")
-    spectrum_label = label_map.get(spectrum_type, spectrum_type)
-    raw_pv = pv_map.get(folder, '')
-
-    if len(raw_pv) >= 9 and raw_pv[3] == '-':
-        physical_vol = f"{raw_pv[:3]}-{raw_pv[4:9]}"
-    elif len(raw_pv) >= 8:
-        physical_vol = f"{raw_pv[:3]}-{raw_pv[3:8]}"
-    else:
-        physical_vol = raw_pv
+])
 
-    spectrum_table_data.append([spectrum_label, event_count, physical_vol])
 
-sorted_rows = [spectrum_table_data[0]] + sorted(spectrum_table_data[1:], key=lambda row: row[2])
+# --- fonty, styly a obrázky: načtou se jednou za proces ---
 
-spectrum_table = Table(sorted_rows, colWidths=[60*mm, 60*mm, 60*mm])
+@lru_cache(maxsize=None)
+def register_fonts():
+    pdfmetrics.registerFont(TTFont(FONT_BASIC, os.path.join(ASSET_DIR, 'arialnarrow.ttf')))
+    pdfmetrics.registerFont(TTFont(FONT_BOLD, os.path.join(ASSET_DIR, 'arialnarrow_bold.ttf')))
+    pdfmetrics.registerFont(TTFont(FONT_BOLDITALIC, os.path.join(ASSET_DIR, 'arialnarrow_bolditalic.ttf')))
 
-spectrum_table.setStyle(TableStyle([
-    ("BACKGROUND", (0, 0), (-1, 0), colors.teal),
-    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-    ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-]))
-content.append(spectrum_table)
-
-
-def parse_analysis_modules_from_csv(csv_path):
-    """Parse GRAS_MODULE_TYPE and unit from CSV file."""
-    module_type = None
-    unit = None
-
-    with open(csv_path, newline='') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if not row:
-                continue
-            if row[0].strip("'\"") == "GRAS_MODULE_TYPE":
-                if len(row) > 2:
-                    module_type = row[2].strip("'\"")
-            elif row[0].startswith("'") and row[0].endswith("'") and not row[0].startswith("'GRAS_"):
-                if len(row) > 1 and row[1].strip("'\""):
-                    unit_candidate = row[1].strip("'\"")
-                    if any(c.isalpha() for c in unit_candidate):
-                        unit = unit_candidate
-                        break
-    return module_type, unit
-
-all_analysis_modules = {}
-
-for file_key, files in file_map.items():
-    for file_path in files:
-        basename = os.path.basename(file_path).lower()
-        if basename.endswith('.csv') and not basename.startswith('info'):
-            mod_type, unit = parse_analysis_modules_from_csv(file_path)
-            if mod_type and unit:
-                all_analysis_modules[mod_type] = unit
-
-analysis_table_data = [["ANALYSIS MODULE", "UNIT"]]
-for mod, unit in sorted(all_analysis_modules.items()):
-    analysis_table_data.append([mod, unit])
-
-analysis_table = Table(analysis_table_data, colWidths=[80*mm, 80*mm])
-analysis_table.setStyle(TableStyle([
-    ("BACKGROUND", (0, 0), (-1, 0), colors.teal),
-    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-    ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-]))
-content.append(Spacer(1, 12))
-content.append(Paragraph("Performed analysis is summarized in table <b><font color='gray'>[1.2]</font></b>.", normal_style))
-content.append(Paragraph("<i>Table 1.2: Performed analysis parts of the spectrum used in the simulation</i>", normal_style))
-content.append(analysis_table)
-content.append(PageBreak())
+
+@lru_cache(maxsize=None)
+def report_styles():
+    register_fonts()
+    return {
+        'bold_italic': ParagraphStyle(name="BoldItalic", fontName=FONT_BOLDITALIC, fontSize=14, alignment=TA_CENTER, textColor=colors.teal, leading=20),
+        'bold_title': ParagraphStyle(name="BoldTitle", fontName=FONT_BOLD, fontSize=18, alignment=TA_CENTER, textColor=colors.teal, leading=24),
+        'cell': ParagraphStyle(name="Cell", fontName=FONT_BASIC, fontSize=10, alignment=TA_CENTER, textColor=colors.teal, leading=14),
+        'header': ParagraphStyle(name="Heading1", fontName=FONT_BOLD, fontSize=14, textColor=colors.black, spaceAfter=8),
+        'normal': ParagraphStyle(name="Normal", fontName=FONT_BASIC, fontSize=10, leading=14),
+        'highlight': ParagraphStyle(name="Highlight", fontName=FONT_BASIC, fontSize=10, textColor=colors.red),
+    }
+
+
+def _mtime_ns(path):
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
 
 
-def get_tid_result(tid_csv_path):
+def load_logo(logo_path, cache):
+    """Bajty loga a jeho rozměry pro hlavičku (šířka sloupce 68 mm * 0.40)."""
+    key = ('image', os.path.abspath(logo_path), _mtime_ns(logo_path))
+    return cache.get_or_load(key, lambda: _read_logo(logo_path), lambda logo: len(logo[0]))
+
+
+def _read_image(path):
+    """Bajty obrázku a jeho rozměry v pixelech."""
+    with open(path, 'rb') as f:
+        image_bytes = f.read()
+    return image_bytes, ImageReader(io.BytesIO(image_bytes)).getSize()
+
+
+def _read_logo(logo_path):
+    image_bytes, (orig_width, orig_height) = _read_image(logo_path)
+    pixel_to_mm = 25.4 / 72
+    orig_width_mm = orig_width * pixel_to_mm
+    orig_height_mm = orig_height * pixel_to_mm
+    col_width = 68 * mm
+    new_width = col_width * 0.40
+    new_height = orig_height_mm / orig_width_mm * new_width
+    return image_bytes, new_width, new_height
+
+
+def logo_flowable(logo_path, cache):
+    # flowable se mezi dokumenty nesdílí, sdílí se jen načtená data
+    image_bytes, width, height = load_logo(logo_path, cache)
+    return Image(io.BytesIO(image_bytes), width=width, height=height)
+
+
+@lru_cache(maxsize=None)
+def svg_loader():
+    """svglib.svg2rlg, None bez svglib. Volitelné: vektorové SVG grafy (main.py --plot-formats svg)
+    přímo jako Drawing; načítá se až s prvním SVG grafem."""
+    try:
+        from svglib.svglib import svg2rlg
+    except ImportError:
+        return None
+    return svg2rlg
+
+
+class PreparedImage(Flowable):
+    """
+    PNG graf s už zakódovanými PDF daty (PDFImageXObject z ReportCache). Kopie
+    se zaregistruje v dokumentu pod jménem, pod kterým ji canvas.drawImage()
+    hledá, takže reportlab PNG při dalších reportech znovu nedekóduje ani nekomprimuje.
+
+    Opakuje vnitřní kroky canvas.drawImage() (neveřejné API reportlab), proto se
+    používá jen po kontrole prepared_images_supported().
+    """
+    def __init__(self, path, xobject, width, height):
+        Flowable.__init__(self)
+        self.hAlign = 'CENTER'
+        self.path = path
+        self.xobject = xobject
+        self.drawWidth = width
+        self.drawHeight = height
+
+    def wrap(self, availWidth, availHeight):
+        return self.drawWidth, self.drawHeight
+
+    def register(self):
+        # stejné kroky jako canvas.drawImage() pro obrázek, který v dokumentu ještě není
+        canv, doc = self.canv, self.canv._doc
+        reg_name = doc.getXObjectName(self.xobject.name)
+        if doc.idToObject.get(reg_name) is not None:
+            return
+        xobject = copy.copy(self.xobject)
+        canv._setXObjects(xobject)
+        doc.Reference(xobject, reg_name)
+        doc.addForm(xobject.name, xobject)
+        smask = getattr(xobject, '_smask', None)
+        if smask is not None:
+            del xobject._smask
+            mask_name = doc.getXObjectName(smask.name)
+            if doc.idToObject.get(mask_name) is None:
+                smask = copy.copy(smask)
+                canv._setXObjects(smask)
+                xobject.smask = doc.Reference(smask, mask_name)
+            else:
+                xobject.smask = PDFObjectReference(mask_name)
+
+    def draw(self):
+        self.register()
+        self.canv.drawImage(self.path, 0, 0, self.drawWidth, self.drawHeight, mask='auto')
+
+
+def prepare_plot_image(path):
+    """PNG jako PDFImageXObject (dekódovaný, zkomprimovaný a zakódovaný) pod jménem,
+    které canvas.drawImage() počítá pro soubor path s mask='auto'."""
+    return PDFImageXObject(_digester(f"{path}auto"), ImageReader(path), mask='auto')
+
+
+@lru_cache(maxsize=None)
+def prepared_images_supported():
+    """
+    True, pokud jde PreparedImage použít: ověřená verze reportlab a zkouška na malém
+    PNG, že canvas.drawImage() najde předem zaregistrovaný obrázek (jinak by se graf
+    vložil dvakrát nebo chyběl). Jakákoli chyba -> False a grafy jdou přes platypus Image.
+    """
+    if '.'.join(reportlab.Version.split('.')[:2]) not in PREPARED_IMAGE_VERSIONS:
+        return False
     try:
-        with open(tid_csv_path, newline='') as f:
-            reader = csv.reader(f)
-            rows = [row for row in reader if row and not row[0].startswith("#")]
-
-            for row in reversed(rows): 
-                if len(row) >= 2:
-                    try:
-                        result = float(row[0])
-                        error = float(row[1])
-                        return result, error
-                    except ValueError:
-                        continue
+        from PIL import Image as PILImage
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'probe.png')
+            # s průhledností, aby se vyzkoušela i maska (smask)
+            PILImage.new('RGBA', (2, 2), (0, 128, 128, 128)).save(path)
+            canv = Canvas(io.BytesIO())
+            image = PreparedImage(path, prepare_plot_image(path), 10, 10)
+            image.canv = canv
+            image.register()
+            registered = len(canv._doc.idToObject)
+            canv.drawImage(path, 0, 0, 10, 10, mask='auto')
+            return registered > 0 and len(canv._doc.idToObject) == registered
     except Exception:
-        pass
-    return None, None
-
-
-tid_table_data = [["ANALYZED VOLUME", "SOLAR PROTON", "TRAPPED ELECTRON", "TRAPPED PROTON", "TOTAL"]]
-
-volume_group = {}
-
-for file_key, paths in file_map.items():
-    spectrum_type = '_'.join(file_key.split('_')[:2])
-    folder = os.path.dirname(paths[0])
-    physical_vol = pv_map.get(folder, '')
-
-    if len(physical_vol) >= 9 and physical_vol[3] == '-':
-        physical_vol = f"{physical_vol[:3]}-{physical_vol[4:9]}"
-    elif len(physical_vol) >= 8:
-        physical_vol = f"{physical_vol[:3]}-{physical_vol[3:8]}"
-
-    if physical_vol not in volume_group:
-        volume_group[physical_vol] = {}
-    volume_group[physical_vol][spectrum_type] = folder
-
-for physical_vol, spectrums in sorted(volume_group.items()):
-    row = [physical_vol]
-    total_dose = 0.0
-    total_error2 = 0.0
-
-    for spectrum_type in ["solar_proton", "trapped_electron", "trapped_proton"]:
-        folder = spectrums.get(spectrum_type)
-        result_str = "-"
-        if folder:
-            tid_csv = os.path.join(folder, "total_dose.csv")
-            result, error = get_tid_result(tid_csv)
-            if result is not None and error is not None:
-                result_str = f"{result:.3e} ± {error:.1e}"
-                total_dose += result
-                total_error2 += error**2
-        row.append(result_str)
-
-    if total_dose > 0:
-        total_error = total_error2 ** 0.5
-        total_str = f"{total_dose:.3e} ± {total_error:.1e}"
+        return False
+
+
+def _xobject_size(xobject):
+    smask = getattr(xobject, '_smask', None)
+    return len(xobject.streamContent) + (len(smask.streamContent) if smask is not None else 0)
+
+
+def plot_flowable(csv_path, config, cache, width=170 * mm):
+    """Graf bloku jako flowable (SVG Drawing, nebo PNG); None pokud graf neexistuje."""
+    candidates = ['png']
+    svg2rlg = svg_loader() if config['plot_format'] == 'svg' else None
+    if svg2rlg is not None:
+        candidates.insert(0, 'svg')
+    for profile in candidates:
+        path = plot_output_path(csv_path, config['generated_dir'], config['plots_dir'], profile)
+        if not os.path.exists(path):
+            continue
+        key = ('plot', os.path.abspath(path), _mtime_ns(path))
+        if profile == 'svg':
+            drawing = cache.get_or_load(key, lambda: svg2rlg(path), lambda _: 4 * os.path.getsize(path))
+            if drawing.width != width:
+                # Drawing z cache se škáluje jen jednou
+                scale = width / drawing.width
+                drawing.scale(scale, scale)
+                drawing.width, drawing.height = width, drawing.height * scale
+            return drawing
+        return plot_image(path, key, cache, width, config['prepared_images'])
+    return None
+
+
+def plot_image(path, key, cache, width, prepared=True):
+    """PNG graf jako flowable; data obrázku jsou v ReportCache pod klíčem key."""
+    if prepared and prepared_images_supported():
+        # v cache je obrázek připravený pro PDF – dekódování a komprese PNG
+        # je většina času reportu s grafy
+        xobject = cache.get_or_load(key + ('xobject',), lambda: prepare_plot_image(path), _xobject_size)
+        return PreparedImage(path, xobject, width, width * xobject.height / xobject.width)
+    image_bytes, (image_width, image_height) = cache.get_or_load(
+        key, lambda: _read_image(path), lambda image: len(image[0])
+    )
+    return Image(io.BytesIO(image_bytes), width=width, height=width * image_height / image_width)
+
+
+# --- vstupní data ---
+
+class ReportSources:
+    """
+    Zdroje dat pro report: file map, physical volume podle složky kontejneru
+    a přístup k blokům (HistogramStore, BlockIndex pro režim bez dělení).
+    Katalog se přečte celý hned a zavře, takže objekt jde držet v ReportCache.
+    """
+    def __init__(self, config):
+        self.store = HistogramStore(config['store_dir'])
+        self.index = None
+
+        if os.path.exists(config['catalogue_path']):
+            # katalog bloků z main.py – physical volume se bere z tabulky kontejnerů
+            catalogue = BlockCatalogue(config['catalogue_path'])
+            self.file_map = catalogue.file_map()
+            # offsety bloků v původních kontejnerech (režim bez dělení, main.py --no-split)
+            self.index = catalogue.block_index()
+            containers = catalogue.containers()
+            self.pv_map = {c['folder']: c['physical_volume'] for c in containers}
+            sources = {c['file_name']: c['source_path'] for c in containers}
+            # tabulka modulů jde přímo z katalogu, hlavičky se neotevírají
+            self.modules = [
+                (block['module_type'], block['unit'])
+                for block in catalogue.query_blocks()
+                if not block['file_name'].lower().startswith('info') and block['module_type'] and block['unit']
+            ]
+            catalogue.close()
+        else:
+            with open(config['file_map_path'], "r") as f:
+                self.file_map = json.load(f)
+            self.pv_map = {}
+            for item in read_properties(config['properties_path']):
+                base = os.path.dirname(item['file_path'])
+                self.pv_map[base] = item.get('physical_volume', '')
+            self.modules = None
+            sources = {}
+
+        # otisk každého kontejneru (původní soubor, jinak jeho bloky) – data kontejneru
+        # v ReportCache tak přežijí změnu katalogu, pokud se týkala jiných kontejnerů
+        self.stamps = {
+            file_key: container_stamp(paths, sources.get(file_key))
+            for file_key, paths in self.file_map.items()
+        }
+
+    @staticmethod
+    def cache_key(config):
+        """Klíč zdrojů v ReportCache – změní se, když main.py přepíše katalog nebo JSON."""
+        paths = [config['catalogue_path'], config['file_map_path'], config['properties_path']]
+        return ('sources', os.path.abspath(config['store_dir'])) + tuple(
+            (os.path.abspath(p), _mtime_ns(p)) for p in paths
+        )
+
+    def nbytes(self):
+        # hrubý odhad: cesty bloků v file map a indexu, ~100 B režie na položku
+        paths = sum(len(p) + 100 for paths in self.file_map.values() for p in paths)
+        return 2 * paths + 200 * len(self.index or ())
+
+
+def container_stamp(paths, source_path=None):
+    """(cesta, velikost, mtime) zdrojových souborů kontejneru."""
+    files = [source_path] if source_path and os.path.exists(source_path) else paths
+    stamp = []
+    for path in files:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamp.append((path, st.st_size, st.st_mtime_ns))
+    return tuple(stamp)
+
+
+def container_folder(paths):
+    return os.path.dirname(paths[0]) if paths else ""
+
+
+def read_event_count(info_path, index=None):
+    """Počet eventů z posledního řádku info bloku, 'N/A' pokud blok chybí."""
+    if info_path and os.path.exists(info_path):
+        with open(info_path, 'r', newline='') as f_csv:
+            rows = [row for row in csv.reader(f_csv) if row]
+    elif info_path and index is not None and info_path in index:
+        rows = [row for row in csv.reader(index.read_text(info_path).splitlines()) if row]
     else:
-        total_str = "-"
-    row.append(total_str)
+        return 'N/A'
+    return rows[-1][0].strip().strip("'\"")
 
-    tid_table_data.append(row)
 
-tid_table = Table(tid_table_data, colWidths=[38*mm, 38*mm, 38*mm, 38*mm, 38*mm])
-tid_table.setStyle(TableStyle([
-    ("BACKGROUND", (0, 0), (-1, 0), colors.teal),
-    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-    ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-]))
+def parse_analysis_modules_from_csv(csv_path, store=None, index=None):
+    """GRAS_MODULE_TYPE a jednotka bloku ze sdíleného parseru hlaviček (store / BlockIndex / soubor)."""
+    header = read_header(csv_path, store, index)
+    return header.get('GRAS_MODULE_TYPE'), header.unit
 
-content.append(Spacer(1, 12))
-content.append(Paragraph("Table <b><font color='gray'>[1.3]</font></b> summarizes calculated Total Ionizing Dose (TID) per analyzed volume and spectrum.", normal_style))
-content.append(Paragraph("<i>Table 1.3: Calculated TID per analyzed volume</i>", normal_style))
-content.append(tid_table)
 
-
-doc.build(content)
\ No newline at end of file
+def gather_container(paths, sources):
+    """Data jednoho kontejneru pro tabulky reportu (běží ve vlákně)."""
+    folder = container_folder(paths)
+    info_path = next((p for p in paths if p.endswith('info.csv')), None)
+    result = {
+        'event_count': read_event_count(info_path, sources.index),
+        # dose / NIEL / fluence pro DoseAggregation
+        'quantities': load_container(folder, sources.store, sources.index),
+    }
+    if sources.modules is None:
+        modules = []
+        for file_path in paths:
+            basename = os.path.basename(file_path).lower()
+            if basename.endswith('.csv') and not basename.startswith('info'):
+                mod_type, unit = parse_analysis_modules_from_csv(file_path, sources.store, sources.index)
+                if mod_type and unit:
+                    modules.append((mod_type, unit))
+        result['modules'] = modules
+    return result
+
+
+# --- sekce reportu ---
+# Každá sekce dostane ReportContext a vrátí seznam flowables. Data kontejnerů se
+# načítají v thread poolu souběžně s úvodními sekcemi; sekce, které je potřebují,
+# si počkají až na výsledek (ctx.container()).
+
+class ReportContext:
+    def __init__(self, config, sources, executor, cache):
+        self.config = config
+        self.sources = sources
+        self.cache = cache
+        self.styles = report_styles()
+        self.file_map = sources.file_map
+        store_key = os.path.abspath(config['store_dir'])
+        self._futures = {
+            file_key: executor.submit(
+                cache.get_or_load,
+                ('container', store_key, file_key, tuple(paths), sources.stamps[file_key]),
+                lambda paths=paths: gather_container(paths, sources),
+                lambda result: 512 + 128 * len(result.get('modules', ())),
+            )
+            for file_key, paths in sources.file_map.items()
+        }
+
+    def container(self, file_key):
+        return self._futures[file_key].result()
+
+
+def header_section(ctx):
+    styles = ctx.styles
+    config = ctx.config
+    generated_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    data = [
+        [logo_flowable(config['logo_path'], ctx.cache), Paragraph("GRAS SIMULATION SUMMARY", styles['bold_italic']), Paragraph(f"Order number:<br/>{config['order_number']}", styles['cell'])],
+        ["", Paragraph(config['title'], styles['bold_title']), Paragraph(f"Generated on:<br/>{generated_date}", styles['cell'])],
+    ]
+    col_widths = [34 * mm, 102 * mm, 34 * mm]
+    table = Table(data, colWidths=col_widths)
+    table.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 1, colors.teal),
+        ("SPAN", (0, 0), (0, 1)),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 8),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+        ("TOPPADDING", (0, 0), (-1, -1), 6),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+    ]))
+    return [table, Spacer(1, 12)]
+
+
+def scope_section(ctx):
+    styles = ctx.styles
+    config = ctx.config
+    content = [Paragraph("1. SCOPE OF THE SIMULATION", styles['header'])]
+    content.append(Paragraph(
+        f"This document presents the results of computer simulations for radiation analysis performed using a local <br/>"
+        f"copy of GRAS <b><font>(version {config['gras_version']})</font></b> in combination with Geant4 version 10.07 (patch 2) for L²SIM project <b><font style='italic'>{config['order_number']}</font></b>.",
+        styles['normal']
+    ))
+    content.append(Spacer(1, 6))
+    content.append(Paragraph("The simulation was performed for the following analyzed volumes:", styles['normal']))
+
+    analyzed_files = sorted(ctx.file_map.keys())
+    if analyzed_files:
+        for file_key in analyzed_files:
+            display_name = file_key.split('_', 2)[-1].rsplit('_', 1)[0]
+            content.append(Paragraph(f"&nbsp;&nbsp;&nbsp;&bull;&nbsp;<font color='orange'>{display_name}</font>", styles['normal']))
+    else:
+        content.append(Paragraph("<font color='red'>No analyzed volumes found in the input.</font>", styles['highlight']))
+    return content
+
+
+def spectrum_section(ctx):
+    styles = ctx.styles
+    content = [Spacer(1, 12)]
+    content.append(Paragraph("Table <b><font color='gray'>[1.1]</font></b> shows parts of the spectrum used in the simulation.", styles['normal']))
+    content.append(Paragraph("<i>Table 1.1: Parts of the spectrum used in the simulation</i>", styles['normal']))
+
+    rows = []
+    for file_key in sorted(ctx.file_map.keys()):
+        spectrum_type = '_'.join(file_key.split('_')[:2])
+        folder = container_folder(ctx.file_map[file_key])
+        spectrum_label = SPECTRUM_NAMES.get(spectrum_type, spectrum_type)
+        physical_vol = format_physical_volume(ctx.sources.pv_map.get(folder, ''))
+        rows.append([spectrum_label, ctx.container(file_key)['event_count'], physical_vol])
+
+    header = ["PART OF THE SPECTRUM", "NUMBER OF EVENTS", "PHYSICAL VOLUME"]
+    spectrum_table = Table([header] + sorted(rows, key=lambda row: row[2]), colWidths=[60*mm, 60*mm, 60*mm])
+    spectrum_table.setStyle(TABLE_STYLE)
+    content.append(spectrum_table)
+    return content
+
+
+def analysis_section(ctx):
+    styles = ctx.styles
+    modules = ctx.sources.modules
+    if modules is None:
+        modules = [m for file_key in ctx.file_map for m in ctx.container(file_key)['modules']]
+    # stejný modul s jinou jednotkou – platí poslední výskyt
+    all_analysis_modules = dict(modules)
+
+    analysis_table_data = [["ANALYSIS MODULE", "UNIT"]]
+    for mod, unit in sorted(all_analysis_modules.items()):
+        analysis_table_data.append([mod, unit])
+
+    analysis_table = Table(analysis_table_data, colWidths=[80*mm, 80*mm])
+    analysis_table.setStyle(TABLE_STYLE)
+    return [
+        Spacer(1, 12),
+        Paragraph("Performed analysis is summarized in table <b><font color='gray'>[1.2]</font></b>.", styles['normal']),
+        Paragraph("<i>Table 1.2: Performed analysis parts of the spectrum used in the simulation</i>", styles['normal']),
+        analysis_table,
+        PageBreak(),
+    ]
+
+
+def tid_section(ctx):
+    styles = ctx.styles
+    cells = {}
+    for file_key, paths in ctx.file_map.items():
+        spectrum_type = '_'.join(file_key.split('_')[:2])
+        folder = container_folder(paths)
+        physical_vol = format_physical_volume(ctx.sources.pv_map.get(folder, ''))
+        cells[(physical_vol, spectrum_type)] = ctx.container(file_key)['quantities']
+    aggregation = DoseAggregation.from_containers(cells)
+
+    tid_table_data = [["ANALYZED VOLUME", "SOLAR PROTON", "TRAPPED ELECTRON", "TRAPPED PROTON", "TOTAL"]]
+    tid_table_data.extend(aggregation.table_rows('dose'))
+
+    tid_table = Table(tid_table_data, colWidths=[38*mm, 38*mm, 38*mm, 38*mm, 38*mm])
+    tid_table.setStyle(TABLE_STYLE)
+    return [
+        Spacer(1, 12),
+        Paragraph("Table <b><font color='gray'>[1.3]</font></b> summarizes calculated Total Ionizing Dose (TID) per analyzed volume and spectrum.", styles['normal']),
+        Paragraph("<i>Table 1.3: Calculated TID per analyzed volume</i>", styles['normal']),
+        tid_table,
+    ]
+
+
+def plots_section(ctx):
+    """Grafy HIST_1D bloků podle kontejnerů (jen s config['plots_dir'])."""
+    if not ctx.config['plots_dir']:
+        return []
+    styles = ctx.styles
+    content = [PageBreak(), Paragraph("2. PLOTS", styles['header'])]
+    for file_key in sorted(ctx.file_map):
+        flowables = [f for f in (plot_flowable(p, ctx.config, ctx.cache) for p in ctx.file_map[file_key]) if f is not None]
+        if not flowables:
+            continue
+        display_name = file_key.split('_', 2)[-1].rsplit('_', 1)[0]
+        spectrum_type = '_'.join(file_key.split('_')[:2])
+        content.append(Paragraph(f"<b>{SPECTRUM_NAMES.get(spectrum_type, spectrum_type)}</b> – {display_name}", styles['normal']))
+        for flowable in flowables:
+            content.append(flowable)
+            content.append(Spacer(1, 6))
+    return content
+
+
+SECTIONS = [header_section, scope_section, spectrum_section, analysis_section, tid_section, plots_section]
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ReportCache()
+    return _default_cache
+
+
+def build_report(config=None, cache=None):
+    """
+    Vygeneruje PDF report podle configu (chybějící klíče z DEFAULT_CONFIG)
+    a vrátí cestu k výstupu. Fonty a styly se načtou jednou za proces, zdroje
+    dat, data kontejnerů a logo drží ReportCache (výchozí je sdílený pro proces).
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    cache = cache if cache is not None else default_cache()
+    sources = cache.get_or_load(
+        ReportSources.cache_key(config), lambda: ReportSources(config), ReportSources.nbytes
+    )
+    jobs = config['jobs'] if config['jobs'] > 0 else (os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        ctx = ReportContext(config, sources, executor, cache)
+        content = []
+        for section in SECTIONS:
+            content.extend(section(ctx))
+
+    doc = SimpleDocTemplate(
+        config['output'],
+        pagesize=A4,
+        leftMargin=20*mm, rightMargin=20*mm,
+        topMargin=20*mm, bottomMargin=20*mm
+    )
+    doc.build(content)
+    return config['output']
+
+
+def build_reports(configs, cache=None):
+    """
+    Dávkové generování: jeden report na config (zakázku) v jednom procesu se
+    společným cache. Config bez 'output' dostane report_<order_number>.pdf.
+    Vrací [(výstup, sekundy), ...].
+    """
+    cache = cache if cache is not None else default_cache()
+    timings = []
+    for config in configs:
+        config = dict(config)
+        config.setdefault('output', f"report_{config.get('order_number', DEFAULT_CONFIG['order_number'])}.pdf")
+        start = time.perf_counter()
+        output = build_report(config, cache)
+        elapsed = time.perf_counter() - start
+        timings.append((output, elapsed))
+        print(f"\033[1;32m✓\033[0m {output} \033[90m({elapsed:.2f} s)\033[0m")
+
+    total = sum(t for _, t in timings)
+    stats = cache.stats()
+    print(f"\n\033[1;36m✔ {len(timings)} report(s) in {total:.2f} s\033[0m "
+          f"(cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['bytes'] / 2**20:.1f}/{stats['max_bytes'] / 2**20:.0f} MB)")
+    return timings
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="GRAS simulation summary report")
+    parser.add_argument('--batch', metavar='ORDERS_JSON',
+                        help="JSON list of report configs (order_number, title, gras_version, output, ...)")
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="memory cap of the in-process report cache in MB")
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help="threads for gathering container data (0 = all cores)")
+    parser.add_argument('--plots', metavar='DIR',
+                        help="append the block plots from DIR (e.g. output_plots) to the report")
+    parser.add_argument('--plot-format', choices=('svg', 'png'), default='svg',
+                        help="embed SVG plots as vector drawings (needs svglib) or PNG images")
+    parser.add_argument('--generated-dir', default=DEFAULT_CONFIG['generated_dir'],
+                        help="block root the plots were rendered from (main.py --generated-dir)")
+    parser.add_argument('--no-prepared-images', action='store_true',
+                        help="embed PNG plots through the plain reportlab Image flowable, without "
+                             "caching them as encoded PDF images")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cache = ReportCache(args.cache_mb * 1024 * 1024)
+    defaults = {'jobs': args.jobs, 'plots_dir': args.plots, 'plot_format': args.plot_format,
+                'generated_dir': args.generated_dir, 'prepared_images': not args.no_prepared_images}
+    if args.batch:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            configs = json.load(f)
+        build_reports([{**defaults, **c} for c in configs], cache)
+    else:
+        build_report(defaults, cache)
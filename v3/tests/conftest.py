@@ -0,0 +1,32 @@
+import os
+import sys
+import glob
+
+import pytest
+
+V3_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# ukázkové GRAS kontejnery v kořeni repozitáře
+DATA_DIR = os.path.join(os.path.dirname(V3_DIR), 'data')
+
+# moduly se importují jako classes.* z v3/, stejně jako v main.py
+sys.path.insert(0, V3_DIR)
+
+
+@pytest.fixture(scope='session')
+def containers():
+    paths = sorted(glob.glob(os.path.join(DATA_DIR, '*.csv')))
+    if not paths:
+        pytest.skip(f"no GRAS containers in {DATA_DIR}")
+    return paths
+
+
+@pytest.fixture(scope='session')
+def split_root(containers, tmp_path_factory):
+    """Kontejnery z data/ rozdělené do generated-data (bez manifestu a store)."""
+    from classes.gras_splitter import GrasBlockSplitter
+
+    root = tmp_path_factory.mktemp('generated-data')
+    splitter = GrasBlockSplitter(input_dir=DATA_DIR, output_dir=str(root))
+    for path in containers:
+        splitter.split_container(path)
+    return root
@@ -0,0 +1,133 @@
+import os
+import re
+import csv
+import shutil
+
+import numpy as np
+import pytest
+
+from classes.dose_aggregation import DoseAggregation, load_container, SPECTRA
+
+
+def container_cell(folder):
+    """(objem, spektrum) podle názvu kontejneru, např. ('NA1-FP011-FP10telo001', 'solar_proton')."""
+    name = os.path.basename(folder)
+    volume = re.search(r"_v6-(.+)-DETECTOR", name).group(1)
+    return volume, '_'.join(name.split('_')[:2])
+
+
+def baseline_tid_result(tid_csv_path):
+    """get_tid_result() z původního report.py: poslední řádek s dvěma čísly."""
+    try:
+        with open(tid_csv_path, newline='') as f:
+            rows = [row for row in csv.reader(f) if row and not row[0].startswith("#")]
+            for row in reversed(rows):
+                if len(row) >= 2:
+                    try:
+                        return float(row[0]), float(row[1])
+                    except ValueError:
+                        continue
+    except Exception:
+        pass
+    return None, None
+
+
+def baseline_tid_rows(folders):
+    """Řádky tabulky TID tak, jak je skládal původní report.py."""
+    volume_group = {}
+    for folder in folders:
+        volume, spectrum = container_cell(folder)
+        volume_group.setdefault(volume, {})[spectrum] = folder
+
+    rows = []
+    for volume, spectra in sorted(volume_group.items()):
+        row = [volume]
+        total_dose = 0.0
+        total_error2 = 0.0
+        for spectrum in ["solar_proton", "trapped_electron", "trapped_proton"]:
+            folder = spectra.get(spectrum)
+            result_str = "-"
+            if folder:
+                result, error = baseline_tid_result(os.path.join(folder, "total_dose.csv"))
+                if result is not None and error is not None:
+                    result_str = f"{result:.3e} ± {error:.1e}"
+                    total_dose += result
+                    total_error2 += error ** 2
+            row.append(result_str)
+        row.append(f"{total_dose:.3e} ± {total_error2 ** 0.5:.1e}" if total_dose > 0 else "-")
+        rows.append(row)
+    return rows
+
+
+def aggregate(folders):
+    return DoseAggregation.from_containers({container_cell(f): load_container(f) for f in folders})
+
+
+@pytest.fixture
+def folders(split_root):
+    return sorted(str(p) for p in split_root.iterdir() if p.is_dir())
+
+
+def test_tid_table_matches_baseline(folders):
+    aggregation = aggregate(folders)
+    assert aggregation.present.all()
+    assert aggregation.table_rows('dose') == baseline_tid_rows(folders)
+
+
+def test_totals_are_quadrature_sums(folders):
+    aggregation = aggregate(folders)
+    q = aggregation.quantities.index('dose')
+    for v, volume in enumerate(aggregation.volumes):
+        results = [
+            baseline_tid_result(os.path.join(f, "total_dose.csv"))
+            for f in folders if container_cell(f)[0] == volume
+        ]
+        assert aggregation.totals()[v, q] == pytest.approx(sum(r for r, _ in results), rel=1e-12)
+        assert aggregation.total_errors()[v, q] == pytest.approx(
+            sum(e ** 2 for _, e in results) ** 0.5, rel=1e-12)
+
+
+def test_missing_blocks_are_nan_and_skipped(folders, tmp_path):
+    # kopie: jednomu objemu chybí celý kontejner, dalšímu blok total_dose,
+    # třetímu všechna spektra -> v tabulce '-' a součet jen z dostupných
+    volumes = sorted({container_cell(f)[0] for f in folders})
+    assert len(volumes) >= 3
+    copies = []
+    for folder in folders:
+        volume, spectrum = container_cell(folder)
+        if volume == volumes[0] and spectrum == SPECTRA[1]:
+            continue
+        copy = tmp_path / os.path.basename(folder)
+        shutil.copytree(folder, copy)
+        if (volume == volumes[1] and spectrum == SPECTRA[0]) or volume == volumes[2]:
+            os.remove(copy / "total_dose.csv")
+        copies.append(str(copy))
+
+    aggregation = aggregate(copies)
+    q = aggregation.quantities.index('dose')
+    assert aggregation.table_rows('dose') == baseline_tid_rows(copies)
+    assert np.isnan(aggregation.values[1, 0, q])
+    assert not aggregation.present[2, :, q].any()
+    # NaN se do součtů nepropisuje
+    assert np.isfinite(aggregation.totals()).all()
+    assert np.isfinite(aggregation.total_errors()).all()
+    assert aggregation.totals()[2, q] == 0.0
+    assert aggregation.table_rows('dose')[2][1:] == ["-"] * 4
+    assert aggregation.to_dict()['quantities']['dose']['volumes'][volumes[1]]['spectra'][SPECTRA[0]] is None
+
+    complete = aggregate(folders)
+    present = ~np.isnan(aggregation.values[1, :, q])
+    assert aggregation.totals()[1, q] == pytest.approx(complete.values[1, present, q].sum(), rel=1e-12)
+    assert aggregation.total_errors()[1, q] == pytest.approx(
+        np.sqrt((complete.errors[1, present, q] ** 2).sum()), rel=1e-12)
+
+
+def test_scaled_keeps_relative_errors(folders):
+    aggregation = aggregate(folders)
+    scaled = aggregation.scaled(3.0)
+    np.testing.assert_allclose(scaled.totals(), 3 * aggregation.totals())
+    np.testing.assert_allclose(scaled.total_errors(), 3 * aggregation.total_errors())
+    names, values, errors = scaled.species_totals('dose')
+    _, base_values, base_errors = aggregation.species_totals('dose')
+    np.testing.assert_allclose(values, 3 * base_values)
+    np.testing.assert_allclose(errors, 3 * base_errors)
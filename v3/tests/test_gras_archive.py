@@ -0,0 +1,105 @@
+import os
+import gzip
+import zipfile
+
+import numpy as np
+import pytest
+
+from classes.build_manifest import source_digest
+from classes.gras_archive import list_containers, container_name, is_compressed
+from classes.gras_reader import GrasBlockReader
+from classes.gras_splitter import GrasBlockSplitter
+from classes.histogram_store import HistogramStore
+
+
+@pytest.fixture(scope='module')
+def archives(containers, tmp_path_factory):
+    """Kontejnery z data/ jako .csv.gz, členy zipu v podsložce a (se zstandard) .csv.zst."""
+    root = tmp_path_factory.mktemp('imported-data')
+    with zipfile.ZipFile(root / 'runs.zip', 'w', zipfile.ZIP_DEFLATED) as z:
+        for path in containers:
+            name = os.path.basename(path)
+            with open(path, 'rb') as f:
+                data = f.read()
+            with gzip.open(root / f"{name}.gz", 'wb') as f:
+                f.write(data)
+            z.writestr(f"run/{name}", data)
+            try:
+                import zstandard
+            except ImportError:
+                continue
+            (root / f"{name}.zst").write_bytes(zstandard.ZstdCompressor().compress(data))
+    return root
+
+
+def split_files(root):
+    return {p.relative_to(root): p.read_bytes() for p in sorted(root.rglob('*.csv'))}
+
+
+def test_archives_are_listed_as_containers(containers, archives):
+    found = list_containers(str(archives))
+    names = sorted(os.path.basename(p) for p in containers)
+    kinds = 3 if any(p.endswith('.zst') for p in found) else 2
+    assert len(found) == kinds * len(names)
+    assert all(is_compressed(p) for p in found)
+    assert sorted(container_name(p) for p in found) == sorted(names * kinds)
+    assert any(p.endswith('runs.zip/run/' + names[0]) for p in found)
+
+
+def test_compressed_split_round_trip(archives, split_root, tmp_path):
+    # každý druh komprese se rozdělí zvlášť, generated-data musí být bajtově stejná
+    expected = split_files(split_root)
+    by_kind = {}
+    for path in list_containers(str(archives)):
+        kind = 'zip' if '.zip/' in path else path.rsplit('.', 1)[1]
+        by_kind.setdefault(kind, []).append(path)
+
+    for kind, paths in by_kind.items():
+        root = tmp_path / kind
+        splitter = GrasBlockSplitter(input_dir=str(archives), output_dir=str(root))
+        for path in paths:
+            result = splitter.split_container(path)
+            # hash spočítaný při čtení proudu = hash pro manifest
+            assert result.sha1 == source_digest(path)
+        assert split_files(root) == expected, kind
+
+
+def test_compressed_blocks_decode_like_plain(containers, archives):
+    for plain in containers:
+        name = os.path.basename(plain)
+        with GrasBlockReader(plain) as reader:
+            expected = [(b.header, b.shape, np.array(reader.read_array(b))) for b in reader]
+        for path in (archives / f"{name}.gz", archives / 'runs.zip' / 'run' / name):
+            # proud: blok jde přečíst jen během iterace, memory_cap vynutí dekódování po kusech
+            with GrasBlockReader(str(path), memory_cap=64) as reader:
+                actual = [(b.header, b.shape, np.array(reader.read_array(b))) for b in reader]
+            assert len(actual) == len(expected)
+            for (header, shape, data), (e_header, e_shape, e_data) in zip(actual, expected):
+                assert (header, shape) == (e_header, e_shape)
+                np.testing.assert_array_equal(data, e_data)
+
+
+def test_compressed_store_matches_plain(containers, archives, tmp_path):
+    plain = containers[0]
+    name = os.path.basename(plain)
+    stores = {}
+    for label, path in (('plain', plain), ('gz', str(archives / f"{name}.gz"))):
+        store = HistogramStore(str(tmp_path / label / 'histogram-store'))
+        GrasBlockSplitter(output_dir=str(tmp_path / label / 'generated-data'), store=store).split_container(path)
+        stores[label] = store
+    stem = os.path.splitext(name)[0]
+    assert stores['gz'].block_names(stem) == stores['plain'].block_names(stem)
+    np.testing.assert_array_equal(stores['gz'].array(stem), stores['plain'].array(stem))
+
+
+def test_compressed_containers_cannot_be_read_in_place(archives, tmp_path):
+    from classes.block_catalogue import BlockCatalogue
+
+    catalogue = BlockCatalogue(str(tmp_path / 'catalogue.sqlite'))
+    try:
+        splitter = GrasBlockSplitter(input_dir=str(archives), output_dir=str(tmp_path / 'generated-data'),
+                                     catalogue=catalogue, split_free=True)
+        with pytest.raises(ValueError, match="compressed"):
+            splitter.split_container(list_containers(str(archives))[0])
+    finally:
+        catalogue.close()
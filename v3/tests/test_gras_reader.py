@@ -0,0 +1,93 @@
+import re
+from io import StringIO
+
+import numpy as np
+import pytest
+
+from classes.gras_reader import GrasBlockReader, decode_numeric, decode_range
+
+# původní cesta (extract_data v histogram_plotter) četla data bloků přes pandas
+pd = pytest.importorskip('pandas')
+
+
+def pandas_decode(text, float_precision=None):
+    """Numerické řádky bloku jako v původním extract_data(): regex na řádky + pd.read_csv."""
+    lines = ''.join(line + '\n' for line in text.split('\n') if re.match(r'^\s*[\d\.\+\-]', line))
+    if not lines:
+        return np.empty((0, 0))
+    return pd.read_csv(StringIO(lines), header=None, float_precision=float_precision).astype(float).values
+
+
+def container_blocks(path, memory_cap=None):
+    """[(blok, text bloku, pole z read_array)] celého kontejneru."""
+    with GrasBlockReader(path, memory_cap=memory_cap) as reader:
+        return [(block, reader.read_block(block).decode(), np.array(reader.read_array(block))) for block in reader]
+
+
+def assert_matches_pandas(text, array):
+    # round_trip parser pandas je správně zaokrouhlený -> bit po bitu stejné hodnoty;
+    # výchozí (rychlý) parser se u exponentů kolem e+250 liší nejvýš o 1 ULP
+    np.testing.assert_array_equal(array, pandas_decode(text, 'round_trip'))
+    np.testing.assert_array_max_ulp(array, pandas_decode(text), maxulp=1)
+
+
+def test_container_blocks_match_pandas(containers):
+    for path in containers:
+        blocks = container_blocks(path)
+        assert blocks
+        for block, text, array in blocks:
+            assert array.shape == block.shape
+            assert_matches_pandas(text, array)
+
+
+def test_split_blocks_match_pandas(split_root):
+    # rozdělené soubory v generated-data, které původní kód četl přímo
+    files = sorted(split_root.rglob('*.csv'))
+    assert files
+    for path in files:
+        with GrasBlockReader(str(path)) as reader:
+            block = next(iter(reader))
+            array = reader.read_array(block)
+        assert_matches_pandas(path.read_text(encoding='utf-8'), array)
+
+
+def test_chunked_and_memmap_decoding_is_identical(containers):
+    # memory_cap 64 B: každý blok jde do dočasného memmapu po kusech o několika řádcích
+    for path in containers:
+        for (_, _, array), (_, _, chunked) in zip(container_blocks(path), container_blocks(path, memory_cap=64)):
+            np.testing.assert_array_equal(chunked, array)
+
+
+def test_decode_numeric_columns():
+    data = b"1,2,3\n4.5, -6e-3, +7E+2\n"
+    expected = np.array([[1, 2, 3], [4.5, -6e-3, 7e2]])
+    np.testing.assert_array_equal(decode_numeric(data, (2, 3)), expected)
+    # bez tvaru z hlavičky se počet sloupců vezme z prvního řádku
+    np.testing.assert_array_equal(decode_numeric(data), expected)
+    assert decode_numeric(b"").shape == (0, 0)
+
+
+def test_decode_range_chunk_boundaries():
+    data = b"1,2,3\n4.5, -6e-3, +7E+2\n 8,9,10\n"
+    expected = np.array([[1, 2, 3], [4.5, -6e-3, 7e2], [8, 9, 10]])
+    for chunk_bytes in (1, 4, 7, 64):
+        np.testing.assert_array_equal(decode_range(data, 0, len(data), (3, 3), chunk_bytes=chunk_bytes), expected)
+        np.testing.assert_array_equal(decode_range(data, 0, len(data), chunk_bytes=chunk_bytes), expected)
+
+
+@pytest.mark.parametrize('data, shape', [
+    (b"1,2,3\n4,5,6\n", (3, 3)),      # chybí řádek
+    (b"1,2,3\n4,5,6\n7,8,9\n", (2, 3)),  # řádek navíc
+    (b"1,2,3\n4,5\n", (2, 3)),        # useknutý řádek
+    (b"1,2,3\n", (0, 3)),             # hodnoty u prázdného tvaru
+])
+def test_shape_mismatch_is_an_error(data, shape):
+    with pytest.raises(ValueError, match="shape"):
+        decode_numeric(data, shape)
+
+
+def test_malformed_values_are_an_error():
+    with pytest.raises(ValueError, match="Malformed"):
+        decode_numeric(b"1,2,x\n", (1, 3))
+    with pytest.raises(ValueError):
+        decode_numeric(b"1,2,3\n4,5\n")
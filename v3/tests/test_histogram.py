@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from classes.gras_reader import GrasBlockReader
+from classes.histogram import Histogram, Histogram2D, HistogramStack, combine, log_edges, rebin_matrix
+
+
+def load_histograms(folder):
+    """HIST_1D bloky rozděleného kontejneru jako {název souboru bloku: Histogram}."""
+    histograms = {}
+    for path in sorted(folder.glob('*.csv')):
+        with GrasBlockReader(str(path)) as reader:
+            if next(iter(reader)).data_type == 'HIST_1D':
+                histograms[path.stem] = Histogram.from_block(str(path))
+    return histograms
+
+
+@pytest.fixture(scope='module')
+def histograms(split_root):
+    return [h for folder in sorted(split_root.iterdir()) for h in load_histograms(folder).values()]
+
+
+def coarse_edges(h, step=3):
+    """Každá step-tá hrana histogramu (a poslední) – nové biny jsou sjednocením starých."""
+    return np.append(h.edges[:-1:step], h.edges[-1])
+
+
+def test_rebin_onto_own_edges_is_identity(histograms):
+    for h in histograms:
+        r = h.rebin(h.edges)
+        np.testing.assert_allclose(r.values, h.values, rtol=1e-12)
+        np.testing.assert_allclose(r.errors, h.errors, rtol=1e-12)
+        np.testing.assert_allclose(r.entries, h.entries, rtol=1e-12)
+
+
+def test_rebin_conserves_content(histograms):
+    for h in histograms:
+        r = h.rebin(coarse_edges(h))
+        assert r.integral() == pytest.approx(h.integral(), rel=1e-12, abs=0)
+        assert r.entries.sum() == pytest.approx(h.entries.sum(), rel=1e-12, abs=0)
+        # sloučené celé biny: chyby se skládají kvadraticky
+        assert r.integral_error() == pytest.approx(h.integral_error(), rel=1e-12, abs=0)
+
+
+def test_log_rebin_conserves_content(histograms):
+    positive = [h for h in histograms if h.lower[0] > 0 and h.integral() > 0]
+    assert positive
+    for h in positive:
+        r = h.rebin(log_edges([h], nbins=7))
+        assert r.integral() == pytest.approx(h.integral(), rel=1e-9)
+        # rozdělený bin přispívá e² · Σf² <= e²
+        assert r.integral_error() <= h.integral_error() * (1 + 1e-9)
+
+
+def test_rebin_matrix_splits_bins_uniformly():
+    lower, upper = np.array([1.0]), np.array([100.0])
+    edges = np.array([1.0, 10.0, 100.0])
+    np.testing.assert_allclose(rebin_matrix(lower, upper, edges, log=True), [[0.5, 0.5]])
+    np.testing.assert_allclose(rebin_matrix(lower, upper, edges, log=False), [[9 / 99, 90 / 99]])
+    # mimo rozsah nových hran se obsah nepočítá
+    np.testing.assert_allclose(rebin_matrix(lower, upper, np.array([200.0, 300.0])), [[0.0]])
+
+
+def test_downsampled_conserves_content(histograms):
+    for h in histograms:
+        d = h.downsampled(7)
+        assert len(d) <= 7
+        assert d.integral() == pytest.approx(h.integral(), rel=1e-12, abs=0)
+        assert d.integral_error() == pytest.approx(h.integral_error(), rel=1e-12, abs=0)
+        assert d.edges[0] == h.edges[0] and d.edges[-1] == h.edges[-1]
+
+
+def test_histogram2d_downsampled_conserves_content():
+    rng = np.random.default_rng(0)
+    values = rng.random((9, 13))
+    h = Histogram2D(np.arange(14.0), np.arange(10.0), values, np.sqrt(values))
+    d = h.downsampled(4, 3)
+    assert d.shape == (3, 4)
+    assert d.integral() == pytest.approx(h.integral(), rel=1e-12)
+    assert np.sqrt((d.errors ** 2).sum()) == pytest.approx(np.sqrt((h.errors ** 2).sum()), rel=1e-12)
+
+
+def test_add_and_stack_sum_agree(histograms):
+    h = histograms[0]
+    other = h.scaled(2.0)
+    total = h + other
+    np.testing.assert_allclose(total.values, 3 * h.values)
+    np.testing.assert_allclose(total.errors, np.hypot(h.errors, 2 * h.errors))
+    stacked = HistogramStack.from_histograms([h, other]).sum()
+    np.testing.assert_allclose(stacked.values, total.values)
+    np.testing.assert_allclose(stacked.errors, total.errors)
+    with pytest.raises(ValueError):
+        h + h.rebin(coarse_edges(h))
+
+
+def test_stack_rebins_mixed_binning(histograms):
+    h = histograms[0]
+    edges = coarse_edges(h)
+    coarse = h.rebin(edges)
+    # jemný histogram se přebinuje, hrubý s cílovými hranami jde beze změny
+    stack = HistogramStack.from_histograms([h, coarse, h], edges=edges)
+    for i in range(len(stack)):
+        np.testing.assert_allclose(stack[i].values, coarse.values, rtol=1e-12)
+        np.testing.assert_allclose(stack[i].errors, coarse.errors, rtol=1e-12)
+    np.testing.assert_allclose(stack.integrals(), [h.integral()] * 3, rtol=1e-12)
+    np.testing.assert_allclose(stack.normalised('integral').integrals()[stack.integrals() != 0], 1.0)
+
+
+def test_combine_sums_blocks_across_containers(split_root):
+    folders = sorted(split_root.iterdir())
+    stem = sorted(load_histograms(folders[0]))[0]
+    files = [str(folder / f"{stem}.csv") for folder in folders if (folder / f"{stem}.csv").exists()]
+    parts = [Histogram.from_block(f) for f in files]
+
+    # spektra mají různé binování, sčítá se na hranách prvního (ty pokrývají všechny)
+    assert not all(p.same_binning(parts[0]) for p in parts)
+    rebinned = [p.rebin(parts[0].edges) for p in parts]
+    total = combine(files)
+    np.testing.assert_allclose(total.values, np.sum([r.values for r in rebinned], axis=0), rtol=1e-12)
+    np.testing.assert_allclose(total.errors, np.sqrt(np.sum([r.errors ** 2 for r in rebinned], axis=0)), rtol=1e-12)
+    assert total.integral() == pytest.approx(sum(p.integral() for p in parts), rel=1e-9)
+
+    coarse = combine(files, edges=coarse_edges(parts[0]))
+    assert coarse.integral() == pytest.approx(total.integral(), rel=1e-12)
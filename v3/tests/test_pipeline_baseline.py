@@ -0,0 +1,119 @@
+"""
+Celý pipeline (split, plot, props, report) nad data/ proti výstupům původního kódu:
+generated-data bajt po bajtu, PNG grafy pixel po pixelu a text PDF reportu.
+
+Otisky výstupů původního kódu jsou v baseline/pipeline.json. Vznikly během
+prvního commitu repozitáře ('baseline'): data/*.csv v v3/imported-data,
+'echo a | python main.py' a pak
+
+    python tests/test_pipeline_baseline.py <v3 složka baseline běhu>
+
+Pixely grafů závisí na verzi matplotlib (fonty, antialiasing), s jinou
+verzí, než je v pipeline.json, se porovnání grafů přeskočí. Report se porovnává
+s report_header_stretched.pdf z repozitáře, bez řádků s časem vytvoření.
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import subprocess
+
+import pytest
+
+V3_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline', 'pipeline.json')
+BASELINE_REPORT = os.path.join(V3_DIR, 'report_header_stretched.pdf')
+# řádky reportu, které se mění s každým během
+VOLATILE_LINE = re.compile(r"^(Generated on:|--|\d{4}-\d{2}-\d{2} )")
+
+
+def file_sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def pixels_sha1(path):
+    """Otisk dekódovaných RGB pixelů PNG (nezávislý na kompresi a metadatech souboru)."""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        rgb = image.convert('RGB')
+        return f"{rgb.width}x{rgb.height}:{hashlib.sha1(rgb.tobytes()).hexdigest()}"
+
+
+def tree_digests(root, pattern, digest):
+    return {
+        os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/'): digest(os.path.join(folder, name))
+        for folder, _, names in os.walk(root) for name in names if name.endswith(pattern)
+    }
+
+
+def pipeline_digests(v3_dir):
+    """Otisky výstupů jednoho běhu main.py ve složce v3_dir (formát baseline/pipeline.json)."""
+    import matplotlib
+
+    return {
+        'matplotlib': matplotlib.__version__,
+        'generated': tree_digests(os.path.join(v3_dir, 'generated-data'), '.csv', file_sha1),
+        'plots': tree_digests(os.path.join(v3_dir, 'output_plots'), '.png', pixels_sha1),
+    }
+
+
+def report_lines(pdf_path):
+    from pypdf import PdfReader
+
+    text = '\n'.join(page.extract_text() for page in PdfReader(pdf_path).pages)
+    return [line for line in text.split('\n') if not VOLATILE_LINE.match(line)]
+
+
+@pytest.fixture(scope='module')
+def baseline():
+    with open(BASELINE_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='module')
+def pipeline_run(containers, tmp_path_factory):
+    """Jeden běh main.py se všemi kroky v čisté pracovní složce."""
+    pytest.importorskip('matplotlib')
+    pytest.importorskip('reportlab')
+    workdir = tmp_path_factory.mktemp('pipeline')
+    os.makedirs(workdir / 'imported-data')
+    for path in containers:
+        shutil.copy(path, workdir / 'imported-data')
+    # fonty a logo reportu (logo_path je relativní k pracovní složce)
+    os.symlink(os.path.join(V3_DIR, 'report'), workdir / 'report')
+    result = subprocess.run(
+        [sys.executable, os.path.join(V3_DIR, 'main.py'), '--quiet', '--stages', 'split,plot,props,report'],
+        cwd=workdir, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return workdir
+
+
+def test_generated_data_is_byte_identical(baseline, pipeline_run):
+    assert pipeline_digests(pipeline_run)['generated'] == baseline['generated']
+
+
+def test_plots_are_pixel_identical(baseline, pipeline_run):
+    import matplotlib
+
+    if matplotlib.__version__ != baseline['matplotlib']:
+        pytest.skip(f"baseline plots rendered with matplotlib {baseline['matplotlib']}")
+    assert pipeline_digests(pipeline_run)['plots'] == baseline['plots']
+
+
+def test_report_text_matches_baseline(pipeline_run):
+    pytest.importorskip('pypdf')
+    assert report_lines(pipeline_run / 'report_header_stretched.pdf') == report_lines(BASELINE_REPORT)
+
+
+if __name__ == '__main__':
+    digests = pipeline_digests(sys.argv[1])
+    os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+    with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(digests, f, indent=1, sort_keys=True)
+        f.write('\n')
+    print(f"✔ {len(digests['generated'])} block files, {len(digests['plots'])} plots → {BASELINE_PATH}")
@@ -0,0 +1,67 @@
+import io
+import re
+
+import pytest
+
+pytest.importorskip('reportlab')
+from reportlab.lib.utils import ImageReader, _digester
+from reportlab.pdfbase.pdfdoc import PDFImageXObject
+from reportlab.platypus import SimpleDocTemplate, Image
+from PIL import Image as PILImage
+
+import report
+from classes.report_cache import ReportCache
+
+
+@pytest.fixture
+def plot_png(tmp_path):
+    path = tmp_path / 'dose_spectrum.png'
+    PILImage.new('RGBA', (40, 20), (0, 128, 128, 200)).save(path)
+    return str(path)
+
+
+def build_pdf(flowables):
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer).build(flowables)
+    return buffer.getvalue()
+
+
+def image_count(pdf):
+    return len(re.findall(rb"/Subtype /Image", pdf))
+
+
+@pytest.mark.parametrize('prepared', [True, False])
+def test_plot_embedded_once_per_document(plot_png, prepared):
+    cache = ReportCache()
+    key = ('plot', plot_png, 0)
+    pdfs = []
+    for _ in range(2):
+        # druhý report bere obrázek z ReportCache
+        images = [report.plot_image(plot_png, key, cache, 100, prepared) for _ in range(3)]
+        assert all(isinstance(i, report.PreparedImage if prepared else Image) for i in images)
+        pdfs.append(build_pdf(images))
+    # obrázek a jeho maska průhlednosti, jednou na dokument
+    assert [image_count(pdf) for pdf in pdfs] == [2, 2]
+
+
+def test_public_image_is_used_when_disabled_or_unsupported(plot_png, monkeypatch):
+    cache = ReportCache()
+    assert isinstance(report.plot_image(plot_png, ('plot', plot_png, 0), cache, 100, prepared=False), Image)
+    monkeypatch.setattr(report, 'prepared_images_supported', lambda: False)
+    assert isinstance(report.plot_image(plot_png, ('plot', plot_png, 1), cache, 100), Image)
+
+
+def test_probe_rejects_mismatched_image_names(monkeypatch):
+    # jiné jméno než to, které počítá canvas.drawImage() -> obrázek by byl v PDF dvakrát
+    prepare = report.prepare_plot_image
+    monkeypatch.setattr(report, 'prepare_plot_image', lambda path: PDFImageXObject(
+        _digester(f"{path}other"), ImageReader(path), mask='auto'))
+    report.prepared_images_supported.cache_clear()
+    try:
+        assert not report.prepared_images_supported()
+        monkeypatch.setattr(report, 'PREPARED_IMAGE_VERSIONS', ())
+        monkeypatch.setattr(report, 'prepare_plot_image', prepare)
+        report.prepared_images_supported.cache_clear()
+        assert not report.prepared_images_supported()
+    finally:
+        report.prepared_images_supported.cache_clear()